@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+"""
+  Copyright (c) 2021, SunSpec Alliance
+  All Rights Reserved
+
+"""
+
+import timeit
+import tracemalloc
+import sunspec2.device as device
+import sunspec2.modbus.client as client
+import sunspec2.tests.mock_device as MockDevice
+from optparse import OptionParser
+
+"""
+  Microbenchmarks for decoding Modbus data into SunSpec models.
+
+      -b: benchmark: decode, memory, dict (default: decode)
+      -m: model id, the model must have a top-level repeating group without nested groups (default: 160)
+      -n: number of repeating groups (default: 100)
+      -i: number of iterations for the decode benchmark (default: 1000)
+      -d: number of devices scanned for the memory benchmark (default: 1000)
+"""
+
+
+def create_model(model_id, count):
+    model_def = device.get_model_def(model_id)
+    gdef = model_def[device.mdef.GROUP]
+    groups = gdef.get(device.mdef.GROUPS)
+    if not groups:
+        raise device.ModelError('Model %s does not contain a repeating group' % model_id)
+    rgdef = groups[0]
+    data = {rgdef[device.mdef.NAME]: [{} for i in range(count)]}
+    # set the count point if the repeating group count is not a constant
+    count_point = rgdef.get(device.mdef.COUNT)
+    if isinstance(count_point, str):
+        data[count_point] = count
+    return device.Model(model_id, data=data)
+
+
+def set_mb_copy(group, data=None, computed=False, dirty=None):
+    # data slicing decode path without memoryview, each slice copies the remaining data
+    if data:
+        data = bytes(data)
+        data_len = len(data)
+    else:
+        data_len = 0
+    offset = 0
+    for pid, point in group.points.items():
+        if data_len > offset:
+            mb_len = point.set_mb(data[offset:], computed=computed, dirty=dirty)
+            if mb_len is not None:
+                offset += mb_len * 2
+    for gid, g in group.groups.items():
+        if not isinstance(g, list):
+            g = [g]
+        for rg in g:
+            if data_len > offset:
+                mb_len = set_mb_copy(rg, data[offset:], computed=computed, dirty=dirty)
+                if mb_len is not None:
+                    offset += mb_len * 2
+    return int(offset/2)
+
+
+def set_mb_points(model, data):
+    # per point decode path on a memoryview
+    model._decoder = False
+    model.set_mb(data)
+    model._decoder = None
+
+
+def get_dict_points(group):
+    # computed dict with the scale factor of each point resolved by the point
+    d = {}
+    for pid, p in group.points.items():
+        d[pid] = p.get_value(computed=True)
+    for gid, g in group.groups.items():
+        if isinstance(g, list):
+            d[gid] = [get_dict_points(rg) for rg in g]
+        else:
+            d[gid] = get_dict_points(g)
+    return d
+
+
+def set_values(group, value=100, sf=-1):
+    # set all integer points to value and all scale factors to sf
+    for p in group.points.values():
+        ptype = p.pdef[device.mdef.TYPE]
+        if ptype == device.mdef.TYPE_SUNSSF:
+            p.set_value(sf)
+        elif ptype in device.mb.point_type_struct and ptype not in (device.mdef.TYPE_FLOAT32,
+                                                                    device.mdef.TYPE_FLOAT64):
+            p.set_value(value)
+    for g in group.groups.values():
+        for rg in (g if isinstance(g, list) else [g]):
+            set_values(rg, value, sf)
+
+
+def create_map(model_id, count):
+    common = device.Model(1, data={'Mn': 'SunSpec', 'Md': 'Bench', 'SN': '1234'})
+    return b'SunS' + common.get_mb() + create_model(model_id, count).get_mb() + b'\xff\xff\x00\x00'
+
+
+def bench_memory(label, regs, devices, model_class, base=None):
+    tracemalloc.start()
+    fleet = []
+    for i in range(devices):
+        d = MockDevice.MockDevice(regs, model_class=model_class)
+        d.scan()
+        d.clear()
+        fleet.append(d)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    txt = '%-24s %10.1f MB  %8.1f KB/device' % (label, size / 1000000, size / devices / 1000)
+    if base is not None:
+        txt += '  (%.1fx)' % (base / size)
+    print(txt)
+    return size
+
+
+def bench(label, stmt, iterations, base=None):
+    t = timeit.timeit(stmt, number=iterations)
+    usec = t / iterations * 1000000
+    txt = '%-24s %10.1f us/decode' % (label, usec)
+    if base is not None:
+        txt += '  (%.1fx)' % (base / usec)
+    print(txt)
+    return usec
+
+
+if __name__ == "__main__":
+
+    usage = 'usage: %prog [options]'
+    parser = OptionParser(usage=usage)
+    parser.add_option('-b', metavar=' ',
+                      default='decode',
+                      help='benchmark: decode, memory, dict [default: decode]')
+    parser.add_option('-m', metavar=' ', type='int',
+                      default=160,
+                      help='model id [default: 160]')
+    parser.add_option('-n', metavar=' ', type='int',
+                      default=100,
+                      help='number of repeating groups [default: 100]')
+    parser.add_option('-i', metavar=' ', type='int',
+                      default=1000,
+                      help='number of iterations for the decode benchmark [default: 1000]')
+    parser.add_option('-d', metavar=' ', type='int',
+                      default=1000,
+                      help='number of devices scanned for the memory benchmark [default: 1000]')
+
+    options, args = parser.parse_args()
+
+    if options.b == 'memory':
+        regs = create_map(options.m, options.n)
+        print('%d devices: models 1, %s with %d repeating groups, %d registers' % (options.d, options.m, options.n,
+                                                                                   len(regs) // 2))
+        base = bench_memory('point', regs, options.d, client.SunSpecModbusClientModel)
+        bench_memory('compact point', regs, options.d, client.SunSpecModbusClientCompactModel, base)
+        bench_memory('image model', regs, options.d, client.SunSpecModbusClientImageModel, base)
+    elif options.b == 'dict':
+        m = create_model(options.m, options.n)
+        set_values(m)
+        print('model %s: %d repeating groups, computed dict' % (options.m, options.n))
+        base = bench('per point scale factor', lambda: get_dict_points(m), options.i)
+        bench('bulk get_dict', lambda: m.get_dict(computed=True), options.i, base)
+    else:
+        m = create_model(options.m, options.n)
+        data = m.get_mb()
+        print('model %s: %d repeating groups, %d registers' % (options.m, options.n, len(data) // 2))
+
+        base = bench('bytes slicing', lambda: set_mb_copy(m, data), options.i)
+        bench('memoryview', lambda: set_mb_points(m, data), options.i, base)
+        bench('model decoder', lambda: m.set_mb(data), options.i, base)
@@ -25,6 +25,7 @@ setup(
     extras_require={
       'serial': ['pyserial'],
       'excel': ['openpyxl'],
+      'numpy': ['numpy'],
       'test': ['pytest'],
     },
     classifiers=[
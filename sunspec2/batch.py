@@ -0,0 +1,214 @@
+"""
+    Copyright (C) 2020 SunSpec Alliance
+
+    Permission is hereby granted, free of charge, to any person obtaining a
+    copy of this software and associated documentation files (the "Software"),
+    to deal in the Software without restriction, including without limitation
+    the rights to use, copy, modify, merge, publish, distribute, sublicense,
+    and/or sell copies of the Software, and to permit persons to whom the
+    Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included
+    in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+    THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+    FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+    IN THE SOFTWARE.
+"""
+
+from collections import OrderedDict
+
+import sunspec2.device as device
+import sunspec2.mdef as mdef
+import sunspec2.mb as mb
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+'''
+Bulk decoding of the Modbus register images of many devices with the same model into columnar NumPy arrays.
+
+The result of decode() is a dict with an entry for each point of the model. Top-level points are keyed by the point
+name, points in groups by the dotted group path and point name (e.g. 'Crv.Pt.V'). Each entry is a numpy masked array
+with one row per register image. Points in repeating groups have an additional dimension for each repeating group
+level. Unimplemented values are masked.
+'''
+
+# numpy dtypes for struct format codes in mb.point_type_struct
+struct_dtype = {
+    'h': '>i2',
+    'H': '>u2',
+    'i': '>i4',
+    'I': '>u4',
+    'q': '>i8',
+    'Q': '>u8',
+    'f': '>f4',
+    'd': '>f8'
+}
+
+
+class BatchLayout(object):
+    """Point columns of a model register image layout, with the numpy structured dtype used to decode the images."""
+
+    def __init__(self, layout, nbytes):
+        self.layout = layout
+        self.columns = OrderedDict()
+        names = []
+        formats = []
+        offsets = []
+        points = OrderedDict()
+        _layout_points(layout, '', (), points)
+        for key, (meta, shape, entries) in points.items():
+            size = int(meta.len) * 2
+            fmt = struct_dtype.get(mb.point_type_struct.get(meta.pdef[mdef.TYPE]))
+            if fmt is None or np.dtype(fmt).itemsize != size:
+                fmt = 'S%d' % size
+            fields = []
+            for offset in entries:
+                name = 'f%d' % len(names)
+                names.append(name)
+                formats.append(fmt)
+                offsets.append(offset * 2)
+                fields.append(name)
+            self.columns[key] = (meta, shape, fields)
+        self.dtype = np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': nbytes})
+
+
+def _layout_points(layout, prefix, shape, points):
+    for name, (offset, meta) in layout.points.items():
+        entry = points.get(prefix + name)
+        if entry is None:
+            entry = points[prefix + name] = (meta, shape, [])
+        entry[2].append(offset)
+    for name, g in layout.groups.items():
+        if isinstance(g, list):
+            for rg in g:
+                _layout_points(rg, prefix + name + '.', shape + (len(g),), points)
+        else:
+            _layout_points(g, prefix + name + '.', shape, points)
+
+
+def _column(records, meta, shape, fields):
+    count = len(records)
+    if len(fields) == 1:
+        values = records[fields[0]]
+    else:
+        values = np.stack([records[f] for f in fields], axis=-1)
+    values = values.reshape((count,) + shape)
+    ptype = meta.pdef[mdef.TYPE]
+    if values.dtype.kind == 'S':
+        # decode string and address points individually
+        data = np.empty(values.shape, dtype=object)
+        mask = np.zeros(values.shape, dtype=bool)
+        for i, v in np.ndenumerate(values):
+            v = meta.info.data_to(v.ljust(values.dtype.itemsize, b'\0'))
+            data[i] = v
+            mask[i] = v is None or not meta.info.is_impl(v)
+        return np.ma.MaskedArray(data, mask=mask)
+    values = values.astype(values.dtype.newbyteorder('='))
+    if values.dtype.kind == 'f':
+        mask = np.isnan(values)
+    elif ptype == mdef.TYPE_PAD:
+        mask = np.zeros(values.shape, dtype=bool)
+    else:
+        mask = values == mb.unimpl_value.get(ptype)
+    return np.ma.MaskedArray(values, mask=mask)
+
+
+def _scale(value, sf):
+    # same result as rounding value * 10^sf to -sf decimal places
+    sfv = np.ma.filled(sf, 0).astype(float)
+    data = np.where(sfv < 0, value.data / np.power(10.0, -sfv), value.data * np.power(10.0, sfv))
+    return np.ma.MaskedArray(data, mask=np.ma.getmaskarray(value) | np.ma.getmaskarray(sf))
+
+
+layouts = {}
+
+
+def get_batch_layout(model_id, model_def, model_len, data):
+    layout = device.get_image_layout(model_id, model_def, model_len=model_len, data=data)
+    key = (id(layout), len(data))
+    batch_layout = layouts.get(key)
+    if batch_layout is None or batch_layout.layout is not layout:
+        batch_layout = BatchLayout(layout, len(data))
+        layouts[key] = batch_layout
+    return batch_layout
+
+
+def decode(model_id, buffers, computed=True, model_def=None):
+    """Decode the register images of many instances of a model.
+
+    Parameters:
+        model_id :
+            Model id.
+        buffers :
+            Sequence of register images (bytes like objects starting at the model ID point) or a 2-dimensional
+            numpy array with one register image per row. All images must have the same length and repeating group
+            counts.
+        computed :
+            If True, scale factors are applied to the point values.
+        model_def :
+            Model definition. If not supplied, the model definition is looked up using the model id.
+
+    Returns:
+        Dict of point key to numpy masked array.
+    """
+    if np is None:
+        raise ImportError('numpy library not installed, it is required for batch decoding')
+
+    if isinstance(buffers, np.ndarray):
+        if buffers.ndim != 2:
+            raise ValueError('Register image array must have 2 dimensions')
+        count = buffers.shape[0]
+        data = np.ascontiguousarray(buffers).tobytes()
+    else:
+        count = len(buffers)
+        data = b''.join(buffers)
+        if count and any(len(b) != len(buffers[0]) for b in buffers):
+            raise ValueError('Register images are not all the same length')
+    if count == 0:
+        raise ValueError('No register images')
+    nbytes = len(data) // count
+    if nbytes % 2:
+        raise ValueError('Register image length is not a whole number of registers')
+
+    if model_def is None:
+        model_def = device.get_model_def(model_id)
+    first = data[:nbytes]
+    batch_layout = get_batch_layout(model_id, model_def, nbytes // 2 - 2, first)
+    records = np.frombuffer(data, dtype=batch_layout.dtype, count=count)
+
+    columns = OrderedDict()
+    for key, (meta, shape, fields) in batch_layout.columns.items():
+        columns[key] = _column(records, meta, shape, fields)
+
+    # repeating group layout must be the same for all images
+    for name in mdef.get_group_len_points(model_def[mdef.GROUP]):
+        column = columns.get(name)
+        if column is not None and not np.all(column.data == column.data[0]):
+            raise device.ModelError('Group count point %s differs between register images' % name)
+
+    if computed:
+        for key, (meta, shape, fields) in batch_layout.columns.items():
+            if not meta.sf_required:
+                continue
+            if meta.sf_value is not None:
+                sf = np.ma.MaskedArray(np.full((count,) + shape, meta.sf_value))
+            else:
+                prefix = key[:len(key) - len(meta.pdef[mdef.NAME])]
+                sf_key = prefix + meta.sf
+                if sf_key not in columns:
+                    sf_key = meta.sf
+                if sf_key not in columns:
+                    raise device.ModelError('Scale factor %s for point %s not found' % (meta.sf, key))
+                sf = columns[sf_key]
+                sf = sf.reshape(sf.shape + (1,) * (len(shape) + 1 - sf.ndim))
+            columns[key] = _scale(columns[key], sf)
+
+    return columns
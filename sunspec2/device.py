@@ -1,6 +1,8 @@
 import json
 import math
+import struct
 from collections import OrderedDict
+from collections.abc import Mapping
 import os
 import sunspec2.mdef as mdef
 import sunspec2.smdx as smdx
@@ -134,56 +136,66 @@ def add_mappings(group_def):
     group_def['group_defs'] = group_defs
 
 
-class Point(object):
-    def __init__(self, pdef=None, model=None, group=None, model_offset=0, data=None, data_offset=0):
-        self.model = model          # model object containing the point
-        self.group = group
-        self.pdef = pdef            # point definition
-        self.len = 0                # mb register len of point
-        self.info = None            # point def info
-        self.offset = model_offset  # mb register offset from beginning of the model
-        self._value = None          # value
-        self.dirty = False          # value has been changed without being written
-        self.sf = None              # scale factor point name
-        self.sf_value = None        # value of scale factor
-        self.sf_required = False    # point has a scale factor
-        self.detail = None          # detailed description
-        self.standards = []         # list of standards requiring this point's implementation
-        self.read_func = None       # function to be called on read
-        self.read_func_arg = None   # the argument passed to the read_func
-        self.write_func = None      # function to be called on write
-        self.write_func_arg = None  # the argument passed to the write_func
+# powers of ten for the scale factor range used by SunSpec models
+sf_pow10 = {sf: math.pow(10, sf) for sf in range(-10, 11)}
+
+
+def pow10(sf):
+    v = sf_pow10.get(sf)
+    if v is None:
+        v = math.pow(10, sf)
+    return v
+
+
+class PointMeta(object):
+    """Point attributes derived from a point definition. A single instance is shared by all compact points created
+    from the same point definition.
+    """
+    __slots__ = ('pdef', 'info', 'len', 'sf', 'sf_value', 'sf_required', 'static', 'standards', 'detail')
+
+    def __init__(self, pdef):
+        self.pdef = pdef
+        self.info = mb.point_type_info.get(pdef[mdef.TYPE])
+        self.len = self.info.len
+        plen = pdef.get(mdef.SIZE, None)
+        if plen is not None:
+            self.len = int(plen)
+        self.sf = None
+        self.sf_value = None
+        self.sf_required = (pdef.get(mdef.SF) is not None)
+        if self.sf_required:
+            sf = pdef.get(mdef.SF)
+            try:
+                self.sf_value = int(sf)
+            except ValueError:
+                self.sf = sf
         self.static = None
+        static = pdef.get('static', None)
+        if static and static == 'S':
+            self.static = True
+        self.standards = []
+        standards = pdef.get('standards', None)
+        if standards:
+            if not isinstance(standards, list):
+                standards = [standards]
+            self.standards = standards
+        self.detail = pdef.get('detail', None)
 
-        if pdef:
-            self.sf_required = (pdef.get(mdef.SF) is not None)
-            if self.sf_required:
-                sf = self.pdef.get(mdef.SF)
-                try:
-                    self.sf_value = int(sf)
-                except ValueError:
-                    self.sf = sf
 
-            self.info = mb.point_type_info.get(pdef[mdef.TYPE])
-            plen = pdef.get(mdef.SIZE, None)
-            self.len = self.info.len
-            if plen is not None:
-                self.len = int(plen)
+point_metas = {}
 
-            if data is not None:
-                self._set_data(data=data, offset=data_offset)
 
-            static = pdef.get('static', None)
-            if static and static == 'S':
-                self.static = True
+def get_point_meta(pdef):
+    meta = point_metas.get(id(pdef))
+    if meta is None or meta.pdef is not pdef:
+        meta = PointMeta(pdef)
+        point_metas[id(pdef)] = meta
+    return meta
 
-            standards = pdef.get('standards', None)
-            if standards:
-                if not isinstance(standards, list):
-                    standards = [standards]
-                self.standards = standards
 
-            self.detail = pdef.get('detail', None)
+class BasePoint(object):
+    """Point behavior common to Point and CompactPoint."""
+    __slots__ = ()
 
     def __str__(self):
         return self.disp()
@@ -204,7 +216,62 @@ class Point(object):
                 self.set_value(data=value)
 
     def resolve_sf(self):
-        pass
+        """Bind the point to its scale factor point. Returns the scale factor point, or None if the point does not
+        have a scale factor point.
+        """
+
+        if self.sf:
+            sf = self.group.points.get(self.sf)
+            if sf is None:
+                sf = self.model.points.get(self.sf)
+            if sf is None:
+                raise ModelError('Scale factor %s for point %s not found' % (self.sf, self.pdef['name']))
+            self.sf_point = sf
+            return sf
+
+    def _get_sf_value(self, sf_values=None):
+        # scale factor value from the bound scale factor point, sf_values holds the scale factor point values
+        # already read, if given
+        if self.sf_value is None or not self.static:
+            if self.sf:
+                sf = self.sf_point
+                if sf is None:
+                    sf = self.resolve_sf()
+                if sf_values is None:
+                    self.sf_value = sf.value
+                elif sf in sf_values:
+                    self.sf_value = sf_values[sf]
+                else:
+                    self.sf_value = sf_values[sf] = sf.value
+        return self.sf_value
+
+    def _computed_value(self, v, sf_values=None):
+        # value v scaled by the scale factor of the point
+        if self.sf_required:
+            self._get_sf_value(sf_values)
+        sfv = self.sf_value
+        if sfv:
+            v = round(v * pow10(sfv), -1 * sfv)
+        return v
+
+    @property
+    def dirty(self):
+        """True if the value has been changed without being written. Dirty points are kept in the dirty_points of
+        the model so they can be written without visiting the other points of the model.
+        """
+        return self._dirty
+
+    @dirty.setter
+    def dirty(self, dirty):
+        dirty = bool(dirty)
+        if dirty != self._dirty:
+            self._dirty = dirty
+            dirty_points = getattr(self.model, 'dirty_points', None)
+            if dirty_points is not None:
+                if dirty:
+                    dirty_points[self] = None
+                else:
+                    dirty_points.pop(self, None)
 
     @property
     def value(self):
@@ -229,45 +296,24 @@ class Point(object):
 
         v = self._value
         if computed and v is not None:
-            if self.sf_required:
-                if self.sf_value is None or not self.static:
-                    if self.sf:
-                        sf = self.group.points.get(self.sf)
-                        if sf is None:
-                            sf = self.model.points.get(self.sf)
-                        if sf is not None:
-                            self.sf_value = sf.value
-                        else:
-                            raise ModelError('Scale factor %s for point %s not found' % (self.sf, self.pdef['name']))
-            if self.sf_value:
-                sfv = self.sf_value
-                if sfv:
-                    v = round(v * math.pow(10, sfv), -1 * sfv)
+            v = self._computed_value(v)
 
         return v
 
     def set_value(self, data=None, computed=False, dirty=None):
         v = data
-        if dirty is not None:
+        if dirty is not None and dirty != self._dirty:
             self.dirty = dirty
         if computed:
             if self.sf_required:
-                if self.sf_value is None or not self.static:
-                    if self.sf:
-                        sf = self.group.points.get(self.sf)
-                        if sf is None:
-                            sf = self.model.points.get(self.sf)
-                        if sf is not None:
-                            self.sf_value = sf.value
-                            if sf.value is not None:
-                                self.sf_value = sf.value
-                            else:
-                                raise ModelError('SF field %s value not initialized for point %s' %
-                                                 (self.sf, self.pdef['name']))
-                        else:
-                            raise ModelError('Scale factor %s for point %s not found' % (self.sf, self.pdef['name']))
+                if self._get_sf_value() is None and self.sf:
+                    # bind again in case the scale factor point has been replaced
+                    self.sf_point = None
+                    if self._get_sf_value() is None:
+                        raise ModelError('SF field %s value not initialized for point %s' %
+                                         (self.sf, self.pdef['name']))
             if self.sf_value is not None:
-                self._value = round(round(float(v), abs(self.sf_value)) / math.pow(10, self.sf_value))
+                self._value = round(round(float(v), abs(self.sf_value)) / pow10(self.sf_value))
             else:
                 self._value = v
         else:
@@ -291,19 +337,11 @@ class Point(object):
         data = err = None
         if computed and v is not None:
             if self.sf_required:
-                if self.sf_value is None or not self.static:
-                    if self.sf:
-                        sf = self.group.points.get(self.sf)
-                        if sf is None:
-                            sf = self.model.points.get(self.sf)
-                        if sf is not None:
-                            self.sf_value = sf.value
-                        else:
-                            raise ModelError('Scale factor %s for point %s not found' % (self.sf, self.pdef['name']))
+                self._get_sf_value()
             if self.sf_value:
                 sfv = self.sf_value
                 if sfv:
-                    v = int(v * math.pow(10, sfv))
+                    v = int(v * pow10(sfv))
                 try:
                     data = self.info.to_data(v, (int(self.len) * 2))
                 except Exception as e:
@@ -370,9 +408,199 @@ class Point(object):
         return txt
 
 
+class Point(BasePoint):
+    def __init__(self, pdef=None, model=None, group=None, model_offset=0, data=None, data_offset=0):
+        self.model = model          # model object containing the point
+        self.group = group
+        self.pdef = pdef            # point definition
+        self.len = 0                # mb register len of point
+        self.info = None            # point def info
+        self.offset = model_offset  # mb register offset from beginning of the model
+        self._value = None          # value
+        self._dirty = False         # value has been changed without being written
+        self.sf = None              # scale factor point name
+        self.sf_value = None        # value of scale factor
+        self.sf_point = None        # scale factor point, bound by resolve_sf()
+        self.sf_required = False    # point has a scale factor
+        self.detail = None          # detailed description
+        self.standards = []         # list of standards requiring this point's implementation
+        self.read_func = None       # function to be called on read
+        self.read_func_arg = None   # the argument passed to the read_func
+        self.write_func = None      # function to be called on write
+        self.write_func_arg = None  # the argument passed to the write_func
+        self.static = None
+
+        if pdef:
+            self.sf_required = (pdef.get(mdef.SF) is not None)
+            if self.sf_required:
+                sf = self.pdef.get(mdef.SF)
+                try:
+                    self.sf_value = int(sf)
+                except ValueError:
+                    self.sf = sf
+
+            self.info = mb.point_type_info.get(pdef[mdef.TYPE])
+            plen = pdef.get(mdef.SIZE, None)
+            self.len = self.info.len
+            if plen is not None:
+                self.len = int(plen)
+
+            if data is not None:
+                self._set_data(data=data, offset=data_offset)
+
+            static = pdef.get('static', None)
+            if static and static == 'S':
+                self.static = True
+
+            standards = pdef.get('standards', None)
+            if standards:
+                if not isinstance(standards, list):
+                    standards = [standards]
+                self.standards = standards
+
+            self.detail = pdef.get('detail', None)
+
+
+class CompactPoint(BasePoint):
+    """Point using __slots__ with the attributes derived from the point definition kept in a shared PointMeta
+    instance. Compact points reduce memory use when a large number of models are held in memory. The definition
+    derived attributes are read-only.
+    """
+    __slots__ = ('meta', 'model', 'group', 'offset', '_value', '_dirty', 'sf_value', 'sf_point', 'read_func',
+                 'read_func_arg', 'write_func', 'write_func_arg')
+
+    def __init__(self, pdef=None, model=None, group=None, model_offset=0, data=None, data_offset=0):
+        self.meta = get_point_meta(pdef)
+        self.model = model
+        self.group = group
+        self.offset = model_offset
+        self._value = None
+        self._dirty = False
+        self.sf_value = self.meta.sf_value
+        self.sf_point = None
+        self.read_func = None
+        self.read_func_arg = None
+        self.write_func = None
+        self.write_func_arg = None
+
+        if data is not None:
+            self._set_data(data=data, offset=data_offset)
+
+    @property
+    def pdef(self):
+        return self.meta.pdef
+
+    @property
+    def info(self):
+        return self.meta.info
+
+    @property
+    def len(self):
+        return self.meta.len
+
+    @property
+    def sf(self):
+        return self.meta.sf
+
+    @property
+    def sf_required(self):
+        return self.meta.sf_required
+
+    @property
+    def static(self):
+        return self.meta.static
+
+    @property
+    def standards(self):
+        return self.meta.standards
+
+    @property
+    def detail(self):
+        return self.meta.detail
+
+
+def _float_value(v):
+    if not math.isnan(v):
+        return v
+
+
+class ModelDecoder(object):
+    """Decoder for the complete Modbus data of a model with a specific layout (model definition and repeating group
+    counts). The point formats are combined into a single struct format so the model data is decoded with one
+    unpack_from() call.
+    """
+
+    def __init__(self, gdef, points):
+        self.gdef = gdef
+        self.convert = []
+        fmt = '>'
+        for point in points:
+            size = int(point.len) * 2
+            code = mb.point_type_struct.get(point.pdef[mdef.TYPE])
+            if code is not None and struct.calcsize('>' + code) == size:
+                fmt += code
+                self.convert.append(_float_value if code in 'fd' else None)
+            else:
+                fmt += '%ds' % size
+                self.convert.append(point.info.data_to)
+        self.struct = struct.Struct(fmt)
+        self.size = self.struct.size
+
+    def set_mb(self, points, data, computed=False, dirty=None):
+        values = self.struct.unpack_from(data)
+        for point, v, convert in zip(points, values, self.convert):
+            try:
+                if convert is not None:
+                    v = convert(v)
+                point.set_value(v, computed=computed, dirty=dirty)
+                if not point.info.is_impl(point.value):
+                    point.set_value(None)
+                    point.sf_value = None
+            except Exception as e:
+                point.model.add_error('Error setting value for %s: %s' % (point.pdef[mdef.NAME], str(e)))
+        return self.size // 2
+
+
+model_decoders = {}
+
+
+def get_model_decoder(model):
+    """Get the decoder and list of points for a model instance. Decoders are shared by all models with the same
+    definition and repeating group counts. None is returned if the model contains points that implement their own
+    Modbus decoding.
+    """
+    points = []
+    counts = []
+    if model.gdef is None or not _decoder_points(model, points, counts):
+        return None
+    key = (id(model.gdef), len(points), tuple(counts))
+    decoder = model_decoders.get(key)
+    if decoder is None or decoder.gdef is not model.gdef:
+        decoder = ModelDecoder(model.gdef, points)
+        model_decoders[key] = decoder
+    return decoder, points
+
+
+def _decoder_points(group, points, counts):
+    for point in group.points.values():
+        if type(point).set_mb is not BasePoint.set_mb:
+            return False
+        points.append(point)
+    for g in group.groups.values():
+        if isinstance(g, list):
+            counts.append(len(g))
+            for rg in g:
+                if not _decoder_points(rg, points, counts):
+                    return False
+        elif not _decoder_points(g, points, counts):
+            return False
+    return True
+
+
 class Group(object):
     def __init__(self, gdef=None, model=None, model_offset=0, group_len=0, data=None, data_offset=0, group_class=None,
                  point_class=None, index=None):
+        self._decoder = None
         self.gdef = gdef
         self.model = model
         self.gname = None
@@ -385,10 +613,15 @@ class Group(object):
         self.index = index
         self.access_regions = []
 
+        # models keep the points modified since the last write, in the order they were modified
+        if model is self:
+            self.dirty_points = OrderedDict()
+
         if group_class is None:
             self.group_class = self.__class__
         if point_class is None:
             point_class = Point
+        self.point_class = point_class
 
         if gdef is not None:
             self.gname = gdef[mdef.NAME]
@@ -422,7 +655,7 @@ class Group(object):
                             data_offset += glen
                     else:
                         g = self.group_class(gdef, model=self.model, model_offset=model_offset, data=gdata,
-                                        data_offset=data_offset)
+                                             data_offset=data_offset, point_class=self.point_class)
                         self.groups[gdef[mdef.NAME]] = g
                         model_offset += g.len
                         data_offset += g.len
@@ -551,7 +784,7 @@ class Group(object):
             for i in range(count):
                 gdata = self._group_data(data=data, index=i)
                 g = self.group_class(gdef=gdef, model=self.model, model_offset=model_offset, data=gdata,
-                                     data_offset=data_offset, index=i+1)
+                                     data_offset=data_offset, point_class=self.point_class, index=i+1)
                 model_offset += g.len
                 data_offset += g.len
                 groups.append(g)
@@ -563,7 +796,7 @@ class Group(object):
             if model_len:
                 gdata = self._group_data(data=data, name=gdef[mdef.NAME], index=0)
                 g = self.group_class(gdef=gdef, model=self.model, model_offset=model_offset, data=gdata,
-                                     data_offset=data_offset, index=1)
+                                     data_offset=data_offset, point_class=self.point_class, index=1)
                 group_points_len = g.points_len
                 # count is (model.len - non-repeating points) / group_points_len
                 # (ID and L points are not included in model length)
@@ -590,26 +823,76 @@ class Group(object):
                     for i in range(count - 1):
                         gdata = self._group_data(data=data, index=(i+1))
                         g = self.group_class(gdef=gdef, model=self.model, model_offset=model_offset, data=gdata,
-                                           data_offset=data_offset, index=i+2)
+                                             data_offset=data_offset, point_class=self.point_class, index=i+2)
                         model_offset += g.len
                         data_offset += g.len
                         groups.append(g)
         return groups
 
+    def get_dirty_points(self):
+        """Points of the group, including the points of its groups, that have been modified since the last write,
+        in address order.
+        """
+
+        dirty_points = getattr(self.model, 'dirty_points', None)
+        if not dirty_points:
+            return []
+        if self is self.model:
+            points = list(dirty_points)
+        else:
+            start = self.offset
+            end = start + self.len
+            points = [p for p in dirty_points if start <= p.offset < end]
+        points.sort(key=lambda p: p.offset)
+        return points
+
     def get_dict(self, computed=False):
+        return self._get_dict(computed, {})
+
+    def _get_dict(self, computed, sf_values):
+        # sf_values holds the values of the scale factor points used so far, so each scale factor point is read
+        # once for the group and its groups
         d = {}
-        for pid, p in self.points.items():
-            d[pid] = p.get_value(computed=computed)
+        if computed:
+            for pid, p in self.points.items():
+                if p.read_func:
+                    v = p.get_value(computed=True)
+                else:
+                    v = p._value
+                    if v is not None:
+                        v = p._computed_value(v, sf_values)
+                d[pid] = v
+        else:
+            for pid, p in self.points.items():
+                d[pid] = p.get_value()
         for gid, group in self.groups.items():
             if isinstance(group, list):
                 glist = []
                 for g in group:
-                    glist.append(g.get_dict(computed=computed))
+                    glist.append(g._get_dict(computed, sf_values))
                 d[gid] = glist
             else:
-                d[gid] = group.get_dict(computed=computed)
+                d[gid] = group._get_dict(computed, sf_values)
         return d
 
+    def bind_sf(self):
+        """Bind the points of the group and its groups to their scale factor points.
+        """
+
+        for p in self.points.values():
+            if p.sf:
+                try:
+                    p.resolve_sf()
+                except ModelError:
+                    # reported when a computed value of the point is used
+                    pass
+        for group in self.groups.values():
+            if isinstance(group, list):
+                for g in group:
+                    g.bind_sf()
+            else:
+                group.bind_sf()
+
     def set_dict(self, data=None, computed=False, dirty=None):
         groups = []
         group_def = self.gdef
@@ -651,8 +934,18 @@ class Group(object):
     def set_mb(self, data=None, computed=False, dirty=None):
         if data:
             data_len = len(data)
+            # slices of a memoryview reference the original buffer so the data is not copied for each point and group
+            if not isinstance(data, memoryview):
+                data = memoryview(data)
         else:
             data_len = 0
+        # decode complete model data with the precompiled model decoder
+        if self.model is self and data_len:
+            if self._decoder is None:
+                self._decoder = get_model_decoder(self) or False
+            if self._decoder and data_len >= self._decoder[0].size:
+                decoder, points = self._decoder
+                return decoder.set_mb(points, data, computed=computed, dirty=dirty)
         offset = 0
         for pid, point in self.points.items():
             if data_len > offset:
@@ -698,7 +991,8 @@ class Group(object):
 
 
 class Model(Group):
-    def __init__(self, model_id=None, model_addr=0, model_len=0, model_def=None, data=None, group_class=Group):
+    def __init__(self, model_id=None, model_addr=0, model_len=0, model_def=None, data=None, group_class=Group,
+                 point_class=Point):
         self.model_id = model_id
         self.model_addr = model_addr
         self.model_len = model_len
@@ -718,11 +1012,238 @@ class Model(Group):
             self.add_error(str(e))
 
         Group.__init__(self, gdef=gdef, model=self.model, model_offset=0, group_len=self.model_len, data=data,
-                       data_offset=0, group_class=group_class)
+                       data_offset=0, group_class=group_class, point_class=point_class)
+        self.bind_sf()
+
+    def add_error(self, error_info):
+        self.error_info = '%s%s\n' % (self.error_info, error_info)
+
+    def get_dict(self, computed=False):
+        d = Group.get_dict(self, computed=computed)
+        d['mid'] = self.mid
+        d['error'] = self.error_info
+        d['model_id'] = self.model_id
+        return d
+
+
+class ImageLayout(object):
+    """Register offsets of the points and groups of a group within a model register image. Layouts are shared by all
+    image models with the same model definition, model length and repeating group counts.
+    """
+
+    def __init__(self, group):
+        self.gdef = group.gdef
+        self.gname = group.gname
+        self.offset = group.offset
+        self.len = group.len
+        self.index = group.index
+        self.access_regions = group.access_regions
+        self.error_info = ''
+        self.points = OrderedDict()
+        self.groups = OrderedDict()
+        for name, point in group.points.items():
+            self.points[name] = (point.offset, get_point_meta(point.pdef))
+        for name, g in group.groups.items():
+            if isinstance(g, list):
+                self.groups[name] = [ImageLayout(rg) for rg in g]
+            else:
+                self.groups[name] = ImageLayout(g)
+
+
+image_layouts = {}
+
+
+def _image_layout_key(gdef, model_len, data):
+    # the layout of a model is determined by the model length and the values of the group count points
+    names = mdef.get_group_len_points(gdef)
+    counts = []
+    offset = 0
+    for pdef in gdef.get(mdef.POINTS, []):
+        if not names:
+            break
+        plen = get_point_meta(pdef).len
+        if pdef[mdef.NAME] in names:
+            names.remove(pdef[mdef.NAME])
+            counts.append(bytes(data[offset * 2:(offset + plen) * 2]))
+        offset += plen
+    if names:
+        return None
+    return id(gdef), model_len, tuple(counts)
+
+
+def get_image_layout(model_id, model_def, model_len=0, data=b''):
+    gdef = model_def.get(mdef.GROUP)
+    key = _image_layout_key(gdef, model_len, data)
+    if key is not None:
+        layout = image_layouts.get(key)
+        if layout is not None and layout.gdef is gdef:
+            return layout
+    model = Model(model_id=model_id, model_len=model_len, model_def=model_def, data=bytes(data),
+                  point_class=CompactPoint)
+    layout = ImageLayout(model)
+    layout.error_info = model.error_info
+    if key is not None:
+        image_layouts[key] = layout
+    return layout
+
+
+class ImagePoint(CompactPoint):
+    """View of a point of an image model. The point value is decoded from, and encoded into, the model register
+    image when accessed. Views are created on access and are not retained by the model.
+    """
+    __slots__ = ()
+
+    def __init__(self, model, group, offset, meta):
+        self.meta = meta
+        self.model = model
+        self.group = group
+        self.offset = offset
+        self._dirty = False
+        self.sf_value = meta.sf_value
+        self.sf_point = None
+        self.read_func = None
+        self.read_func_arg = None
+        self.write_func = None
+        self.write_func_arg = None
+
+    @property
+    def _value(self):
+        mb_len = int(self.meta.len) * 2
+        offset = self.offset * 2
+        data = self.model.image[offset:offset + mb_len]
+        if len(data) == mb_len:
+            v = self.meta.info.data_to(data)
+            if v is not None and self.meta.info.is_impl(v):
+                return v
+
+    @_value.setter
+    def _value(self, v):
+        mb_len = int(self.meta.len) * 2
+        offset = self.offset * 2
+        if v is None:
+            data = mb.create_unimpl_value(self.meta.pdef[mdef.TYPE], len=mb_len)
+        else:
+            data = self.meta.info.to_data(v, mb_len)
+        image = self.model.image
+        if len(image) < offset + mb_len:
+            image.extend(b'\x00' * (offset + mb_len - len(image)))
+        image[offset:offset + mb_len] = data
+
+
+class ImagePoints(Mapping):
+    """Mapping of point names to point views of an image group."""
+
+    def __init__(self, group):
+        self.group = group
+
+    def __getitem__(self, name):
+        offset, meta = self.group.layout.points[name]
+        return self.group.model.point_class(self.group.model, self.group, offset, meta)
+
+    def __iter__(self):
+        return iter(self.group.layout.points)
+
+    def __len__(self):
+        return len(self.group.layout.points)
+
+
+class ImageGroup(Group):
+    """Group of an image model. Points are accessed through views on the model register image."""
+
+    def __init__(self, layout, model):
+        self._decoder = False
+        self._groups = None
+        self.layout = layout
+        self.model = model
+        self.gdef = layout.gdef
+        self.gname = layout.gname
+        self.offset = layout.offset
+        self.len = layout.len
+        self.index = layout.index
+        self.access_regions = layout.access_regions
+        self.group_class = self.__class__
+        self.points = ImagePoints(self)
+
+    @property
+    def groups(self):
+        if self._groups is None:
+            self._groups = OrderedDict()
+            for name, layout in self.layout.groups.items():
+                if isinstance(layout, list):
+                    self._groups[name] = [ImageGroup(gl, self.model) for gl in layout]
+                else:
+                    self._groups[name] = ImageGroup(layout, self.model)
+        return self._groups
+
+    def get_mb(self, computed=False):
+        offset = self.offset * 2
+        mb_len = self.len * 2
+        if not computed and len(self.model.image) >= offset + mb_len:
+            return bytes(self.model.image[offset:offset + mb_len])
+        return Group.get_mb(self, computed=computed)
+
+    def set_mb(self, data=None, computed=False, dirty=None):
+        if computed or not data:
+            return Group.set_mb(self, data=data, computed=computed, dirty=dirty)
+        mb_len = min(len(data), self.len * 2)
+        offset = self.offset * 2
+        image = self.model.image
+        if len(image) < offset + mb_len:
+            image.extend(b'\x00' * (offset + mb_len - len(image)))
+        image[offset:offset + mb_len] = data[:mb_len]
+        return self.len
+
+
+class ImageModel(ImageGroup):
+    """Model that keeps its Modbus data in a single register image instead of a point object per point. Point values
+    are decoded from the image through a per-layout offset index when accessed, so creating and updating the model
+    does not allocate point objects. Point attribute access and the dict, JSON and Modbus get/set methods work as
+    for Model. Dirty state is not tracked for image model points.
+    """
+    point_class = ImagePoint
+
+    def __init__(self, model_id=None, model_addr=0, model_len=0, model_def=None, data=None):
+        self.model_id = model_id
+        self.model_addr = model_addr
+        self.model_len = model_len
+        self.model_def = model_def
+        self.error_info = ''
+        self.mid = None
+        self.device = None
+        self.model = self
+        self.image = bytearray()
+
+        if data is None:
+            data = b''
+        layout = None
+        try:
+            if self.model_def is None and model_id is not None:
+                self.model_def = get_model_def(model_id)
+            if self.model_def is not None:
+                layout = get_image_layout(model_id, self.model_def, model_len=model_len, data=data)
+        except Exception as e:
+            self.add_error(str(e))
+        if layout is None:
+            layout = ImageLayout(Group())
+        ImageGroup.__init__(self, layout, self)
+        if layout.error_info:
+            self.add_error(layout.error_info.rstrip('\n'))
+        self.image.extend(data[:self.len * 2])
 
     def add_error(self, error_info):
         self.error_info = '%s%s\n' % (self.error_info, error_info)
 
+    def set_mb(self, data=None, computed=False, dirty=None):
+        if computed or not data:
+            return ImageGroup.set_mb(self, data=data, computed=computed, dirty=dirty)
+        # update the layout if the group counts have changed
+        if self.model_def is not None:
+            layout = get_image_layout(self.model_id, self.model_def, model_len=self.model_len, data=data)
+            if layout is not self.layout:
+                ImageGroup.__init__(self, layout, self)
+        self.image[:] = data[:self.len * 2]
+        return self.len
+
     def get_dict(self, computed=False):
         d = Group.get_dict(self, computed=computed)
         d['mid'] = self.mid
@@ -791,6 +1312,8 @@ class Device(object):
     def set_mb(self, data=None, computed=False, dirty=None):
         if data:
             data_len = len(data)
+            if not isinstance(data, memoryview):
+                data = memoryview(data)
         else:
             data_len = 0
         offset = 0
@@ -339,3 +339,26 @@ point_type_info = {
     mdef.TYPE_SUNSSF: PointInfo(1, is_impl_sunssf, data_to_s16, s16_to_data, mdef.to_int, 0),
     mdef.TYPE_EUI48: PointInfo(4, is_impl_eui48, data_to_eui48, eui48_to_data, mdef.to_str, 0)
 }
+
+# struct format codes for point types with a fixed size binary representation
+point_type_struct = {
+    mdef.TYPE_INT16: 'h',
+    mdef.TYPE_UINT16: 'H',
+    mdef.TYPE_COUNT: 'H',
+    mdef.TYPE_ACC16: 'H',
+    mdef.TYPE_ENUM16: 'H',
+    mdef.TYPE_BITFIELD16: 'H',
+    mdef.TYPE_PAD: 'H',
+    mdef.TYPE_INT32: 'i',
+    mdef.TYPE_UINT32: 'I',
+    mdef.TYPE_ACC32: 'I',
+    mdef.TYPE_ENUM32: 'I',
+    mdef.TYPE_BITFIELD32: 'I',
+    mdef.TYPE_IPADDR: 'I',
+    mdef.TYPE_INT64: 'q',
+    mdef.TYPE_UINT64: 'Q',
+    mdef.TYPE_ACC64: 'Q',
+    mdef.TYPE_FLOAT32: 'f',
+    mdef.TYPE_FLOAT64: 'd',
+    mdef.TYPE_SUNSSF: 'h'
+}
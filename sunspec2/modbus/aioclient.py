@@ -0,0 +1,447 @@
+"""
+    Copyright (C) 2020 SunSpec Alliance
+
+    Permission is hereby granted, free of charge, to any person obtaining a
+    copy of this software and associated documentation files (the "Software"),
+    to deal in the Software without restriction, including without limitation
+    the rights to use, copy, modify, merge, publish, distribute, sublicense,
+    and/or sell copies of the Software, and to permit persons to whom the
+    Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included
+    in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+    THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+    FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+    IN THE SOFTWARE.
+"""
+
+import asyncio
+import struct
+import uuid
+try:
+    import ssl
+except Exception as e:
+    print('Missing ssl python package: %s' % e)
+
+from sunspec2 import mdef, device, mb
+import sunspec2.modbus.modbus as modbus_client
+from sunspec2.modbus.client import SunSpecModbusClientError, dirty_runs
+
+
+class AsyncModbusClientTCP(object):
+    """Provides asyncio access to a Modbus TCP device. Requests on a connection are serialized so a client may be
+    shared by multiple tasks.
+
+    Parameters:
+        slave_id :
+            Modbus slave id.
+        ipaddr :
+            IP address string.
+        ipport :
+            IP port.
+        timeout :
+            Modbus request timeout in seconds. Fractional seconds are permitted such as .5.
+        ctx :
+            Context variable to be used by the object creator. Not used by the modbus module.
+        trace_func :
+            Trace function to use for detailed logging. No detailed logging is perform is a trace function is
+            not supplied.
+        tls :
+            Use TLS (Modbus/TCP Security). Defaults to `tls=False`.
+        cafile :
+            Path to certificate authority (CA) certificate to use for validating server certificates.
+            Only used if `tls=True`.
+        certfile :
+            Path to client TLS certificate to use for client authentication. Only used if `tls=True`.
+        keyfile :
+            Path to client TLS key to use for client authentication. Only used if `tls=True`.
+        insecure_skip_tls_verify :
+            Skip verification of server TLS certificate. Only used if `tls=True`.
+        max_count :
+            Maximum register count for a single Modbus request.
+        max_write_count :
+            Maximum register count for a single Modbus write.
+    """
+
+    def __init__(self, slave_id=1, ipaddr='127.0.0.1', ipport=502, timeout=None, ctx=None, trace_func=None,
+                 tls=False, cafile=None, certfile=None, keyfile=None, insecure_skip_tls_verify=False,
+                 max_count=modbus_client.REQ_COUNT_MAX, max_write_count=modbus_client.REQ_WRITE_COUNT_MAX):
+        self.slave_id = slave_id
+        self.ipaddr = ipaddr
+        self.ipport = ipport
+        self.timeout = timeout
+        self.ctx = ctx
+        self.trace_func = trace_func
+        self.tls = tls
+        self.cafile = cafile or modbus_client.CAFILE
+        self.certfile = certfile or modbus_client.CLIENT_CERTFILE
+        self.keyfile = keyfile or modbus_client.CLIENT_KEYFILE
+        self.tls_verify = not insecure_skip_tls_verify
+        self.max_count = max_count
+        self.max_write_count = max_write_count
+        self.reader = None
+        self.writer = None
+        self.trans_id = 0
+        self._lock = None
+
+        if ipport is None:
+            self.ipport = modbus_client.TCP_DEFAULT_PORT
+        if timeout is None:
+            self.timeout = modbus_client.TCP_DEFAULT_TIMEOUT
+
+    async def connect(self, timeout=None):
+        """Connect to TCP destination.
+
+        Parameters:
+
+            timeout :
+                Connection timeout in seconds.
+        """
+        if self.writer is not None:
+            await self.disconnect()
+
+        if timeout is None:
+            timeout = self.timeout
+
+        context = None
+        if self.tls:
+            context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH, cafile=self.cafile)
+            context.load_cert_chain(certfile=self.certfile, keyfile=self.keyfile)
+            context.check_hostname = self.tls_verify
+
+        try:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.ipaddr, self.ipport, ssl=context), timeout)
+        except Exception as e:
+            self.reader = self.writer = None
+            raise modbus_client.ModbusClientError('Connection error: %s' % str(e))
+
+    async def disconnect(self):
+        """Disconnect from TCP destination.
+        """
+
+        try:
+            if self.writer is not None:
+                self.writer.close()
+                await self.writer.wait_closed()
+        except Exception:
+            pass
+        self.reader = self.writer = None
+
+    async def close(self):
+        await self.disconnect()
+
+    def is_connected(self):
+        return self.writer is not None
+
+    def _trace(self, prefix, data):
+        if self.trace_func:
+            s = prefix
+            for c in data:
+                s += '%02X' % c
+            self.trace_func(s)
+
+    def _get_lock(self):
+        # the lock is created on first use so it belongs to the running event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _request(self, pdu):
+        # perform a request on the connection, the caller holds the request lock
+        self.trans_id = (self.trans_id % 0xffff) + 1
+        req = struct.pack('>HHHB', self.trans_id, 0, len(pdu) + 1, int(self.slave_id)) + pdu
+        self._trace('> ', req)
+
+        try:
+            self.writer.write(req)
+            await self.writer.drain()
+        except Exception as e:
+            await self.disconnect()
+            raise modbus_client.ModbusClientSocketError('Socket write error: %s' % str(e))
+
+        # a partly read or late response leaves the stream out of step with the requests, so the connection is
+        # closed on any receive error
+        try:
+            while True:
+                resp = await asyncio.wait_for(self._recv(), self.timeout)
+                # discard late responses to earlier requests
+                if struct.unpack('>H', resp[:2])[0] == self.trans_id:
+                    break
+        except asyncio.TimeoutError:
+            await self.disconnect()
+            raise modbus_client.ModbusClientTimeout('Response timeout')
+        except asyncio.IncompleteReadError:
+            await self.disconnect()
+            raise modbus_client.ModbusClientConnectionClosed('Connection closed')
+
+        self._trace('< ', resp)
+        if resp[modbus_client.TCP_HDR_LEN + 1] & 0x80:
+            except_code = resp[modbus_client.TCP_HDR_LEN + 2]
+            raise modbus_client.ModbusClientException('Modbus exception %d' % except_code, except_code=except_code)
+        return resp
+
+    async def _recv(self):
+        resp = await self.reader.readexactly(modbus_client.TCP_HDR_LEN + modbus_client.TCP_RESP_MIN_LEN)
+        data_len = struct.unpack('>H', resp[modbus_client.TCP_HDR_O_LEN:modbus_client.TCP_HDR_O_LEN + 2])[0]
+        remaining = data_len - (len(resp) - modbus_client.TCP_HDR_LEN)
+        if remaining > 0:
+            resp += await self.reader.readexactly(remaining)
+        return resp
+
+    async def read(self, addr, count, op=modbus_client.FUNC_READ_HOLDING):
+        """ Read Modbus device registers. If no connection exists to the
+        destination, one is created and disconnected at the end of the request.
+
+        Parameters:
+
+            addr :
+                Starting Modbus address.
+
+            count :
+                Read length in Modbus registers.
+
+            op :
+                Modbus function code for request.
+
+        Returns:
+
+            Byte string containing register contents.
+        """
+
+        resp = bytearray()
+        read_offset = 0
+        local_connect = False
+
+        async with self._get_lock():
+            if self.writer is None:
+                local_connect = True
+                await self.connect(self.timeout)
+
+            try:
+                while count > 0:
+                    read_count = min(count, self.max_count)
+                    pdu = struct.pack('>BHH', op, int(addr + read_offset), int(read_count))
+                    data = await self._request(pdu)
+                    resp += data[(modbus_client.TCP_HDR_LEN + 3):]
+                    count -= read_count
+                    read_offset += read_count
+            finally:
+                if local_connect:
+                    await self.disconnect()
+
+        return bytes(resp)
+
+    async def write(self, addr, data):
+        """ Write Modbus device registers. If no connection exists to the
+        destination, one is created and disconnected at the end of the request.
+
+        Parameters:
+
+            addr :
+                Starting Modbus address.
+
+            data :
+                Byte string containing register contents.
+        """
+
+        write_offset = 0
+        local_connect = False
+        count = len(data) // 2
+
+        async with self._get_lock():
+            if self.writer is None:
+                local_connect = True
+                await self.connect(self.timeout)
+
+            try:
+                if count == 1:
+                    pdu = struct.pack('>BH', modbus_client.FUNC_WRITE_SINGLE, int(addr)) + data
+                    await self._request(pdu)
+                else:
+                    while count > 0:
+                        write_count = min(count, self.max_write_count)
+                        start = write_offset * 2
+                        end = (write_offset + write_count) * 2
+                        pdu = struct.pack('>BHHB', modbus_client.FUNC_WRITE_MULTIPLE, int(addr + write_offset),
+                                          write_count, write_count * 2) + data[start:end]
+                        await self._request(pdu)
+                        count -= write_count
+                        write_offset += write_count
+            finally:
+                if local_connect:
+                    await self.disconnect()
+
+
+class AsyncSunSpecModbusClientModel(device.Model):
+    """Model whose contents are transferred to and from the device using asyncio. The model, group and point
+    objects are the standard :class:`sunspec2.device` objects so decoding and value access is the same as for the
+    blocking clients.
+    """
+
+    def __init__(self, model_id=None, model_addr=0, model_len=0, model_def=None, data=None, mb_device=None,
+                 group_class=device.Group):
+        device.Model.__init__(self, model_id=model_id, model_addr=model_addr, model_len=model_len,
+                              model_def=model_def, data=data, group_class=group_class)
+        self.device = mb_device
+
+        if self.model_len is not None:
+            self.len = self.model_len
+
+    async def read(self):
+        if self.access_regions:
+            data = bytearray()
+            for offset, count in self.access_regions:
+                data += await self.device.read(self.model_addr + offset, count)
+            data = bytes(data)
+        else:
+            data = await self.device.read(self.model_addr, self.len + 2)
+        self.set_mb(data=data, dirty=False)
+
+    async def write(self):
+        """Write all points that have been modified since the last write operation to the physical device."""
+        for addr, data, points in dirty_runs(self, self.device.max_write_count, self.device.write_gap):
+            await self.device.write(addr, data)
+            for point in points:
+                point.dirty = False
+
+
+class AsyncSunSpecModbusClientDeviceTCP(device.Device):
+    """asyncio version of :class:`sunspec2.modbus.client.SunSpecModbusClientDeviceTCP`. The connect, scan, read
+    and write methods are coroutines, so a single event loop can poll many devices concurrently.
+    """
+
+    def __init__(self, slave_id=1, ipaddr='127.0.0.1', ipport=502, timeout=None, ctx=None, trace_func=None,
+                 tls=False, cafile=None, certfile=None, keyfile=None, insecure_skip_tls_verify=False,
+                 max_count=modbus_client.REQ_COUNT_MAX, max_write_count=modbus_client.REQ_WRITE_COUNT_MAX,
+                 model_class=AsyncSunSpecModbusClientModel):
+        device.Device.__init__(self, model_class=model_class)
+        self.did = str(uuid.uuid4())
+        self.base_addr_list = [40000, 0, 50000]
+        self.base_addr = None
+
+        self.slave_id = slave_id
+        self.ipaddr = ipaddr
+        self.ipport = ipport
+        self.timeout = timeout
+        self.ctx = ctx
+        self.trace_func = trace_func
+        self.max_count = max_count
+        self.max_write_count = max_write_count
+        self.write_gap = 0
+
+        self.client = AsyncModbusClientTCP(slave_id=slave_id, ipaddr=ipaddr, ipport=ipport, timeout=timeout, ctx=ctx,
+                                           trace_func=trace_func, tls=tls, cafile=cafile, certfile=certfile,
+                                           keyfile=keyfile, insecure_skip_tls_verify=insecure_skip_tls_verify,
+                                           max_count=max_count, max_write_count=max_write_count)
+
+    async def connect(self, timeout=None):
+        await self.client.connect(timeout)
+
+    async def disconnect(self):
+        await self.client.disconnect()
+
+    async def close(self):
+        await self.client.close()
+
+    def is_connected(self):
+        return self.client.is_connected()
+
+    async def read(self, addr, count, op=modbus_client.FUNC_READ_HOLDING):
+        return await self.client.read(addr, count, op)
+
+    async def write(self, addr, data):
+        return await self.client.write(addr, data)
+
+    async def scan(self, progress=None, delay=None, connect=True, full_model_read=True):
+        """Scan all the models of the physical device and create the
+        corresponding model objects within the device object based on the
+        SunSpec model definitions.
+        """
+        self.base_addr = None
+        self.delete_models()
+
+        data = b''
+        connected = False
+
+        if connect:
+            await self.connect()
+            connected = True
+
+            if delay is not None:
+                await asyncio.sleep(delay)
+
+        try:
+            error_dict = {}
+            for addr in self.base_addr_list:
+                try:
+                    data = await self.read(addr, 3)
+                    if data[:4] == b'SunS':
+                        self.base_addr = addr
+                        break
+                    error_dict[addr] = 'Device responded - not SunSpec register map'
+                except Exception as e:
+                    error_dict[addr] = str(e)
+
+                if delay is not None:
+                    await asyncio.sleep(delay)
+
+            if self.base_addr is None:
+                error = 'Error scanning SunSpec base addresses. \n'
+                for k, v in error_dict.items():
+                    error += 'Base address %s error = %s. \n' % (k, v)
+                raise SunSpecModbusClientError(error)
+
+            model_id = mb.data_to_u16(data[4:6])
+            addr = self.base_addr + 2
+            mid = 0
+            while model_id != mb.SUNS_END_MODEL_ID:
+                # read model and model len separately due to some devices not supplying
+                # count for the end model id
+                model_len_data = await self.read(addr + 1, 1)
+                if len(model_len_data) != 2:
+                    break
+                if progress is not None:
+                    cont = progress('Scanning model %s' % model_id)
+                    if not cont:
+                        raise SunSpecModbusClientError('Device scan terminated')
+                model_len = mb.data_to_u16(model_len_data)
+
+                model_def = None
+                try:
+                    model_def = device.get_model_def(model_id)
+                except Exception:
+                    pass
+
+                # read the entire model so the model tree can be built, including repeating group counts
+                if model_def is not None and full_model_read:
+                    model_data = await self.read(addr, model_len + 2)
+                else:
+                    model_data = mb.u16_to_data(model_id) + model_len_data
+                    if model_def is not None:
+                        count = mdef.get_group_len_points_index(model_def.get(mdef.GROUP)) - 2
+                        if count > 0:
+                            model_data += await self.read(addr + 2, count)
+
+                model = self.model_class(model_id=model_id, model_addr=addr, model_len=model_len, model_def=model_def,
+                                         data=model_data, mb_device=self)
+                model.mid = '%s_%s' % (self.did, mid)
+                mid += 1
+                self.add_model(model)
+
+                addr += model_len + 2
+                model_id_data = await self.read(addr, 1)
+                if len(model_id_data) != 2:
+                    break
+                model_id = mb.data_to_u16(model_id_data)
+
+                if delay is not None:
+                    await asyncio.sleep(delay)
+        finally:
+            if connected:
+                await self.disconnect()
@@ -20,6 +20,9 @@
     IN THE SOFTWARE.
 """
 
+import json
+import os
+import random
 import time
 import uuid
 from sunspec2 import mdef, device, mb
@@ -52,14 +55,20 @@ class SunSpecModbusClientException(SunSpecModbusClientError):
     pass
 
 
+class SunSpecModbusClientCircuitOpen(SunSpecModbusClientError):
+    pass
+
+
 class SunSpecModbusClientPoint(device.Point):
 
     def read(self):
         data = self.model.device.read(self.model.model_addr + self.offset, self.len)
         self.set_mb(data=data, dirty=False)
 
-    def write(self):
-        """Write the point to the physical device"""
+    def write(self, verify=False):
+        """Write the point to the physical device. If verify is True, the point is read back in the same request
+        when the device supports it, and SunSpecModbusClientError is raised if the device does not hold the written
+        value."""
         try:
             data = self.info.to_data(self.value, int(self.len) * 2)
         except Exception as e:
@@ -68,9 +77,24 @@ class SunSpecModbusClientPoint(device.Point):
         model_addr = self.model.model_addr
         point_offset = self.offset
         addr = model_addr + point_offset
+        if verify:
+            resp = self.model.device.read_write(addr, int(self.len), addr, data)
+            _verify_points(addr, data, resp, [self])
+            return
         self.model.device.write(addr, data)
         self.dirty = False
 
+    def broadcast(self):
+        """Write the point to all the devices on the bus of the device with a broadcast request. The devices must
+        have the point at the same address."""
+        try:
+            data = self.info.to_data(self.value, int(self.len) * 2)
+        except Exception as e:
+            raise SunSpecModbusValueError('Point value error for %s %s: %s' % (self.pdef.get(mdef.NAME), self.value,
+                                                                               str(e)))
+        self.model.device.broadcast(self.model.model_addr + self.offset, data)
+        self.dirty = False
+
 
 class SunSpecModbusClientGroup(device.Group):
 
@@ -90,10 +114,9 @@ class SunSpecModbusClientGroup(device.Group):
             self.model.device.connect()
 
         if self.access_regions:
-            data = bytearray()
-            for region in self.access_regions:
-                data += self.model.device.read(self.model.model_addr + self.offset + region[0], region[1])
-            data = bytes(data)
+            base_addr = self.model.model_addr + self.offset
+            regions = [(base_addr + region[0], region[1]) for region in self.access_regions]
+            data = b''.join(self.model.device.read_regions(regions))
         else:
             data = self.model.device.read(self.model.model_addr + self.offset, len)
         self.set_mb(data=data, dirty=False)
@@ -102,12 +125,44 @@ class SunSpecModbusClientGroup(device.Group):
         if not connected:
             self.model.device.disconnect()
 
-    def write(self):
-        start_addr = next_addr = self.model.model_addr + self.offset
-        data = b''
-        start_addr, next_addr, data = self.write_points(start_addr, next_addr, data)
-        if data:
-            self.model.device.write(start_addr, data)
+    def write(self, verify=False):
+        """
+        Write all points of the group that have been modified since the last write operation to the physical device.
+        Only the modified points are visited, contiguous points are written in a single request.
+
+        If verify is True, the written registers are read back in the same request when the device supports Read/
+        Write Multiple Registers (function code 23), or with a separate read when it does not. The points are updated
+        with the values read back and SunSpecModbusClientError is raised if the device does not hold the written
+        values.
+        """
+
+        mb_device = self.model.device
+        max_count = getattr(mb_device, 'max_write_count', modbus_client.REQ_WRITE_COUNT_MAX)
+        if verify:
+            max_count = min(max_count, modbus_client.REQ_READ_WRITE_COUNT_MAX)
+        for addr, data, points in dirty_runs(self, max_count, getattr(mb_device, 'write_gap', 0)):
+            if verify:
+                resp = mb_device.read_write(addr, len(data) // 2, addr, data)
+                _verify_points(addr, data, resp, points)
+                continue
+            mb_device.write(addr, data)
+            for point in points:
+                point.dirty = False
+
+    def broadcast(self):
+        """
+        Write all points of the group that have been modified since the last write operation to all the devices on
+        the bus of the device with broadcast requests. The devices must have the model at the same address. Devices do
+        not respond to broadcast requests, so the write can not be verified. Only the modified points are sent, gaps
+        between them are never filled with the values of this device.
+        """
+
+        mb_device = self.model.device
+        max_count = getattr(mb_device, 'max_write_count', modbus_client.REQ_WRITE_COUNT_MAX)
+        for addr, data, points in dirty_runs(self, max_count):
+            mb_device.broadcast(addr, data)
+            for point in points:
+                point.dirty = False
 
     def write_points(self, start_addr=None, next_addr=None, data=None):
         """
@@ -154,6 +209,8 @@ class SunSpecModbusClientModel(SunSpecModbusClientGroup):
         self.mid = None
         self.device = mb_device
         self.model = self
+        self.static_read = False
+        self._dynamic_plan = None
 
         gdef = None
         try:
@@ -184,20 +241,380 @@ class SunSpecModbusClientModel(SunSpecModbusClientGroup):
                 self.add_error('Model error: Discovered length %s does not match computed length %s' %
                                (self.model_len, self.len))
 
+        self.bind_sf()
+
     def add_error(self, error_info):
         self.error_info = '%s%s\n' % (self.error_info, error_info)
 
     def read(self, len=None):
+        # with the device static cache enabled, static points are read once and later reads only read the dynamic
+        # points
+        if self.static_read and getattr(self.device, 'static_cache', False):
+            self.dynamic_plan().read()
+            return
         SunSpecModbusClientGroup.read(self, len=self.len + 2)
+        self.static_read = True
+
+    def dynamic_plan(self):
+        """Read plan for the dynamic points of the model. Models in the static_models list of the device have no
+        dynamic points.
+        """
+
+        plan = self._dynamic_plan
+        if plan is None:
+            points = []
+            if self.model_id not in getattr(self.device, 'static_models', ()):
+                _dynamic_points(self, points)
+            # scale factors are either static and already read, or dynamic and included in the points
+            plan = self._dynamic_plan = SunSpecModbusClientReadPlan(points, scale_factors=False)
+        return plan
+
+    def invalidate(self):
+        """Invalidate the cached static points, the next read reads the whole model.
+        """
+
+        self.static_read = False
+        self._dynamic_plan = None
+
+
+def dirty_runs(group, max_count, gap=0):
+    """Contiguous register runs of the dirty points of a group, used by the clients to write the modified points.
+    Gaps of up to gap registers between dirty points are filled with the values of the points in the gap.
+
+    Parameters:
+        group :
+            Group or model, the model must have a model_addr.
+        max_count :
+            Maximum register count of a run.
+        gap :
+            Maximum number of registers between two dirty points that are filled to write them in one run.
+
+    Returns:
+        Generator of (addr, data, points) tuples, where points is the list of dirty points in the run.
+    """
+    model = group.model
+    model_addr = model.model_addr
+    start_addr = next_addr = None
+    data = b''
+    run = []
+    for point in group.get_dirty_points():
+        point_addr = model_addr + point.offset
+        point_len = int(point.len)
+        if run and point_addr != next_addr and point_addr - next_addr <= gap and \
+                point_addr + point_len - start_addr <= max_count:
+            fill = _gap_data(model, next_addr - model_addr, point.offset)
+            if fill is not None:
+                data += fill
+                next_addr = point_addr
+        if run and (point_addr != next_addr or next_addr + point_len - start_addr > max_count):
+            yield start_addr, data, run
+            data = b''
+            run = []
+        try:
+            point_data = point.info.to_data(point.value, point_len * 2)
+        except Exception as e:
+            raise SunSpecModbusValueError('Point value error for %s %s: %s' % (point.pdef.get(mdef.NAME), point.value,
+                                                                               str(e)))
+        if not run:
+            start_addr = point_addr
+        next_addr = point_addr + point_len
+        data += point_data
+        run.append(point)
+    if run:
+        yield start_addr, data, run
+
+
+def _verify_points(addr, data, resp, points):
+    # update the points written at addr with the registers read back and check they hold the written values
+    errors = []
+    for point in points:
+        start = (point.model.model_addr + point.offset - addr) * 2
+        end = start + int(point.len) * 2
+        point.set_mb(data=resp[start:end], dirty=False)
+        if resp[start:end] != data[start:end]:
+            errors.append('%s %s' % (point.pdef.get(mdef.NAME), point.value))
+    if errors:
+        raise SunSpecModbusClientError('Write verify error, values read back: %s' % ', '.join(errors))
+
+
+def _gap_data(model, offset, end):
+    # data for the registers from offset to end from the current values of the points, None if the registers are
+    # not all covered by writable points with a value
+    index = getattr(model, '_offset_points', None)
+    if index is None:
+        index = model._offset_points = {}
+        _index_points(model, index)
+    data = b''
+    while offset < end:
+        point = index.get(offset)
+        if point is None or point.pdef.get(mdef.ACCESS) != mdef.ACCESS_RW:
+            return None
+        value = point.value
+        if value is None:
+            return None
+        try:
+            data += point.info.to_data(value, int(point.len) * 2)
+        except Exception:
+            return None
+        offset += int(point.len)
+    if offset == end:
+        return data
+
+
+def _index_points(group, index):
+    for point in group.points.values():
+        index[point.offset] = point
+    for g in group.groups.values():
+        if isinstance(g, list):
+            for rg in g:
+                _index_points(rg, index)
+        else:
+            _index_points(g, index)
+
+
+def _dynamic_points(group, points):
+    for point in group.points.values():
+        if not point.static and point.pdef[mdef.TYPE] != mdef.TYPE_PAD:
+            points.append(point)
+    for g in group.groups.values():
+        if isinstance(g, list):
+            for rg in g:
+                _dynamic_points(rg, points)
+        else:
+            _dynamic_points(g, points)
+
+
+class SunSpecModbusClientCompactPoint(device.CompactPoint):
+    __slots__ = ()
+
+    read = SunSpecModbusClientPoint.read
+    write = SunSpecModbusClientPoint.write
+    broadcast = SunSpecModbusClientPoint.broadcast
+
+
+class SunSpecModbusClientCompactModel(SunSpecModbusClientModel):
+    """Model using compact points. Pass as the model_class of a device to reduce the memory used by scanned models.
+    """
+    def __init__(self, model_id=None, model_addr=0, model_len=0, model_def=None, data=None, mb_device=None,
+                 group_class=SunSpecModbusClientGroup, point_class=SunSpecModbusClientCompactPoint):
+        SunSpecModbusClientModel.__init__(self, model_id=model_id, model_addr=model_addr, model_len=model_len,
+                                          model_def=model_def, data=data, mb_device=mb_device,
+                                          group_class=group_class, point_class=point_class)
+
+
+class SunSpecModbusClientImagePoint(device.ImagePoint):
+    __slots__ = ()
+
+    read = SunSpecModbusClientPoint.read
+    write = SunSpecModbusClientPoint.write
+    broadcast = SunSpecModbusClientPoint.broadcast
+
+
+class SunSpecModbusClientImageModel(device.ImageModel):
+    """Image model for Modbus client devices. Pass as the model_class of a device to keep the register image of each
+    scanned model instead of point objects.
+    """
+    point_class = SunSpecModbusClientImagePoint
+
+    def __init__(self, model_id=None, model_addr=0, model_len=0, model_def=None, data=None, mb_device=None):
+        try:
+            if model_def is None:
+                model_def = device.get_model_def(model_id)
+        except Exception:
+            pass
+
+        # if data len < largest point index that contains a group len, read the rest of the point data
+        if model_def is not None and data is not None:
+            group_len_points_index = mdef.get_group_len_points_index(model_def.get(mdef.GROUP))
+            data_regs = len(data) // 2
+            remaining = group_len_points_index - data_regs
+            if remaining > 0:
+                data += mb_device.read(model_addr + data_regs, remaining)
+
+        device.ImageModel.__init__(self, model_id=model_id, model_addr=model_addr, model_len=model_len,
+                                   model_def=model_def, data=data)
+        self.device = mb_device
+
+    def read(self, len=None):
+        if len is None:
+            len = self.len
+        connected = self.device.is_connected()
+        if not connected:
+            self.device.connect()
+
+        if self.access_regions:
+            regions = [(self.model_addr + region[0], region[1]) for region in self.access_regions]
+            data = b''.join(self.device.read_regions(regions))
+        else:
+            data = self.device.read(self.model_addr, len)
+        self.set_mb(data=data, dirty=False)
+
+        if not connected:
+            self.device.disconnect()
+
+
+class RetryPolicy(object):
+    """Retry policy for device requests. Timeouts, CRC errors and Modbus exception responses are retried
+    separately. The delay before each retry grows exponentially with random jitter.
+
+    Parameters:
+        timeouts :
+            Number of retries after a request timeout. If None, the retry_count of the device is used.
+        crc_errors :
+            Number of retries after a CRC error. If None, the retry_count of the device is used.
+        exceptions :
+            Number of retries after a Modbus exception response with one of the codes in except_codes.
+        except_codes :
+            Modbus exception codes that are retried. Other exception responses are not retried. The default codes
+            are the transient ones: acknowledge, device busy and gateway target failed to respond.
+        base_delay :
+            Delay in seconds before the first retry.
+        max_delay :
+            Maximum delay in seconds before a retry.
+        jitter :
+            If True, each delay is a random value between half and all of the backoff delay, so devices that fail
+            together do not retry together.
+    """
+
+    def __init__(self, timeouts=None, crc_errors=None, exceptions=1,
+                 except_codes=(modbus_client.EXCEPT_ACKNOWLEDGE, modbus_client.EXCEPT_DEVICE_BUSY,
+                               modbus_client.EXCEPT_GATEWAY_TARGET),
+                 base_delay=0.1, max_delay=2.0, jitter=True):
+        self.timeouts = timeouts
+        self.crc_errors = crc_errors
+        self.exceptions = exceptions
+        self.except_codes = except_codes
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def retries(self, e, retry_count=0):
+        """Number of retries of a request that failed with error e.
+        """
+
+        if isinstance(e, modbus_client.ModbusClientTimeout):
+            return retry_count if self.timeouts is None else self.timeouts
+        if isinstance(e, modbus_client.ModbusClientCRCError):
+            return retry_count if self.crc_errors is None else self.crc_errors
+        if isinstance(e, modbus_client.ModbusClientException):
+            if e.except_code in self.except_codes:
+                return self.exceptions
+        return 0
+
+    def delay(self, attempt):
+        """Delay in seconds before retry number attempt, starting at 0.
+        """
+
+        delay = min(self.base_delay * (2 ** attempt), self.max_delay)
+        if self.jitter:
+            delay = random.uniform(delay / 2, delay)
+        return delay
+
+
+class CircuitBreaker(object):
+    """Circuit breaker for the requests to a device. After failure_threshold consecutive failed requests the
+    circuit opens and requests fail immediately with SunSpecModbusClientCircuitOpen instead of waiting for the
+    device to time out. After reset_timeout seconds the circuit is half open and the next request is tried. If it
+    succeeds the circuit closes, otherwise it opens again with the reset timeout doubled, up to max_reset_timeout.
+
+    A Modbus exception response shows that the device is reachable and is not counted as a failure, except the
+    gateway path unavailable and gateway target failed to respond codes.
+
+    Parameters:
+        failure_threshold :
+            Number of consecutive failures that open the circuit.
+        reset_timeout :
+            Time in seconds the circuit stays open before a request is tried.
+        max_reset_timeout :
+            Maximum reset timeout in seconds.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0, max_reset_timeout=300.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.failures = 0
+        self.opened = None
+        self.open_timeout = reset_timeout
+
+    @property
+    def state(self):
+        if self.opened is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened >= self.open_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def check(self):
+        """Raise SunSpecModbusClientCircuitOpen if requests are not allowed.
+        """
+
+        if self.state == self.OPEN:
+            raise SunSpecModbusClientCircuitOpen('Circuit open after %d failed requests' % self.failures)
+
+    def success(self):
+        self.failures = 0
+        self.opened = None
+        self.open_timeout = self.reset_timeout
+
+    def failure(self, e):
+        """Record a failed request. Returns True if the error counts as a device failure.
+        """
+
+        if isinstance(e, modbus_client.ModbusClientException) and \
+                e.except_code not in (modbus_client.EXCEPT_GATEWAY_PATH, modbus_client.EXCEPT_GATEWAY_TARGET):
+            self.success()
+            return False
+        self.failures += 1
+        if self.opened is not None:
+            # failed request while half open
+            self.open_timeout = min(self.open_timeout * 2, self.max_reset_timeout)
+            self.opened = time.monotonic()
+        elif self.failures >= self.failure_threshold:
+            self.opened = time.monotonic()
+        return True
+
+    def reset(self):
+        self.success()
 
 
 class SunSpecModbusClientDevice(device.Device):
-    def __init__(self, model_class=SunSpecModbusClientModel):
+    """Modbus client device.
+
+    Attributes:
+        static_cache
+            If True, model reads after the first read only read the dynamic points of the model. The static points,
+            and all points of the models in static_models, keep the values of the first read until the cache is
+            invalidated with invalidate_static().
+        static_models
+            Ids of the models treated as static, such as the common and nameplate models.
+        read_write_supported
+            True if the device supports Read/Write Multiple Registers (function code 23) requests, False if it does
+            not and None if it is not known yet. Verified writes use a single function code 23 request unless it is
+            False.
+        write_gap
+            Maximum number of registers between dirty points that are filled to write the points in a single
+            request. The gap is only filled if it consists of writable points that have a value, the last value read
+            is written back for those points. Default is 0, no gaps are filled.
+    """
+
+    def __init__(self, model_class=SunSpecModbusClientModel, retry_policy=None, circuit_breaker=None):
         device.Device.__init__(self, model_class=model_class)
         self.did = str(uuid.uuid4())
         self.retry_count = 2
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
         self.base_addr_list = [40000, 0, 50000]
         self.base_addr = None
+        self.read_plans = {}
+        self.static_cache = False
+        self.static_models = [1, 120]
+        self.write_gap = 0
+        self.read_write_supported = None
 
     def connect(self):
         pass
@@ -215,14 +632,183 @@ class SunSpecModbusClientDevice(device.Device):
     def read(self, addr, count):
         return ''
 
+    def read_write(self, read_addr, read_count, write_addr, data):
+        """Write registers and then read registers. If the device supports Read/Write Multiple Registers (function
+        code 23) both are performed in a single request. A device that responds with an illegal function exception to
+        its first function code 23 request is marked as not supporting it, and the write and read are performed as
+        separate requests.
+        Parameters:
+            read_addr :
+                Starting Modbus address of the read.
+            read_count :
+                Read length in Modbus registers.
+            write_addr :
+                Starting Modbus address of the write.
+            data :
+                Byte string containing the register contents to write.
+        Returns:
+            Byte string containing the read register contents.
+        """
+
+        if self.read_write_supported is not False:
+            try:
+                resp = self._read_write(read_addr, read_count, write_addr, data)
+            except modbus_client.ModbusClientException as e:
+                if e.except_code != modbus_client.EXCEPT_ILLEGAL_FUNCTION or self.read_write_supported:
+                    raise
+                self.read_write_supported = False
+            else:
+                self.read_write_supported = True
+                return resp
+        self.write(write_addr, data)
+        return self.read(read_addr, read_count)
+
+    # must be overridden by Modbus protocol implementations that support broadcast requests
+    def broadcast(self, addr, data):
+        raise SunSpecModbusClientError('Broadcast requests not supported by device')
+
+    # must be overridden by Modbus protocol implementations that support function code 23
+    def _read_write(self, read_addr, read_count, write_addr, data):
+        raise modbus_client.ModbusClientException('Modbus exception %d' % modbus_client.EXCEPT_ILLEGAL_FUNCTION,
+                                                  except_code=modbus_client.EXCEPT_ILLEGAL_FUNCTION)
+
     # must be overridden by Modbus protocol implementation
     def write(self, addr, data):
         return
 
-    def scan(self, progress=None, delay=None, connect=True, full_model_read=True):
+    def read_regions(self, regions):
+        """Read a list of (addr, count) register regions. Protocol implementations that can issue the requests
+        concurrently may override this.
+        """
+        return [self.read(addr, count) for addr, count in regions]
+
+    def read_all(self):
+        """Read all the models of the device by sweeping the register map in requests of up to max_count registers,
+        ignoring model boundaries. Models at contiguous addresses, which is normally the whole map, are read
+        together, and the data is then set into each model. If a request of a sweep returns an exception response, the
+        models of that sweep are read model by model.
+        """
+
+        max_count = getattr(self, 'max_count', modbus_client.REQ_COUNT_MAX)
+        # group the models into sweeps of contiguous register ranges as [start, end, models]
+        sweeps = []
+        for model in sorted(self.model_list, key=lambda m: m.model_addr):
+            if isinstance(model, SunSpecModbusClientLazyModel):
+                # the sweep provides the model data
+                model.full_model_read = False
+                model = model.materialize()
+            model_end = model.model_addr + model.model_len + 2
+            if not sweeps or model.model_addr > sweeps[-1][1]:
+                sweeps.append([model.model_addr, model_end, []])
+            sweep = sweeps[-1]
+            sweep[1] = max(sweep[1], model_end)
+            sweep[2].append(model)
+
+        connected = self.is_connected()
+        if not connected:
+            self.connect()
+
+        try:
+            for start, end, models in sweeps:
+                regions = []
+                addr = start
+                while addr < end:
+                    count = min(max_count, end - addr)
+                    regions.append((addr, count))
+                    addr += count
+                try:
+                    data = b''.join(self.read_regions(regions))
+                except modbus_client.ModbusClientException:
+                    for model in models:
+                        model.read()
+                    continue
+                for model in models:
+                    offset = (model.model_addr - start) * 2
+                    model.set_mb(data=data[offset:offset + (model.model_len + 2) * 2], dirty=False)
+                    if isinstance(model, SunSpecModbusClientModel):
+                        model.static_read = True
+        finally:
+            if not connected:
+                self.disconnect()
+
+    def invalidate_static(self):
+        """Invalidate the cached static points of all models, the next read of each model reads the whole model.
+        """
+
+        for model in self.model_list:
+            if isinstance(model, SunSpecModbusClientModel):
+                model.invalidate()
+
+    def read_plan(self, points, gap=8, max_count=None, scale_factors=True):
+        """Get a read plan for a list of points of the device. Plans are cached by the register locations of the
+        points, so calling read_plan() with the same points in each poll cycle returns the same plan. The cache is
+        cleared when the models of the device are deleted, such as by scan(). See SunSpecModbusClientReadPlan for
+        the parameters.
+        """
+
+        key = (tuple((p.model.model_addr, p.offset, int(p.len)) for p in points), gap, max_count, scale_factors)
+        plan = self.read_plans.get(key)
+        if plan is None:
+            plan = self.read_plans[key] = SunSpecModbusClientReadPlan(points, gap=gap, max_count=max_count,
+                                                                      scale_factors=scale_factors)
+        return plan
+
+    def delete_models(self):
+        device.Device.delete_models(self)
+        # cached plans refer to the points of the deleted models
+        self.read_plans = {}
+
+    def request(self, func, *args, **kwargs):
+        """Perform a Modbus request function using the retry policy and circuit breaker of the device. Without a
+        retry policy or circuit breaker the function is called directly.
+        """
+
+        policy = self.retry_policy
+        breaker = self.circuit_breaker
+        if policy is None and breaker is None:
+            return func(*args, **kwargs)
+
+        attempt = 0
+        while True:
+            if breaker is not None:
+                breaker.check()
+            try:
+                result = func(*args, **kwargs)
+            except modbus_client.ModbusClientError as e:
+                if breaker is not None:
+                    breaker.failure(e)
+                if policy is None or attempt >= policy.retries(e, self.retry_count):
+                    raise
+                time.sleep(policy.delay(attempt))
+                attempt += 1
+                continue
+            if breaker is not None:
+                breaker.success()
+            return result
+
+    def scan_cache_key(self):
+        """Key identifying the device in a scan cache. Devices that can not be identified return None and are not
+        cached.
+        """
+        return None
+
+    def scan(self, progress=None, delay=None, connect=True, full_model_read=True, batch=False, cache=None,
+             lazy=False):
         """Scan all the models of the physical device and create the
         corresponding model objects within the device object based on the
         SunSpec model definitions.
+
+        If batch is True, the register map is read in windows of max_count registers and the model ID/length chain
+        and model contents are taken from the buffered data. Individual registers are only read when a window read
+        returns an exception response.
+
+        If a SunSpecModbusClientScanCache is supplied as cache, a previously discovered model layout for the device
+        is used when the model headers and common model serial number on the device still match it. Otherwise a
+        full discovery is performed and the discovered layout is stored in the cache. The cache is not saved by the
+        scan, call save() on the cache when the scan run is complete.
+
+        If lazy is True, only the model headers are read during the scan. Each model is added to the device as a
+        SunSpecModbusClientLazyModel and the model object is created and read on first attribute access or read().
         """
         self.base_addr = None
         self.delete_models()
@@ -238,6 +824,14 @@ class SunSpecModbusClientDevice(device.Device):
             if delay is not None:
                 time.sleep(delay)
 
+        cache_key = None
+        if cache is not None:
+            cache_key = self.scan_cache_key()
+            if cache_key is not None and self._scan_from_cache(cache.get(cache_key), full_model_read, batch, lazy):
+                if connected:
+                    self.disconnect()
+                return
+
         error_dict = {}
         if self.base_addr is None:
             for addr in self.base_addr_list:
@@ -273,11 +867,19 @@ class SunSpecModbusClientDevice(device.Device):
             model_id = mb.data_to_u16(model_id_data)
             addr = self.base_addr + 2
 
+            read = self.read
+            if batch:
+                reader = _ScanReader(self, getattr(self, 'max_count', modbus_client.REQ_COUNT_MAX))
+                read = reader.read
+
             mid = 0
             while model_id != mb.SUNS_END_MODEL_ID:
                 # read model and model len separately due to some devices not supplying
                 # count for the end model id
-                model_len_data = self.read(addr + 1, 1)
+                if batch:
+                    model_len_data = read(addr, 2)[2:]
+                else:
+                    model_len_data = self.read(addr + 1, 1)
                 if model_len_data and len(model_len_data) == 2:
                     if progress is not None:
                         cont = progress('Scanning model %s' % model_id)
@@ -288,16 +890,16 @@ class SunSpecModbusClientDevice(device.Device):
                     # read model data
                     ### model_data = self.read(addr, model_len + 2)
                     model_data = model_id_data + model_len_data
-                    model = self.model_class(model_id=model_id, model_addr=addr, model_len=model_len, data=model_data,
-                                             mb_device=self)
-                    if full_model_read and model.model_def:
-                        model.read()
-                    model.mid = '%s_%s' % (self.did, mid)
+                    if lazy:
+                        self._add_lazy_model(model_id, addr, model_len, mid, full_model_read)
+                    else:
+                        if batch and full_model_read:
+                            model_data = reader.read_model(addr, model_len + 2) or model_data
+                        self._add_scanned_model(model_id, addr, model_len, model_data, mid, full_model_read)
                     mid += 1
-                    self.add_model(model)
 
                     addr += model_len + 2
-                    model_id_data = self.read(addr, 1)
+                    model_id_data = read(addr, 1)
                     if model_id_data and len(model_id_data) == 2:
                         model_id = mb.data_to_u16(model_id_data)
                     else:
@@ -311,16 +913,357 @@ class SunSpecModbusClientDevice(device.Device):
         else:
             raise SunSpecModbusClientError(error)
 
+        if cache_key is not None:
+            cache.set(cache_key, self._scan_cache_entry())
+
         if connected:
             self.disconnect()
 
+    def _add_scanned_model(self, model_id, addr, model_len, model_data, mid, full_model_read):
+        model = self.model_class(model_id=model_id, model_addr=addr, model_len=model_len, data=model_data,
+                                 mb_device=self)
+        if full_model_read and model.model_def and len(model_data) < (model_len + 2) * 2:
+            model.read()
+        model.mid = '%s_%s' % (self.did, mid)
+        self.add_model(model)
+        return model
+
+    def _add_lazy_model(self, model_id, addr, model_len, mid, full_model_read):
+        model = SunSpecModbusClientLazyModel(model_id=model_id, model_addr=addr, model_len=model_len, mb_device=self,
+                                             full_model_read=full_model_read)
+        model.mid = '%s_%s' % (self.did, mid)
+        self.add_model(model)
+        return model
+
+    def _common_sn(self):
+        common = self.models.get(1)
+        if common:
+            sn = common[0].points.get('SN')
+            if sn is not None:
+                if sn.value is None:
+                    sn.read()
+                return sn.value
+
+    def _scan_cache_entry(self):
+        models = [[m.model_id, m.model_addr, m.model_len] for m in self.model_list]
+        return {'base_addr': self.base_addr, 'sn': self._common_sn(), 'models': models}
+
+    def _scan_from_cache(self, entry, full_model_read, batch, lazy=False):
+        """Create the device models from a scan cache entry. The entry is only used if the SunSpec identifier, each
+        model header, the end model, and the common model serial number on the device match the entry.
+        """
+        if not entry or not entry.get('models'):
+            return False
+
+        read = self.read
+        reader = None
+        if batch:
+            reader = _ScanReader(self, getattr(self, 'max_count', modbus_client.REQ_COUNT_MAX))
+            read = reader.read
+
+        try:
+            base_addr = entry['base_addr']
+            if read(base_addr, 2) != b'SunS':
+                return False
+            headers = []
+            for model_id, model_addr, model_len in entry['models']:
+                header = read(model_addr, 2)
+                if len(header) != 4 or mb.data_to_u16(header) != model_id or mb.data_to_u16(header[2:]) != model_len:
+                    return False
+                headers.append(header)
+            end_data = read(model_addr + model_len + 2, 1)
+            if len(end_data) != 2 or mb.data_to_u16(end_data) != mb.SUNS_END_MODEL_ID:
+                return False
+
+            for mid, (model_id, model_addr, model_len) in enumerate(entry['models']):
+                if lazy:
+                    self._add_lazy_model(model_id, model_addr, model_len, mid, full_model_read)
+                    continue
+                model_data = headers[mid]
+                if reader is not None and full_model_read:
+                    model_data = reader.read_model(model_addr, model_len + 2) or model_data
+                self._add_scanned_model(model_id, model_addr, model_len, model_data, mid, full_model_read)
+
+            if self._common_sn() != entry.get('sn'):
+                self.delete_models()
+                return False
+        except (SunSpecModbusClientError, modbus_client.ModbusClientError):
+            self.delete_models()
+            return False
+
+        self.base_addr = base_addr
+        return True
+
+
+class SunSpecModbusClientLazyModel(object):
+    """Placeholder for a model found by a lazy device scan. The model object is created with the model class of the
+    device and read from the device on first attribute access or read(), and then replaces the placeholder in the
+    device model lists. Attribute access on the placeholder is delegated to the model object.
+    """
+    _model = None
+
+    def __init__(self, model_id=None, model_addr=0, model_len=0, mb_device=None, full_model_read=True):
+        self.model_id = model_id
+        self.model_addr = model_addr
+        self.model_len = model_len
+        self.device = mb_device
+        self.full_model_read = full_model_read
+        self.mid = None
+        self.model_def = None
+        self.gname = None
+        try:
+            self.model_def = device.get_model_def(model_id)
+            self.gname = self.model_def[mdef.GROUP][mdef.NAME]
+        except Exception:
+            pass
+
+    def __getattr__(self, attr):
+        return getattr(self.materialize(), attr)
+
+    def __str__(self):
+        return str(self.materialize())
+
+    def is_materialized(self):
+        return self._model is not None
+
+    def materialize(self):
+        """Create the model object, read it from the device if full_model_read was set for the scan, and replace the
+        placeholder in the device model lists.
+        """
+        if self._model is None:
+            data = mb.u16_to_data(self.model_id) + mb.u16_to_data(self.model_len)
+            model = self.device.model_class(model_id=self.model_id, model_addr=self.model_addr,
+                                            model_len=self.model_len, model_def=self.model_def, data=data,
+                                            mb_device=self.device)
+            if self.full_model_read and model.model_def:
+                model.read()
+            model.mid = self.mid
+            self._model = model
+            for model_list in [self.device.model_list] + list(self.device.models.values()):
+                for i, m in enumerate(model_list):
+                    if m is self:
+                        model_list[i] = model
+        return self._model
+
+    def read(self):
+        materialized = self._model is not None
+        model = self.materialize()
+        # a model materialized with a full model read is already current
+        if materialized or not (self.full_model_read and model.model_def):
+            model.read()
+
+
+class SunSpecModbusClientReadPlan(object):
+    """Plan for reading a set of points, possibly from different models, with the fewest Modbus requests. The
+    register ranges of the points are sorted and merged when they are no more than gap registers apart and the
+    merged range does not exceed max_count registers. The plan is computed once and can be read in each poll cycle.
+
+    Parameters:
+        points :
+            Points to read. All points must be in models of the same device.
+        gap :
+            Maximum number of unused registers between two ranges that are merged into one request.
+        max_count :
+            Maximum register count of a request. Defaults to the max_count of the device.
+        scale_factors :
+            If True, the scale factor points of the points are also read.
+
+    Attributes:
+        requests
+            List of (addr, count, points) tuples, where points is a list of (point, byte offset) tuples for the
+            points in the request.
+    """
+
+    def __init__(self, points, gap=8, max_count=None, scale_factors=True):
+        self.points = []
+        self.device = None
+        self.gap = gap
+        self.requests = []
+
+        seen = set()
+        for point in points:
+            self._add_point(point, seen)
+            if scale_factors and point.sf_required and point.sf:
+                sf = point.group.points.get(point.sf)
+                if sf is None:
+                    sf = point.model.points.get(point.sf)
+                if sf is not None:
+                    self._add_point(sf, seen)
+
+        if max_count is None:
+            max_count = getattr(self.device, 'max_count', modbus_client.REQ_COUNT_MAX)
+        self.max_count = max_count
+
+        ranges = sorted((p.model.model_addr + p.offset, int(p.len), p) for p in self.points)
+        for addr, count, point in ranges:
+            if self.requests:
+                start, req_count, req_points = self.requests[-1]
+                end = max(start + req_count, addr + count)
+                if addr - (start + req_count) <= gap and end - start <= max_count:
+                    req_points.append((point, (addr - start) * 2))
+                    self.requests[-1] = (start, end - start, req_points)
+                    continue
+            self.requests.append((addr, count, [(point, 0)]))
+
+    def _add_point(self, point, seen):
+        if id(point) in seen:
+            return
+        device = point.model.device
+        if self.device is None:
+            self.device = device
+        elif device is not self.device:
+            raise SunSpecModbusClientError('Read plan points must be in the same device')
+        seen.add(id(point))
+        self.points.append(point)
+
+    @property
+    def regions(self):
+        return [(addr, count) for addr, count, points in self.requests]
+
+    def read(self):
+        """Read the points of the plan from the device.
+        """
+
+        if not self.requests:
+            return
+        connected = self.device.is_connected()
+        if not connected:
+            self.device.connect()
+        try:
+            results = self.device.read_regions(self.regions)
+        finally:
+            if not connected:
+                self.device.disconnect()
+
+        for (addr, count, points), data in zip(self.requests, results):
+            data = memoryview(data)
+            for point, offset in points:
+                point.set_mb(data=data[offset:offset + int(point.len) * 2], dirty=False)
+
+
+class SunSpecModbusClientScanCache(object):
+    """Persistent cache of discovered device model layouts. Each entry contains the base address, the common model
+    serial number, and the (model id, model address, model length) of each model found on the device, keyed by the
+    device scan cache key.
+
+    Changes to the entries are kept in memory until save() is called, so the file is written once for a scan run
+    over many devices. Used as a context manager, the cache is saved on exit:
+
+        with SunSpecModbusClientScanCache('scan_cache.json') as cache:
+            for d in devices:
+                d.scan(cache=cache)
+
+    Parameters:
+        filename :
+            Name of the JSON file used to store the cache. The file is created when the cache is first saved.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.entries = {}
+        self.modified = False
+        self.load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.save()
+
+    def load(self):
+        self.entries = {}
+        if os.path.exists(self.filename):
+            try:
+                with open(self.filename) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                raise SunSpecModbusClientError('Error loading scan cache %s: %s' % (self.filename, str(e)))
+        self.modified = False
+
+    def save(self):
+        """Write the cache file if the entries have been modified since the last load or save. The file is
+        replaced atomically so an interrupted save does not corrupt the cache.
+        """
+
+        if self.modified:
+            tmp_filename = '%s.tmp' % self.filename
+            try:
+                with open(tmp_filename, 'w') as f:
+                    json.dump(self.entries, f)
+                os.replace(tmp_filename, self.filename)
+            except OSError as e:
+                raise SunSpecModbusClientError('Error saving scan cache %s: %s' % (self.filename, str(e)))
+            self.modified = False
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, entry):
+        if self.entries.get(key) != entry:
+            self.entries[key] = entry
+            self.modified = True
+
+    def remove(self, key):
+        if self.entries.pop(key, None) is not None:
+            self.modified = True
+
+    def clear(self):
+        if self.entries:
+            self.entries = {}
+            self.modified = True
+
+
+class _ScanReader(object):
+    """Register reader used by batched scans. Reads are satisfied from a buffered window of the register map and a
+    new window of the window size is read when a request falls outside the buffer. When a window read returns an
+    exception response, reads starting within the rejected window are for the requested registers only. Reads past
+    the rejected window use windows again.
+    """
+
+    def __init__(self, device, window):
+        self.device = device
+        self.window = window
+        self.addr = None
+        self.data = b''
+        self.unbatched_end = None
+
+    def read(self, addr, count):
+        if self.addr is not None and addr >= self.addr and (addr + count - self.addr) * 2 <= len(self.data):
+            start = (addr - self.addr) * 2
+            return self.data[start:start + count * 2]
+        self.addr = None
+        self.data = b''
+        size = count
+        if self.unbatched_end is None or addr >= self.unbatched_end:
+            size = max(count, self.window)
+        try:
+            data = self.device.read(addr, size)
+        except modbus_client.ModbusClientException:
+            # window extends past the end of the register map or is otherwise rejected by the device
+            if size == count:
+                raise
+            self.unbatched_end = addr + size
+            data = self.device.read(addr, count)
+        if data:
+            self.addr = addr
+            self.data = data
+        return data[:count * 2]
+
+    def read_model(self, addr, count):
+        try:
+            return self.read(addr, count)
+        except modbus_client.ModbusClientException:
+            return None
+
 
 class SunSpecModbusClientDeviceTCP(SunSpecModbusClientDevice):
     def __init__(self, slave_id=1, ipaddr='127.0.0.1', ipport=502, timeout=None, ctx=None, trace_func=None,
                  tls=False, cafile=None, certfile=None, keyfile=None, insecure_skip_tls_verify=False,
                  max_count=modbus_client.REQ_COUNT_MAX, max_write_count=modbus_client.REQ_WRITE_COUNT_MAX,
-                 model_class=SunSpecModbusClientModel):
-        SunSpecModbusClientDevice.__init__(self, model_class=model_class)
+                 model_class=SunSpecModbusClientModel, pipeline=1, adaptive_timeout=False, retry_policy=None,
+                 circuit_breaker=None, gateway=False, session=False):
+        SunSpecModbusClientDevice.__init__(self, model_class=model_class, retry_policy=retry_policy,
+                                           circuit_breaker=circuit_breaker)
 
         self.slave_id = slave_id
         self.ipaddr = ipaddr
@@ -336,13 +1279,30 @@ class SunSpecModbusClientDeviceTCP(SunSpecModbusClientDevice):
         self.keyfile = keyfile
         self.insecure_skip_tls_verify = insecure_skip_tls_verify
         self.max_write_count = max_write_count
-
-        self.client = modbus_client.ModbusClientTCP(slave_id=slave_id, ipaddr=ipaddr, ipport=ipport, timeout=timeout,
-                                                    ctx=ctx, trace_func=trace_func,
-                                                    tls=tls, cafile=cafile, certfile=certfile, keyfile=keyfile,
-                                                    insecure_skip_tls_verify=insecure_skip_tls_verify,
-                                                    max_count=modbus_client.REQ_COUNT_MAX,
-                                                    max_write_count=modbus_client.REQ_WRITE_COUNT_MAX)
+        self.pipeline = pipeline
+        self.adaptive_timeout = adaptive_timeout
+        self.gateway = gateway
+        self.session = session
+
+        if gateway:
+            # share one connection with the other unit ids behind the gateway
+            gw = modbus_client.modbus_tcp_gateway(ipaddr=ipaddr, ipport=ipport, timeout=timeout, ctx=ctx,
+                                                  trace_func=trace_func,
+                                                  tls=tls, cafile=cafile, certfile=certfile, keyfile=keyfile,
+                                                  insecure_skip_tls_verify=insecure_skip_tls_verify,
+                                                  max_count=modbus_client.REQ_COUNT_MAX,
+                                                  max_write_count=modbus_client.REQ_WRITE_COUNT_MAX,
+                                                  pipeline=pipeline, session=session)
+            self.client = gw.unit(slave_id, adaptive_timeout=adaptive_timeout)
+        else:
+            self.client = modbus_client.ModbusClientTCP(slave_id=slave_id, ipaddr=ipaddr, ipport=ipport,
+                                                        timeout=timeout, ctx=ctx, trace_func=trace_func,
+                                                        tls=tls, cafile=cafile, certfile=certfile, keyfile=keyfile,
+                                                        insecure_skip_tls_verify=insecure_skip_tls_verify,
+                                                        max_count=modbus_client.REQ_COUNT_MAX,
+                                                        max_write_count=modbus_client.REQ_WRITE_COUNT_MAX,
+                                                        pipeline=pipeline, adaptive_timeout=adaptive_timeout,
+                                                        session=session)
 
         if self.client is None:
             raise SunSpecModbusClientError('No modbus tcp client set for device')
@@ -356,11 +1316,28 @@ class SunSpecModbusClientDeviceTCP(SunSpecModbusClientDevice):
     def is_connected(self):
         return self.client.is_connected()
 
+    def close(self):
+        """Close the device. Called when device is no longer in use. A device behind a gateway is removed from the
+        gateway.
+        """
+
+        if self.gateway:
+            self.client.close()
+
     def read(self, addr, count, op=modbus_client.FUNC_READ_HOLDING):
-        return self.client.read(addr, count, op)
+        return self.request(self.client.read, addr, count, op)
 
     def write(self, addr, data):
-        return self.client.write(addr, data)
+        return self.request(self.client.write, addr, data)
+
+    def _read_write(self, read_addr, read_count, write_addr, data):
+        return self.request(self.client.read_write, read_addr, read_count, write_addr, data)
+
+    def read_regions(self, regions, op=modbus_client.FUNC_READ_HOLDING):
+        return self.request(self.client.read_regions, regions, op)
+
+    def scan_cache_key(self):
+        return 'tcp:%s:%s:%s' % (self.ipaddr, self.ipport, self.slave_id)
 
 
 class SunSpecModbusClientDeviceRTU(SunSpecModbusClientDevice):
@@ -388,6 +1365,14 @@ class SunSpecModbusClientDeviceRTU(SunSpecModbusClientDevice):
             perform is a trace function is not supplied.
         max_count :
             Maximum register count for a single Modbus request.
+        adaptive_timeout :
+            If True, the response timeout of the device is estimated from the
+            observed response times, limited to timeout.
+        retry_policy :
+            RetryPolicy used for device requests. No requests are retried if
+            not supplied.
+        circuit_breaker :
+            CircuitBreaker used for device requests.
     Raises:
         SunSpecModbusClientError: Raised for any general modbus client error.
         SunSpecModbusClientTimeoutError: Raised for a modbus client request timeout.
@@ -397,9 +1382,11 @@ class SunSpecModbusClientDeviceRTU(SunSpecModbusClientDevice):
 
     def __init__(self, slave_id, name, baudrate=None, parity=None, timeout=None, ctx=None, trace_func=None,
                  max_count=modbus_client.REQ_COUNT_MAX, max_write_count=modbus_client.REQ_WRITE_COUNT_MAX,
-                 model_class=SunSpecModbusClientModel):
+                 model_class=SunSpecModbusClientModel, adaptive_timeout=False, retry_policy=None,
+                 circuit_breaker=None):
         # test if this super class init is needed
-        SunSpecModbusClientDevice.__init__(self, model_class=model_class)
+        SunSpecModbusClientDevice.__init__(self, model_class=model_class, retry_policy=retry_policy,
+                                           circuit_breaker=circuit_breaker)
         self.slave_id = slave_id
         self.name = name
         self.client = None
@@ -412,6 +1399,7 @@ class SunSpecModbusClientDeviceRTU(SunSpecModbusClientDevice):
         if self.client is None:
             raise SunSpecModbusClientError('No modbus rtu client set for device')
         self.client.add_device(self.slave_id, self)
+        self.client.set_adaptive_timeout(self.slave_id, adaptive_timeout)
 
     def open(self):
         self.client.open()
@@ -436,7 +1424,7 @@ class SunSpecModbusClientDeviceRTU(SunSpecModbusClientDevice):
             Byte string containing register contents.
         """
 
-        return self.client.read(self.slave_id, addr, count, op=op, max_count=self.max_count)
+        return self.request(self.client.read, self.slave_id, addr, count, op=op, max_count=self.max_count)
 
     def write(self, addr, data):
         """Write Modbus device registers.
@@ -447,4 +1435,43 @@ class SunSpecModbusClientDeviceRTU(SunSpecModbusClientDevice):
                 Byte string containing register contents.
         """
 
-        return self.client.write(self.slave_id, addr, data, max_write_count=self.max_write_count)
+        return self.request(self.client.write, self.slave_id, addr, data, max_write_count=self.max_write_count)
+
+    def _read_write(self, read_addr, read_count, write_addr, data):
+        return self.request(self.client.read_write, self.slave_id, read_addr, read_count, write_addr, data)
+
+    def broadcast(self, addr, data):
+        """Write Modbus registers of all the devices on the bus of the device with broadcast requests. No response
+        is received from the devices.
+        Parameters:
+            addr :
+                Starting Modbus address.
+            data :
+                Byte string containing register contents.
+        """
+
+        return self.client.broadcast(addr, data, max_write_count=self.max_write_count)
+
+    def submit_read(self, addr, count, op=modbus_client.FUNC_READ_HOLDING,
+                    priority=modbus_client.PRIORITY_TELEMETRY, deadline=None):
+        """Submit a register read to the RTU client bus worker. See ModbusClientRTU.submit() for the priority and
+        deadline parameters.
+        Returns:
+            concurrent.futures.Future for the byte string containing register contents.
+        """
+
+        return self.client.submit_read(self.slave_id, addr, count, op=op, max_count=self.max_count,
+                                       priority=priority, deadline=deadline)
+
+    def submit_write(self, addr, data, priority=modbus_client.PRIORITY_CONTROL, deadline=None):
+        """Submit a register write to the RTU client bus worker. See ModbusClientRTU.submit() for the priority and
+        deadline parameters.
+        Returns:
+            concurrent.futures.Future for the request completion.
+        """
+
+        return self.client.submit_write(self.slave_id, addr, data, max_write_count=self.max_write_count,
+                                        priority=priority, deadline=deadline)
+
+    def scan_cache_key(self):
+        return 'rtu:%s:%s' % (self.name, self.slave_id)
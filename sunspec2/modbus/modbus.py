@@ -21,6 +21,11 @@ import socket
 import struct
 import serial
 import os
+import itertools
+import queue
+import select
+import threading
+from concurrent import futures
 try:
     import ssl
 except Exception as e:
@@ -32,15 +37,46 @@ PARITY_EVEN = 'E'
 
 REQ_COUNT_MAX = 125
 REQ_WRITE_COUNT_MAX = 123
+REQ_READ_WRITE_COUNT_MAX = 121
 
 FUNC_READ_HOLDING = 3
 FUNC_READ_INPUT = 4
 FUNC_WRITE_MULTIPLE = 16
 FUNC_WRITE_SINGLE = 6
+FUNC_READ_WRITE_MULTIPLE = 23
+
+# Modbus exception codes
+EXCEPT_ILLEGAL_FUNCTION = 1
+EXCEPT_ILLEGAL_ADDRESS = 2
+EXCEPT_ILLEGAL_VALUE = 3
+EXCEPT_DEVICE_FAILURE = 4
+EXCEPT_ACKNOWLEDGE = 5
+EXCEPT_DEVICE_BUSY = 6
+EXCEPT_GATEWAY_PATH = 10
+EXCEPT_GATEWAY_TARGET = 11
+
+# RTU bus worker request priorities, lower values are performed first
+PRIORITY_CONTROL = 0
+PRIORITY_ALARM = 1
+PRIORITY_TELEMETRY = 2
+PRIORITY_NAMEPLATE = 3
+
+# slave id of RTU broadcast requests
+BROADCAST_ID = 0
+
+# default RTU turnaround delay in seconds after a broadcast request
+BROADCAST_DELAY = 0.1
+
+# bits per RTU character: start bit, 8 data bits, parity or second stop bit, stop bit
+RTU_CHAR_BITS = 11
 
 TEST_NAME = 'test_name'
 
 modbus_rtu_clients = {}
+modbus_tcp_gateways = {}
+
+# gateway settings that must match when a gateway connection is shared
+GATEWAY_SETTINGS = ('pipeline', 'session')
 
 TCP_HDR_LEN = 6
 TCP_RESP_MIN_LEN = 3
@@ -48,10 +84,17 @@ TCP_HDR_O_LEN = 4
 TCP_READ_REQ_LEN = 6
 TCP_WRITE_MULT_REQ_LEN = 7
 TCP_WRITE_SINGLE_REQ_LEN = 4
+TCP_READ_WRITE_REQ_LEN = 11
 
 TCP_DEFAULT_PORT = 502
 TCP_DEFAULT_TIMEOUT = 2
 
+# session mode keepalive: idle time before the first probe, interval between probes, probes before the connection
+# is dropped
+TCP_KEEPALIVE_IDLE = 10
+TCP_KEEPALIVE_INTERVAL = 5
+TCP_KEEPALIVE_COUNT = 3
+
 TLS_DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'tests', 'tls_data'))
 CAFILE = os.path.join(TLS_DATA_DIR, "ca.crt")
 CLIENT_CERTFILE = os.path.join(TLS_DATA_DIR, "client.crt")
@@ -66,10 +109,105 @@ class ModbusClientTimeout(ModbusClientError):
     pass
 
 
-class ModbusClientException(ModbusClientError):
+class ModbusClientCRCError(ModbusClientError):
+    pass
+
+
+class ModbusClientConnectionClosed(ModbusClientTimeout):
+    pass
+
+
+class ModbusClientSocketError(ModbusClientError):
     pass
 
 
+class ModbusClientException(ModbusClientError):
+    """Modbus exception response. The exception code of the response is available as except_code.
+    """
+
+    def __init__(self, *args, except_code=None):
+        ModbusClientError.__init__(self, *args)
+        self.except_code = except_code
+
+
+class AdaptiveTimeout(object):
+    """Request timeout estimated from observed response times using the TCP retransmission timeout algorithm
+    (RFC 6298). The timeout is the smoothed response time plus k times the response time variation, limited to
+    the range min_timeout to max_timeout. Until the first response is observed the timeout is max_timeout, and it
+    is doubled after each request timeout, so a slow link keeps a generous timeout while a fast device fails fast.
+
+    Parameters:
+        max_timeout :
+            Maximum timeout in seconds, normally the static timeout of the client.
+        min_timeout :
+            Minimum timeout in seconds.
+        alpha :
+            Smoothing gain of the response time.
+        beta :
+            Smoothing gain of the response time variation.
+        k :
+            Response time variation multiplier.
+
+    Attributes:
+        srtt
+            Smoothed response time in seconds, None if no response has been observed.
+        rttvar
+            Response time variation in seconds, None if no response has been observed.
+        timeout
+            Current timeout in seconds.
+        samples
+            Number of response times observed.
+        timeouts
+            Number of request timeouts.
+    """
+
+    def __init__(self, max_timeout, min_timeout=0.05, alpha=0.125, beta=0.25, k=4):
+        self.max_timeout = max_timeout
+        self.min_timeout = min(min_timeout, max_timeout)
+        self.alpha = alpha
+        self.beta = beta
+        self.k = k
+        self.srtt = None
+        self.rttvar = None
+        self.timeout = max_timeout
+        self.samples = 0
+        self.timeouts = 0
+
+    def sample(self, rtt):
+        """Update the estimate with the response time of a completed request.
+        """
+
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.beta) * self.rttvar + self.beta * abs(self.srtt - rtt)
+            self.srtt = (1 - self.alpha) * self.srtt + self.alpha * rtt
+        self.samples += 1
+        self.timeout = min(max(self.srtt + self.k * self.rttvar, self.min_timeout), self.max_timeout)
+
+    def backoff(self):
+        """Double the timeout after a request timeout.
+        """
+
+        self.timeouts += 1
+        self.timeout = min(self.timeout * 2, self.max_timeout)
+
+    def reset(self):
+        self.srtt = None
+        self.rttvar = None
+        self.timeout = self.max_timeout
+        self.samples = 0
+        self.timeouts = 0
+
+    def state(self):
+        """Estimator state as a dict.
+        """
+
+        return {'srtt': self.srtt, 'rttvar': self.rttvar, 'timeout': self.timeout, 'min_timeout': self.min_timeout,
+                'max_timeout': self.max_timeout, 'samples': self.samples, 'timeouts': self.timeouts}
+
+
 def modbus_rtu_client(name=None, baudrate=None, parity=None, timeout=0.5):
     global modbus_rtu_clients
 
@@ -97,6 +235,42 @@ def modbus_rtu_client_remove(name=None):
         del modbus_rtu_clients[name]
 
 
+def modbus_tcp_gateway(ipaddr='127.0.0.1', ipport=TCP_DEFAULT_PORT, timeout=None, tls=False, **kwargs):
+    """Get the shared connection to a Modbus TCP gateway, creating it if it does not exist. All the unit ids behind
+    the gateway are accessed over the connection. Additional keyword parameters are passed to ModbusClientTCP when
+    the gateway is created.
+
+    When the gateway already exists, the timeout, tls, pipeline, and session parameters given must match the
+    existing gateway settings, otherwise ModbusClientError is raised. A timeout of None matches any timeout.
+    """
+
+    global modbus_tcp_gateways
+
+    if ipport is None:
+        ipport = TCP_DEFAULT_PORT
+    gateway = modbus_tcp_gateways.get((ipaddr, ipport))
+    if gateway is not None:
+        if gateway.tls != tls:
+            raise ModbusClientError('Modbus gateway tls mismatch')
+        if timeout is not None and gateway.timeout != timeout:
+            raise ModbusClientError('Modbus gateway timeout mismatch')
+        for name in GATEWAY_SETTINGS:
+            if name in kwargs and getattr(gateway, name) != kwargs[name]:
+                raise ModbusClientError('Modbus gateway %s mismatch' % name)
+    else:
+        gateway = ModbusClientTCPGateway(ipaddr, ipport, timeout=timeout, tls=tls, **kwargs)
+        modbus_tcp_gateways[(ipaddr, ipport)] = gateway
+    return gateway
+
+
+def modbus_tcp_gateway_remove(ipaddr='127.0.0.1', ipport=TCP_DEFAULT_PORT):
+
+    global modbus_tcp_gateways
+
+    if modbus_tcp_gateways.get((ipaddr, ipport)):
+        del modbus_tcp_gateways[(ipaddr, ipport)]
+
+
 def __generate_crc16_table():
     ''' Generates a crc16 lookup table
     .. note:: This will only be generated once
@@ -145,9 +319,11 @@ def checkCRC(data, check):
 
 class ModbusClientRTU:
     """A Modbus RTU client that multiple devices can use to access devices over
-    the same serial interface. Currently, the implementation does not support
-    concurent device requests so the support of multiple devices must be single
-    threaded.
+    the same serial interface. Requests are not serialized by default so the
+    support of multiple devices must be single threaded unless the bus worker is
+    started with start_worker(). The bus worker thread owns the serial interface
+    and performs all requests in order, so devices can be used from multiple
+    threads.
     Parameters:
         name :
             Name of the serial port such as 'com4' or '/dev/ttyUSB0'.
@@ -181,6 +357,28 @@ class ModbusClientRTU:
         devices
             List of :const:`sunspec.core.modbus.client.ModbusClientDeviceRTU`
             devices currently using the client.
+        worker
+            Bus worker thread, None if the bus worker is not running.
+        stats
+            Bus statistics used for the bus utilization report.
+        last_frame_time
+            time.monotonic() time of the end of the last frame on the bus,
+            None if unknown. Requests only wait for the part of the
+            inter-frame gap that has not already elapsed, the full gap is
+            waited for if the time of the last frame is unknown.
+        turnaround
+            Maximum slave turnaround time in seconds. If set, the response
+            timeout of each request is the expected request and response
+            transmission time plus the turnaround time, limited to timeout,
+            so a silent slave is detected without waiting for the full
+            timeout. If None, timeout is used for all requests.
+        adaptive_timeouts
+            AdaptiveTimeout slave turnaround time estimators of the slaves
+            with adaptive timeouts enabled, indexed by slave id.
+        broadcast_delay
+            Turnaround delay in seconds after a broadcast request. Slaves do
+            not respond to broadcast requests, the next request on the bus is
+            delayed so the slaves can process the broadcast.
     """
 
     def __init__(self, name='/dev/ttyUSB0', baudrate=9600, parity=None, timeout=0.5):
@@ -193,6 +391,19 @@ class ModbusClientRTU:
         self.devices = {}
         self.trace_func = None
         self.inter_frame_gap = 0.00175
+        self.worker = None
+        self.worker_lock = threading.Lock()
+        self.worker_stopping = False
+        self.jobs = queue.PriorityQueue()
+        self.job_seq = itertools.count()
+        self.stats = {}
+        self.reset_stats()
+        self.last_frame_time = None
+        self.turnaround = None
+        self.response_timeout = timeout
+        self.adaptive_timeouts = {}
+        self.broadcast_delay = BROADCAST_DELAY
+        self.last_broadcast = False
 
         baudrate = int(baudrate)
         if baudrate <= 19200:
@@ -216,6 +427,8 @@ class ModbusClientRTU:
                                         timeout=self.timeout,
                                         xonxoff=False,
                                         )
+            # the bus state is unknown until the first frame is sent
+            self.last_frame_time = None
 
         except Exception as e:
             if self.serial is not None:
@@ -227,6 +440,7 @@ class ModbusClientRTU:
         """Close the RTU client serial interface.
         """
 
+        self.stop_worker()
         try:
             if self.serial is not None:
                 self.serial.close()
@@ -253,12 +467,268 @@ class ModbusClientRTU:
 
         if self.devices.get(slave_id):
             del self.devices[slave_id]
+        self.adaptive_timeouts.pop(slave_id, None)
 
         # if no more devices using the client interface, close and remove the client
         if len(self.devices) == 0:
             self.close()
             modbus_rtu_client_remove(self.name)
 
+    def start_worker(self):
+        """Start the bus worker thread. While the worker is running, all read
+        and write requests are queued and performed by the worker thread.
+        """
+
+        with self.worker_lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._run_worker, name='modbus-rtu-%s' % self.name,
+                                               daemon=True)
+                self.worker.start()
+
+    def stop_worker(self, timeout=None):
+        """Stop the bus worker thread after the queued requests have been
+        performed. Requests submitted from other threads while the worker is
+        stopping fail with ModbusClientError. If the worker thread does not
+        finish within timeout, it remains the bus worker until it finishes.
+        Parameters:
+            timeout :
+                Maximum time in seconds to wait for the worker thread to finish.
+        """
+
+        with self.worker_lock:
+            worker = self.worker
+            if worker is None:
+                return
+            if not self.worker_stopping:
+                self.worker_stopping = True
+                self.jobs.put((PRIORITY_NAMEPLATE + 1, float('inf'), next(self.job_seq), None))
+        if worker is not threading.current_thread():
+            worker.join(timeout)
+
+    def _run_worker(self):
+        while True:
+            priority, deadline, seq, job = self.jobs.get()
+            if job is None:
+                break
+            future, func, args, kwargs = job
+            if future.set_running_or_notify_cancel():
+                if deadline < time.monotonic():
+                    self.stats['expired'] += 1
+                    future.set_exception(ModbusClientTimeout('Request deadline expired'))
+                    continue
+                self._run_job(future, func, args, kwargs)
+
+        # fail any request left in the queue, no request is queued once the worker is stopping
+        with self.worker_lock:
+            while True:
+                try:
+                    priority, deadline, seq, job = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None:
+                    future = job[0]
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(ModbusClientError('Bus worker stopped'))
+            self.worker = None
+            self.worker_stopping = False
+
+    @staticmethod
+    def _run_job(future, func, args, kwargs):
+        # any exception, including BaseException, is passed to the submitter so the worker keeps running and the
+        # submitter never waits for a result that is not set
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def _use_worker(self):
+        worker = self.worker
+        return worker is not None and worker is not threading.current_thread()
+
+    def submit(self, func, *args, priority=PRIORITY_TELEMETRY, deadline=None, **kwargs):
+        """Submit a function to be called by the bus worker thread. If the
+        worker is not running, the function is called immediately.
+        Queued requests are performed in priority order. Requests with the
+        same priority are performed in deadline order, requests without a
+        deadline last, and then in submission order. A request that is still
+        queued when its deadline passes fails with ModbusClientTimeout.
+        Parameters:
+            priority :
+                Request priority. Possible values:
+                    :const:`PRIORITY_CONTROL`, :const:`PRIORITY_ALARM`,
+                    :const:`PRIORITY_TELEMETRY`, :const:`PRIORITY_NAMEPLATE`.
+                Other values raise ModbusClientError.
+            deadline :
+                Time in seconds from submission by which the request must be
+                started.
+        Returns:
+            concurrent.futures.Future for the function result.
+        """
+
+        if priority not in (PRIORITY_CONTROL, PRIORITY_ALARM, PRIORITY_TELEMETRY, PRIORITY_NAMEPLATE):
+            raise ModbusClientError('Invalid request priority: %s' % priority)
+        future = futures.Future()
+        if self._use_worker():
+            if deadline is not None:
+                deadline = time.monotonic() + deadline
+            else:
+                deadline = float('inf')
+            with self.worker_lock:
+                if self._use_worker():
+                    if self.worker_stopping:
+                        future.set_exception(ModbusClientError('Bus worker stopping'))
+                    else:
+                        self.jobs.put((priority, deadline, next(self.job_seq), (future, func, args, kwargs)))
+                    return future
+        future.set_running_or_notify_cancel()
+        self._run_job(future, func, args, kwargs)
+        return future
+
+    def submit_read(self, slave_id, addr, count, op=FUNC_READ_HOLDING, max_count=REQ_COUNT_MAX,
+                    priority=PRIORITY_TELEMETRY, deadline=None):
+        """Submit a read request to the bus worker. Parameters are the same as
+        for read() and submit().
+        Returns:
+            concurrent.futures.Future for the byte string containing register
+            contents.
+        """
+
+        return self.submit(self.read, slave_id, addr, count, op=op, max_count=max_count, priority=priority,
+                           deadline=deadline)
+
+    def submit_write(self, slave_id, addr, data, max_write_count=REQ_WRITE_COUNT_MAX, priority=PRIORITY_CONTROL,
+                     deadline=None):
+        """Submit a write request to the bus worker. Parameters are the same as
+        for write() and submit().
+        Returns:
+            concurrent.futures.Future for the request completion.
+        """
+
+        return self.submit(self.write, slave_id, addr, data, max_write_count=max_write_count, priority=priority,
+                           deadline=deadline)
+
+    def char_time(self):
+        """Transmission time in seconds of a single RTU character."""
+
+        return RTU_CHAR_BITS / float(self.baudrate)
+
+    def frame_time(self, frame_len):
+        """Bus time in seconds used by a frame of frame_len bytes, including
+        the inter-frame gap.
+        """
+
+        return frame_len * self.char_time() + self.inter_frame_gap
+
+    def _wait_gap(self):
+        # wait for the remaining part of the inter-frame gap since the last frame, or of the turnaround delay if the
+        # last frame was a broadcast. The full gap is waited for if the bus state is unknown.
+        gap = self.inter_frame_gap
+        if self.last_broadcast:
+            gap = max(gap, self.broadcast_delay)
+            self.last_broadcast = False
+        if self.last_frame_time is None:
+            remaining = gap
+        else:
+            remaining = gap - (time.monotonic() - self.last_frame_time)
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def set_adaptive_timeout(self, slave_id, enable=True, min_timeout=0.05):
+        """Enable or disable the adaptive response timeout of a slave. The turnaround time of the slave is
+        estimated from its observed response times less the request and response transmission times. The response
+        timeout of each request is the expected transmission time of the request and response plus the estimated
+        turnaround time, limited to timeout, so large requests are not timed out by an estimate learned from small
+        ones.
+
+        Parameters:
+            slave_id :
+                Modbus slave id.
+            enable :
+                Enable the adaptive timeout if True, disable it if False.
+            min_timeout :
+                Minimum response timeout in seconds.
+
+        Returns:
+            AdaptiveTimeout estimator of the slave if enabled, otherwise None.
+        """
+
+        if not enable:
+            self.adaptive_timeouts.pop(slave_id, None)
+            return None
+        rto = self.adaptive_timeouts.get(slave_id)
+        if rto is None:
+            rto = self.adaptive_timeouts[slave_id] = AdaptiveTimeout(self.timeout, min_timeout=min_timeout)
+        return rto
+
+    def timeout_state(self, slave_id):
+        """Adaptive timeout estimator state of a slave as a dict, None if the adaptive timeout is not enabled for
+        the slave.
+        """
+
+        rto = self.adaptive_timeouts.get(slave_id)
+        if rto is not None:
+            return rto.state()
+
+    def expected_response_time(self, req_len, resp_len):
+        """Expected time in seconds from the start of a request of req_len
+        bytes until the end of a response of resp_len bytes, not including the
+        slave turnaround time.
+        """
+
+        return (req_len + resp_len) * self.char_time() + self.inter_frame_gap
+
+    def _set_response_timeout(self, slave_id, req_len, resp_len):
+        timeout = self.timeout
+        if self.turnaround is not None:
+            timeout = min(self.timeout, self.expected_response_time(req_len, resp_len) + self.turnaround)
+        rto = self.adaptive_timeouts.get(slave_id)
+        if rto is not None:
+            timeout = min(timeout, self.expected_response_time(req_len, resp_len) + rto.timeout)
+        # only reconfigure the serial interface when the timeout changes
+        if timeout != self.response_timeout:
+            self.serial.timeout = timeout
+            self.response_timeout = timeout
+
+    def _sample_turnaround(self, slave_id, start, req_len, resp_len):
+        # update the turnaround time estimate of the slave from the time of a completed request
+        rto = self.adaptive_timeouts.get(slave_id)
+        if rto is not None:
+            rtt = self.last_frame_time - start
+            rto.sample(max(rtt - self.expected_response_time(req_len, resp_len), 0.0))
+
+    def reset_stats(self):
+        """Reset the bus statistics."""
+
+        self.stats = {'start': time.monotonic(), 'requests': 0, 'tx_bytes': 0, 'rx_bytes': 0, 'busy_time': 0.0,
+                      'expired': 0}
+
+    def _bus_account(self, req_len, resp_len):
+        stats = self.stats
+        stats['requests'] += 1
+        stats['tx_bytes'] += req_len
+        stats['rx_bytes'] += resp_len
+        stats['busy_time'] += self.frame_time(req_len) + self.frame_time(resp_len)
+
+    def bus_report(self):
+        """Bus utilization since the statistics were reset. The bus time of each
+        request and response is computed from the frame size, baud rate and
+        inter-frame gap.
+        Returns:
+            Dict containing the request count, bytes transmitted and received,
+            bus busy time and elapsed time in seconds, utilization (busy time
+            / elapsed time), number of requests expired in the queue, and
+            number of requests currently queued.
+        """
+
+        stats = self.stats
+        elapsed = time.monotonic() - stats['start']
+        utilization = 0.0
+        if elapsed > 0:
+            utilization = min(stats['busy_time'] / elapsed, 1.0)
+        return {'requests': stats['requests'], 'tx_bytes': stats['tx_bytes'], 'rx_bytes': stats['rx_bytes'],
+                'busy_time': stats['busy_time'], 'elapsed': elapsed, 'utilization': utilization,
+                'expired': stats['expired'], 'queued': self.jobs.qsize()}
+
     def _read(self, slave_id, addr, count, op=FUNC_READ_HOLDING):
         resp = bytearray()
         len_remaining = 5
@@ -277,10 +747,12 @@ class ModbusClientRTU:
 
         self.serial.flushInput()
         try:
-            time.sleep(self.inter_frame_gap)
+            self._wait_gap()
+            start = time.monotonic()
             self.serial.write(req)
         except Exception as e:
             raise ModbusClientError('Serial write error: %s' % str(e))
+        self._set_response_timeout(slave_id, len(req), int(count) * 2 + 5)
 
         while len_remaining > 0:
             c = self.serial.read(len_remaining)
@@ -296,6 +768,10 @@ class ModbusClientRTU:
                     else:
                         except_code = resp[2]
             else:
+                self.last_frame_time = time.monotonic()
+                rto = self.adaptive_timeouts.get(slave_id)
+                if rto is not None:
+                    rto.backoff()
                 raise ModbusClientTimeout('Response timeout')
 
         if self.trace_func:
@@ -305,12 +781,16 @@ class ModbusClientRTU:
                 s += '%02X' % c
             self.trace_func(s)
 
+        self.last_frame_time = time.monotonic()
+        self._bus_account(len(req), len(resp))
+        self._sample_turnaround(slave_id, start, len(req), len(resp))
+
         crc = (resp[-2] << 8) | resp[-1]
         if not checkCRC(resp[:-2], crc):
-            raise ModbusClientError('CRC error')
+            raise ModbusClientCRCError('CRC error')
 
         if except_code:
-            raise ModbusClientException('Modbus exception %d' % (except_code))
+            raise ModbusClientException('Modbus exception %d' % (except_code), except_code=except_code)
 
         return resp[3:-2]
 
@@ -331,6 +811,9 @@ class ModbusClientRTU:
         Returns:
             Byte string containing register contents.
         """
+        if self._use_worker():
+            return self.submit_read(slave_id, addr, count, op=op, max_count=max_count).result()
+
         resp = bytearray()
         read_offset = 0
 
@@ -376,10 +859,12 @@ class ModbusClientRTU:
         self.serial.flushInput()
 
         try:
-            time.sleep(self.inter_frame_gap)
+            self._wait_gap()
+            start = time.monotonic()
             self.serial.write(bytes(req))
         except Exception as e:
             raise ModbusClientError('Serial write error: %s' % str(e))
+        self._set_response_timeout(slave_id, len(req), 8)
 
         while len_remaining > 0:
             c = self.serial.read(len_remaining)
@@ -395,6 +880,10 @@ class ModbusClientRTU:
                     else:
                         except_code = resp[2]
             else:
+                self.last_frame_time = time.monotonic()
+                rto = self.adaptive_timeouts.get(slave_id)
+                if rto is not None:
+                    rto.backoff()
                 raise ModbusClientTimeout('Response timeout')
 
         if self.trace_func:
@@ -404,12 +893,16 @@ class ModbusClientRTU:
                 s += '%02X' % c
             self.trace_func(s)
 
+        self.last_frame_time = time.monotonic()
+        self._bus_account(len(req), len(resp))
+        self._sample_turnaround(slave_id, start, len(req), len(resp))
+
         crc = (resp[-2] << 8) | resp[-1]
         if not checkCRC(resp[:-2], crc):
-            raise ModbusClientError('CRC error')
+            raise ModbusClientCRCError('CRC error')
 
         if except_code:
-            raise ModbusClientException('Modbus exception: %d' % except_code)
+            raise ModbusClientException('Modbus exception: %d' % except_code, except_code=except_code)
         else:
             resp_slave_id, resp_func, resp_addr, resp_count, resp_crc = struct.unpack('>BBHHH', bytes(resp))
             if resp_slave_id != slave_id or resp_func != func or resp_addr != addr or resp_count != count:
@@ -436,10 +929,12 @@ class ModbusClientRTU:
         self.serial.flushInput()
 
         try:
-            time.sleep(self.inter_frame_gap)
+            self._wait_gap()
+            start = time.monotonic()
             self.serial.write(bytes(req))
         except Exception as e:
             raise ModbusClientError('Serial write error: %s' % str(e))
+        self._set_response_timeout(slave_id, len(req), 8)
 
         while len_remaining > 0:
             c = self.serial.read(len_remaining)
@@ -455,6 +950,10 @@ class ModbusClientRTU:
                     else:
                         except_code = resp[2]
             else:
+                self.last_frame_time = time.monotonic()
+                rto = self.adaptive_timeouts.get(slave_id)
+                if rto is not None:
+                    rto.backoff()
                 raise ModbusClientTimeout('Response timeout')
 
         if self.trace_func:
@@ -464,18 +963,92 @@ class ModbusClientRTU:
                 s += '%02X' % c
             self.trace_func(s)
 
+        self.last_frame_time = time.monotonic()
+        self._bus_account(len(req), len(resp))
+        self._sample_turnaround(slave_id, start, len(req), len(resp))
+
         crc = (resp[-2] << 8) | resp[-1]
         if not checkCRC(resp[:-2], crc):
-            raise ModbusClientError('CRC error')
+            raise ModbusClientCRCError('CRC error')
 
         if except_code:
-            raise ModbusClientException('Modbus exception: %d' % except_code)
+            raise ModbusClientException('Modbus exception: %d' % except_code, except_code=except_code)
         else:
             resp_slave_id, resp_func, resp_addr, resp_data, _ = struct.unpack('>BBHHH', bytes(resp))
             if (resp_slave_id != slave_id or resp_func != func or resp_addr != addr or
                     resp_data != int.from_bytes(data, 'big')):
                 raise ModbusClientError('Modbus response error')
 
+    def _read_write(self, slave_id, read_addr, read_count, write_addr, data):
+        resp = bytearray()
+        len_remaining = 5
+        len_found = False
+        except_code = None
+        func = FUNC_READ_WRITE_MULTIPLE
+        len_data = len(data)
+
+        req = struct.pack('>BBHHHHB', int(slave_id), func, int(read_addr), int(read_count), int(write_addr),
+                          int(len_data/2), len_data)
+        req += data
+        req += struct.pack('>H', computeCRC(req))
+
+        if self.trace_func:
+            s = '> '
+            for c in req:
+                s += '%02X' % c
+            self.trace_func(s)
+
+        self.serial.flushInput()
+
+        try:
+            self._wait_gap()
+            start = time.monotonic()
+            self.serial.write(bytes(req))
+        except Exception as e:
+            raise ModbusClientError('Serial write error: %s' % str(e))
+        self._set_response_timeout(slave_id, len(req), int(read_count) * 2 + 5)
+
+        while len_remaining > 0:
+            c = self.serial.read(len_remaining)
+
+            len_read = len(c)
+            if len_read > 0:
+                resp += c
+                len_remaining -= len_read
+                if len_found is False and len(resp) >= 5:
+                    if not resp[1] & 0x80:
+                        len_remaining = (resp[2] + 5) - len(resp)
+                        len_found = True
+                    else:
+                        except_code = resp[2]
+            else:
+                self.last_frame_time = time.monotonic()
+                rto = self.adaptive_timeouts.get(slave_id)
+                if rto is not None:
+                    rto.backoff()
+                raise ModbusClientTimeout('Response timeout')
+
+        if self.trace_func:
+            s = '< '
+            for c in resp:
+                s += '%02X' % c
+            self.trace_func(s)
+
+        self.last_frame_time = time.monotonic()
+        self._bus_account(len(req), len(resp))
+        self._sample_turnaround(slave_id, start, len(req), len(resp))
+
+        crc = (resp[-2] << 8) | resp[-1]
+        if not checkCRC(resp[:-2], crc):
+            raise ModbusClientCRCError('CRC error')
+
+        if except_code:
+            raise ModbusClientException('Modbus exception %d' % (except_code), except_code=except_code)
+        if resp[0] != slave_id or resp[1] != func or resp[2] != int(read_count) * 2:
+            raise ModbusClientError('Modbus response format error')
+
+        return resp[3:-2]
+
     def write(self, slave_id, addr, data, max_write_count=REQ_WRITE_COUNT_MAX):
         """
         Parameters:
@@ -488,6 +1061,8 @@ class ModbusClientRTU:
             max_write_count :
                 Maximum register count for a single Modbus write.
         """
+        if self._use_worker():
+            return self.submit_write(slave_id, addr, data, max_write_count=max_write_count).result()
 
         write_offset = 0
         count = len(data)/2
@@ -509,6 +1084,96 @@ class ModbusClientRTU:
         else:
             raise ModbusClientError('Client serial port not open: %s' % self.name)
 
+    def _broadcast(self, req):
+        req += struct.pack('>H', computeCRC(req))
+
+        if self.trace_func:
+            s = '> '
+            for c in req:
+                s += '%02X' % c
+            self.trace_func(s)
+
+        self.serial.flushInput()
+
+        try:
+            self._wait_gap()
+            start = time.monotonic()
+            self.serial.write(bytes(req))
+        except Exception as e:
+            raise ModbusClientError('Serial write error: %s' % str(e))
+
+        # the serial write may return before the frame has been transmitted
+        self.last_frame_time = max(time.monotonic(), start + len(req) * self.char_time())
+        self.last_broadcast = True
+        self._bus_account(len(req), 0)
+
+    def broadcast(self, addr, data, max_write_count=REQ_WRITE_COUNT_MAX):
+        """Write registers of all the slaves on the bus with broadcast requests
+        (slave id 0). Slaves do not respond to broadcast requests, so the
+        request returns as soon as it has been sent and the write can not be
+        confirmed. The next request on the bus is delayed by broadcast_delay.
+        Parameters:
+            addr :
+                Starting Modbus address.
+            data :
+                Byte string containing register contents.
+            max_write_count :
+                Maximum register count for a single Modbus write.
+        """
+        if self._use_worker():
+            return self.submit(self.broadcast, addr, data, max_write_count=max_write_count,
+                               priority=PRIORITY_CONTROL).result()
+
+        if self.serial is None:
+            raise ModbusClientError('Client serial port not open: %s' % self.name)
+
+        count = len(data) // 2
+        if count == 1:
+            self._broadcast(struct.pack('>BBH', BROADCAST_ID, FUNC_WRITE_SINGLE, int(addr)) + data)
+            return
+        write_offset = 0
+        while count > 0:
+            write_count = min(count, max_write_count)
+            start = write_offset * 2
+            end = (write_offset + write_count) * 2
+            self._broadcast(struct.pack('>BBHHB', BROADCAST_ID, FUNC_WRITE_MULTIPLE, int(addr + write_offset),
+                                        write_count, write_count * 2) + data[start:end])
+            count -= write_count
+            write_offset += write_count
+
+    def read_write(self, slave_id, read_addr, read_count, write_addr, data):
+        """Write and read registers in a single Read/Write Multiple Registers (function code 23) request. The device
+        performs the write before the read.
+        Parameters:
+            slave_id :
+                Modbus slave id.
+            read_addr :
+                Starting Modbus address of the read.
+            read_count :
+                Read length in Modbus registers, at most REQ_COUNT_MAX.
+            write_addr :
+                Starting Modbus address of the write.
+            data :
+                Byte string containing the register contents to write, at most REQ_READ_WRITE_COUNT_MAX registers.
+        Returns:
+            Byte string containing the read register contents.
+        """
+        if self._use_worker():
+            return self.submit(self.read_write, slave_id, read_addr, read_count, write_addr, data,
+                               priority=PRIORITY_CONTROL).result()
+
+        if self.serial is None:
+            raise ModbusClientError('Client serial port not open: %s' % self.name)
+        _check_read_write(read_count, data)
+        return bytes(self._read_write(slave_id, read_addr, read_count, write_addr, data))
+
+
+def _check_read_write(read_count, data):
+    write_count = len(data) // 2
+    if not 0 < read_count <= REQ_COUNT_MAX or not 0 < write_count <= REQ_READ_WRITE_COUNT_MAX:
+        raise ModbusClientError('Read/write request size error: read count %s write count %s' %
+                                (read_count, write_count))
+
 
 class ModbusClientTCP(object):
     """Provides access to a Modbus TCP device.
@@ -540,11 +1205,26 @@ class ModbusClientTCP(object):
             Skip verification of server TLS certificate. Only used if `tls=True`.
         max_count :
             Maximum register count for a single Modbus request.
+        max_write_count :
+            Maximum register count for a single Modbus write.
+        pipeline :
+            Maximum number of read requests kept in flight when a read spans multiple requests. Each request is
+            sent with its own transaction id and responses are matched by transaction id. The default of 1
+            sends one request at a time.
+        adaptive_timeout :
+            If True, the response timeout is estimated from the observed response times, limited to timeout. The
+            AdaptiveTimeout estimator is available as the rto attribute.
+        session :
+            If True, the connection is kept open between requests instead of connecting and disconnecting around
+            each request. The session connection uses TCP_NODELAY and TCP keepalive. A connection found closed by the
+            device is reopened, and a request that fails because a reused connection was lost is retried once on a
+            new connection. Connection reuse statistics are available from session_report().
     """
 
     def __init__(self, slave_id=1, ipaddr='127.0.0.1', ipport=502, timeout=None, ctx=None, trace_func=None,
                  tls=False, cafile=CAFILE, certfile=CLIENT_CERTFILE, keyfile=CLIENT_KEYFILE, insecure_skip_tls_verify=False,
-                 max_count=REQ_COUNT_MAX, max_write_count=REQ_WRITE_COUNT_MAX):
+                 max_count=REQ_COUNT_MAX, max_write_count=REQ_WRITE_COUNT_MAX, pipeline=1, adaptive_timeout=False,
+                 session=False):
 
         self.slave_id = slave_id
         self.ipaddr = ipaddr
@@ -560,6 +1240,10 @@ class ModbusClientTCP(object):
         self.tls_verify = not insecure_skip_tls_verify
         self.max_count = max_count
         self.max_write_count = max_write_count
+        self.pipeline = pipeline
+        self.trans_id = 0
+        self.session = session
+        self.session_stats = {'requests': 0, 'connects': 0, 'reused': 0, 'reconnects': 0}
 
         # If using TLS, use the default CA, cert, and key files if they are not specified.
         if self.tls:
@@ -589,6 +1273,10 @@ class ModbusClientTCP(object):
         if timeout is None:
             self.timeout = TCP_DEFAULT_TIMEOUT
 
+        self.rto = None
+        if adaptive_timeout:
+            self.rto = AdaptiveTimeout(self.timeout)
+
     def close(self):
 
         self.disconnect()
@@ -610,6 +1298,8 @@ class ModbusClientTCP(object):
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.settimeout(timeout)
+            if self.session:
+                self._set_session_options()
 
             if self.tls:
                 context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH, cafile=self.cafile)
@@ -634,15 +1324,213 @@ class ModbusClientTCP(object):
             pass
 
     def is_connected(self):
-        return self.socket
+        # in session mode the client manages its own connection
+        return self.socket or self.session
+
+    def _set_session_options(self):
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # keepalive timing options are platform specific
+        for name, value in (('TCP_KEEPIDLE', TCP_KEEPALIVE_IDLE), ('TCP_KEEPINTVL', TCP_KEEPALIVE_INTERVAL),
+                            ('TCP_KEEPCNT', TCP_KEEPALIVE_COUNT)):
+            opt = getattr(socket, name, None)
+            if opt is not None:
+                self.socket.setsockopt(socket.IPPROTO_TCP, opt, value)
+
+    def _connection_lost(self):
+        # with no request outstanding, a readable connection has been closed by the device or holds stale data such
+        # as a late response to a request that timed out
+        if self.tls:
+            return False
+        try:
+            readable = select.select([self.socket], [], [], 0)[0]
+        except (TypeError, ValueError):
+            return False
+        if readable:
+            try:
+                data = self.socket.recv(65536)
+            except OSError:
+                return True
+            if not data:
+                return True
+        return False
+
+    def _session_request(self, func, *args, **kwargs):
+        # perform a request on the session connection, reopening the connection if needed
+        stats = self.session_stats
+        stats['requests'] += 1
+        reused = False
+        if self.socket is not None:
+            if self._connection_lost():
+                self.disconnect()
+                stats['reconnects'] += 1
+            else:
+                reused = True
+                stats['reused'] += 1
+        if self.socket is None:
+            self.connect(self.timeout)
+            stats['connects'] += 1
 
-    def _read(self, addr, count, op=FUNC_READ_HOLDING):
+        try:
+            return func(*args, **kwargs)
+        except (ModbusClientConnectionClosed, ModbusClientSocketError, ConnectionError):
+            self.disconnect()
+            if not reused:
+                raise
+        except ModbusClientTimeout:
+            # a late response must not be taken as the response to the next request
+            self.disconnect()
+            raise
+
+        # the reused connection was lost (half-open), retry once on a new connection
+        stats['reconnects'] += 1
+        self.connect(self.timeout)
+        stats['connects'] += 1
+        try:
+            return func(*args, **kwargs)
+        except ModbusClientError:
+            self.disconnect()
+            raise
+
+    def session_report(self):
+        """Session connection statistics.
+
+        Returns:
+            Dict with the number of requests, connects, requests that reused an open connection, reconnects after a
+            lost connection, and the fraction of requests that reused an open connection.
+        """
+
+        stats = self.session_stats
+        reuse = 0.0
+        if stats['requests']:
+            reuse = stats['reused'] / stats['requests']
+        return {'requests': stats['requests'], 'connects': stats['connects'], 'reused': stats['reused'],
+                'reconnects': stats['reconnects'], 'reuse_ratio': reuse, 'connected': self.socket is not None}
+
+    def _next_trans_id(self):
+        self.trans_id = (self.trans_id % 0xffff) + 1
+        return self.trans_id
+
+    def timeout_state(self):
+        """Adaptive timeout estimator state as a dict, None if the adaptive timeout is not enabled.
+        """
+
+        if self.rto is not None:
+            return self.rto.state()
+
+    def _start_request(self):
+        # set the response timeout of the next request, returns the request start time
+        if self.rto is not None:
+            self.socket.settimeout(self.rto.timeout)
+        return time.monotonic()
+
+    def _recv(self, start=None):
         resp = bytearray()
         len_remaining = TCP_HDR_LEN + TCP_RESP_MIN_LEN
         len_found = False
+
+        while len_remaining > 0:
+            try:
+                c = self.socket.recv(len_remaining)
+            except socket.timeout:
+                if self.rto is not None:
+                    self.rto.backoff()
+                raise
+            len_read = len(c)
+            if len_read > 0:
+                resp += c
+                len_remaining -= len_read
+                if len_found is False and len(resp) >= TCP_HDR_LEN + TCP_RESP_MIN_LEN:
+                    data_len = struct.unpack('>H', resp[TCP_HDR_O_LEN:TCP_HDR_O_LEN + 2])
+                    len_remaining = data_len[0] - (len(resp) - TCP_HDR_LEN)
+            else:
+                raise ModbusClientConnectionClosed('Response timeout')
+
+        # response times of pipelined requests are ambiguous and are not sampled
+        if start is not None and self.rto is not None:
+            self.rto.sample(time.monotonic() - start)
+
+        return resp
+
+    def _recv_response(self, trans_id, start=None):
+        # receive the response to the request with transaction id trans_id, responses with other transaction ids
+        # (such as a late response to an earlier request) are discarded
+        while True:
+            resp = self._recv(start)
+            if struct.unpack('>H', resp[:2])[0] == trans_id:
+                return resp
+            if self.trace_func:
+                s = '< (discarded) '
+                for c in resp:
+                    s += '%02X' % c
+                self.trace_func(s)
+
+    def _read_pipelined(self, regions, op=FUNC_READ_HOLDING):
+        """Read a list of (addr, count) regions keeping up to self.pipeline requests in flight. Responses are
+        matched to requests by transaction id, responses with an unknown transaction id (such as a late response
+        to an earlier request) are discarded.
+        """
+
+        results = [None] * len(regions)
+        pending = {}
+        next_index = 0
+        error = None
+
+        while (next_index < len(regions) and error is None) or pending:
+            while next_index < len(regions) and len(pending) < self.pipeline and error is None:
+                addr, count = regions[next_index]
+                trans_id = self._next_trans_id()
+                req = struct.pack('>HHHBBHH', trans_id, 0, TCP_READ_REQ_LEN, int(self.slave_id), op, int(addr),
+                                  int(count))
+
+                if self.trace_func:
+                    s = '> '
+                    for c in req:
+                        s += '%02X' % c
+                    self.trace_func(s)
+
+                self._start_request()
+                try:
+                    self.socket.sendall(req)
+                except Exception as e:
+                    raise ModbusClientSocketError('Socket write error: %s' % str(e))
+                pending[trans_id] = next_index
+                next_index += 1
+
+            resp = self._recv()
+
+            if self.trace_func:
+                s = '< '
+                for c in resp:
+                    s += '%02X' % c
+                self.trace_func(s)
+
+            trans_id = struct.unpack('>H', resp[:2])[0]
+            index = pending.pop(trans_id, None)
+            if index is None:
+                continue
+
+            if resp[TCP_HDR_LEN + 1] & 0x80:
+                # no more requests are sent, the responses to the requests in flight are received and discarded
+                if error is None:
+                    addr, count = regions[index]
+                    error = ModbusClientException('Modbus exception %d: addr: %s count: %s' %
+                                                  (resp[TCP_HDR_LEN + 2], addr, count),
+                                                  except_code=resp[TCP_HDR_LEN + 2])
+                continue
+
+            results[index] = bytes(resp[(TCP_HDR_LEN + 3):])
+
+        if error is not None:
+            raise error
+
+        return results
+
+    def _read(self, addr, count, op=FUNC_READ_HOLDING):
         except_code = None
 
-        req = struct.pack('>HHHBBHH', 0, 0, TCP_READ_REQ_LEN, int(self.slave_id), op, int(addr), int(count))
+        trans_id = self._next_trans_id()
+        req = struct.pack('>HHHBBHH', trans_id, 0, TCP_READ_REQ_LEN, int(self.slave_id), op, int(addr), int(count))
 
         if self.trace_func:
             # s = '%s:%s:%s[addr=%s] ->' % (self.ipaddr, str(self.ipport), str(self.slave_id), addr)
@@ -651,22 +1539,13 @@ class ModbusClientTCP(object):
                 s += '%02X' % c
             self.trace_func(s)
 
+        start = self._start_request()
         try:
             self.socket.sendall(req)
         except Exception as e:
-            raise ModbusClientError('Socket write error: %s' % str(e))
+            raise ModbusClientSocketError('Socket write error: %s' % str(e))
 
-        while len_remaining > 0:
-            c = self.socket.recv(len_remaining)
-            len_read = len(c)
-            if len_read > 0:
-                resp += c
-                len_remaining -= len_read
-                if len_found is False and len(resp) >= TCP_HDR_LEN + TCP_RESP_MIN_LEN:
-                    data_len = struct.unpack('>H', resp[TCP_HDR_O_LEN:TCP_HDR_O_LEN + 2])
-                    len_remaining = data_len[0] - (len(resp) - TCP_HDR_LEN)
-            else:
-                raise ModbusClientTimeout('Response timeout')
+        resp = self._recv_response(trans_id, start)
 
         if resp[TCP_HDR_LEN + 1] & 0x80:
             except_code = resp[TCP_HDR_LEN + 2]
@@ -679,7 +1558,8 @@ class ModbusClientTCP(object):
             self.trace_func(s)
 
         if except_code:
-            raise ModbusClientException('Modbus exception %d: addr: %s count: %s' % (except_code, addr, count))
+            raise ModbusClientException('Modbus exception %d: addr: %s count: %s' % (except_code, addr, count),
+                                        except_code=except_code)
 
         return resp[(TCP_HDR_LEN + 3):]
 
@@ -703,8 +1583,9 @@ class ModbusClientTCP(object):
             Byte string containing register contents.
         """
 
-        resp = bytearray()
-        read_offset = 0
+        if self.session:
+            return self._session_request(self._read_data, addr, count, op)
+
         local_connect = False
 
         if self.socket is None:
@@ -712,6 +1593,25 @@ class ModbusClientTCP(object):
             self.connect(self.timeout)
 
         try:
+            return self._read_data(addr, count, op)
+        finally:
+            if local_connect:
+                self.disconnect()
+
+    def _read_data(self, addr, count, op=FUNC_READ_HOLDING):
+        resp = bytearray()
+        read_offset = 0
+
+        try:
+            if self.pipeline > 1 and count > self.max_count:
+                regions = []
+                while count > 0:
+                    read_count = min(count, self.max_count)
+                    regions.append((addr + read_offset, read_count))
+                    count -= read_count
+                    read_offset += read_count
+                for data in self._read_pipelined(regions, op=op):
+                    resp += data
             while count > 0:
                 if count > self.max_count:
                     read_count = self.max_count
@@ -727,22 +1627,58 @@ class ModbusClientTCP(object):
                     break
         except socket.timeout as e:
             raise ModbusClientTimeout(str(e))
+
+        return bytes(resp)
+
+    def read_regions(self, regions, op=FUNC_READ_HOLDING):
+        """ Read a list of Modbus register regions. If pipelining is enabled, the requests for all regions are
+        pipelined, otherwise the regions are read one at a time. If no connection exists to the destination, one is
+        created and disconnected at the end of the request.
+
+        Parameters:
+
+            regions :
+                List of (addr, count) tuples. Each count must not exceed max_count.
+
+            op :
+                Modbus function code for request.
+
+        Returns:
+
+            List of byte strings containing the register contents of each region.
+        """
+
+        if self.session:
+            return self._session_request(self._read_regions_data, regions, op)
+
+        local_connect = False
+
+        if self.socket is None:
+            local_connect = True
+            self.connect(self.timeout)
+
+        try:
+            return self._read_regions_data(regions, op)
         finally:
             if local_connect:
                 self.disconnect()
 
-        return bytes(resp)
+    def _read_regions_data(self, regions, op=FUNC_READ_HOLDING):
+        try:
+            if self.pipeline > 1 and len(regions) > 1:
+                return self._read_pipelined(regions, op=op)
+            return [bytes(self._read(addr, count, op=op)) for addr, count in regions]
+        except socket.timeout as e:
+            raise ModbusClientTimeout(str(e))
 
     def _write(self, addr, data):
-        resp = bytearray()
-        len_remaining = TCP_HDR_LEN + TCP_RESP_MIN_LEN
-        len_found = False
         except_code = None
         func = FUNC_WRITE_MULTIPLE
 
         write_len = len(data)
         write_count = int(write_len/2)
-        req = struct.pack('>HHHBBHHB', 0, 0, TCP_WRITE_MULT_REQ_LEN + write_len, int(self.slave_id),
+        trans_id = self._next_trans_id()
+        req = struct.pack('>HHHBBHHB', trans_id, 0, TCP_WRITE_MULT_REQ_LEN + write_len, int(self.slave_id),
                           func, int(addr), write_count, write_len)
         req += data
 
@@ -753,22 +1689,13 @@ class ModbusClientTCP(object):
                 s += '%02X' % c
             self.trace_func(s)
 
+        start = self._start_request()
         try:
             self.socket.sendall(req)
         except Exception as e:
-            raise ModbusClientError('Socket write error: %s' % str(e))
+            raise ModbusClientSocketError('Socket write error: %s' % str(e))
 
-        while len_remaining > 0:
-            c = self.socket.recv(len_remaining)
-            len_read = len(c)
-            if len_read > 0:
-                resp += c
-                len_remaining -= len_read
-                if len_found is False and len(resp) >= TCP_HDR_LEN + TCP_RESP_MIN_LEN:
-                    data_len = struct.unpack('>H', resp[TCP_HDR_O_LEN:TCP_HDR_O_LEN + 2])
-                    len_remaining = data_len[0] - (len(resp) - TCP_HDR_LEN)
-            else:
-                raise ModbusClientTimeout('Response timeout')
+        resp = self._recv_response(trans_id, start)
 
         if (resp[TCP_HDR_LEN + 1]) & 0x80:
             except_code = resp[TCP_HDR_LEN + 2]
@@ -781,21 +1708,19 @@ class ModbusClientTCP(object):
             self.trace_func(s)
 
         if except_code:
-            raise ModbusClientException('Modbus exception: %d' % except_code)
+            raise ModbusClientException('Modbus exception: %d' % except_code, except_code=except_code)
 
     def _write_single(self, addr, data):
         """
         Write Single Modbus device register
         """
 
-        resp = bytearray()
-        len_remaining = TCP_HDR_LEN + TCP_RESP_MIN_LEN
-        len_found = False
         except_code = None
         func = FUNC_WRITE_SINGLE
 
         write_len = len(data)
-        req = struct.pack('>HHHBBH', 0, 0, TCP_WRITE_SINGLE_REQ_LEN + write_len, int(self.slave_id),
+        trans_id = self._next_trans_id()
+        req = struct.pack('>HHHBBH', trans_id, 0, TCP_WRITE_SINGLE_REQ_LEN + write_len, int(self.slave_id),
                           func, int(addr))
         req += data
 
@@ -806,22 +1731,13 @@ class ModbusClientTCP(object):
                 s += '%02X' % c
             self.trace_func(s)
 
+        start = self._start_request()
         try:
             self.socket.sendall(req)
         except Exception as e:
-            raise ModbusClientError('Socket write error: %s' % str(e))
+            raise ModbusClientSocketError('Socket write error: %s' % str(e))
 
-        while len_remaining > 0:
-            c = self.socket.recv(len_remaining)
-            len_read = len(c)
-            if len_read > 0:
-                resp += c
-                len_remaining -= len_read
-                if len_found is False and len(resp) >= TCP_HDR_LEN + TCP_RESP_MIN_LEN:
-                    data_len = struct.unpack('>H', resp[TCP_HDR_O_LEN:TCP_HDR_O_LEN + 2])
-                    len_remaining = data_len[0] - (len(resp) - TCP_HDR_LEN)
-            else:
-                raise ModbusClientTimeout('Response timeout')
+        resp = self._recv_response(trans_id, start)
 
         if (resp[TCP_HDR_LEN + 1]) & 0x80:
             except_code = resp[TCP_HDR_LEN + 2]
@@ -834,7 +1750,49 @@ class ModbusClientTCP(object):
             self.trace_func(s)
 
         if except_code:
-            raise ModbusClientException('Modbus exception: %d' % except_code)
+            raise ModbusClientException('Modbus exception: %d' % except_code, except_code=except_code)
+
+    def _read_write(self, read_addr, read_count, write_addr, data):
+        except_code = None
+        func = FUNC_READ_WRITE_MULTIPLE
+
+        write_len = len(data)
+        trans_id = self._next_trans_id()
+        req = struct.pack('>HHHBBHHHHB', trans_id, 0, TCP_READ_WRITE_REQ_LEN + write_len, int(self.slave_id), func,
+                          int(read_addr), int(read_count), int(write_addr), int(write_len/2), write_len)
+        req += data
+
+        if self.trace_func:
+            s = '> '
+            for c in req:
+                s += '%02X' % c
+            self.trace_func(s)
+
+        start = self._start_request()
+        try:
+            self.socket.sendall(req)
+        except Exception as e:
+            raise ModbusClientSocketError('Socket write error: %s' % str(e))
+
+        resp = self._recv_response(trans_id, start)
+
+        if resp[TCP_HDR_LEN + 1] & 0x80:
+            except_code = resp[TCP_HDR_LEN + 2]
+
+        if self.trace_func:
+            s = '< '
+            for c in resp:
+                s += '%02X' % c
+            self.trace_func(s)
+
+        if except_code:
+            raise ModbusClientException('Modbus exception %d: read addr: %s write addr: %s' %
+                                        (except_code, read_addr, write_addr), except_code=except_code)
+        if resp[TCP_HDR_LEN + 1] != FUNC_READ_WRITE_MULTIPLE or resp[TCP_HDR_LEN + 2] != int(read_count) * 2 or \
+                len(resp) != TCP_HDR_LEN + 3 + int(read_count) * 2:
+            raise ModbusClientError('Modbus response format error')
+
+        return resp[(TCP_HDR_LEN + 3):]
 
     def write(self, addr, data):
         """ Write Modbus device registers. If no connection exists to the
@@ -848,14 +1806,26 @@ class ModbusClientTCP(object):
             data :
                 Byte string containing register contents.
         """
-        write_offset = 0
+
+        if self.session:
+            return self._session_request(self._write_data, addr, data)
+
         local_connect = False
-        count = len(data)/2
 
         if self.socket is None:
             local_connect = True
             self.connect(self.timeout)
 
+        try:
+            self._write_data(addr, data)
+        finally:
+            if local_connect:
+                self.disconnect()
+
+    def _write_data(self, addr, data):
+        write_offset = 0
+        count = len(data)/2
+
         try:
             if count == 1:
                 self._write_single(addr, data)  # If only one register, use Func Code 0x06
@@ -870,6 +1840,196 @@ class ModbusClientTCP(object):
                     self._write(addr + write_offset, data[start:end])
                     count -= write_count
                     write_offset += write_count
+        except socket.timeout as e:
+            raise ModbusClientTimeout(str(e))
+
+    def read_write(self, read_addr, read_count, write_addr, data):
+        """ Write and read Modbus device registers in a single Read/Write Multiple Registers (function code 23)
+        request. The device performs the write before the read. If no connection exists to the destination, one is
+        created and disconnected at the end of the request.
+
+        Parameters:
+
+            read_addr :
+                Starting Modbus address of the read.
+
+            read_count :
+                Read length in Modbus registers, at most REQ_COUNT_MAX.
+
+            write_addr :
+                Starting Modbus address of the write.
+
+            data :
+                Byte string containing the register contents to write, at most REQ_READ_WRITE_COUNT_MAX registers.
+
+        Returns:
+
+            Byte string containing the read register contents.
+        """
+
+        _check_read_write(read_count, data)
+
+        if self.session:
+            return self._session_request(self._read_write_data, read_addr, read_count, write_addr, data)
+
+        local_connect = False
+
+        if self.socket is None:
+            local_connect = True
+            self.connect(self.timeout)
+
+        try:
+            return self._read_write_data(read_addr, read_count, write_addr, data)
         finally:
             if local_connect:
                 self.disconnect()
+
+    def _read_write_data(self, read_addr, read_count, write_addr, data):
+        try:
+            return bytes(self._read_write(read_addr, read_count, write_addr, data))
+        except socket.timeout as e:
+            raise ModbusClientTimeout(str(e))
+
+
+class ModbusClientTCPGateway(ModbusClientTCP):
+    """Shared connection to a Modbus TCP gateway, such as an RS-485 to TCP gateway, with many unit ids behind it.
+    Requests for all unit ids use the single gateway connection and are serialized by the gateway lock. Reads that
+    span multiple requests are pipelined if the gateway pipeline parameter is greater than 1.
+
+    The gateway connection is opened by the first connected unit and closed when the last connected unit
+    disconnects. Gateways are normally obtained with modbus_tcp_gateway().
+
+    Parameters are the same as ModbusClientTCP except slave_id.
+    """
+
+    def __init__(self, ipaddr='127.0.0.1', ipport=TCP_DEFAULT_PORT, timeout=None, **kwargs):
+        ModbusClientTCP.__init__(self, slave_id=None, ipaddr=ipaddr, ipport=ipport, timeout=timeout, **kwargs)
+        self.lock = threading.RLock()
+        self.units = {}
+        self.connections = 0
+
+    def unit(self, slave_id, adaptive_timeout=False):
+        """Get the client for a unit id behind the gateway, creating it if it does not exist.
+
+        Parameters:
+            slave_id :
+                Modbus unit id.
+            adaptive_timeout :
+                If True, the response timeout of the unit is estimated from its observed response times.
+
+        Returns:
+            ModbusClientTCPUnit for the unit id.
+        """
+
+        with self.lock:
+            unit = self.units.get(slave_id)
+            if unit is None:
+                unit = self.units[slave_id] = ModbusClientTCPUnit(self, slave_id, adaptive_timeout=adaptive_timeout)
+            return unit
+
+    def remove_unit(self, slave_id):
+        """Remove a unit from the gateway. When no units remain, the gateway connection is closed and the gateway
+        is removed.
+        """
+
+        with self.lock:
+            unit = self.units.pop(slave_id, None)
+            if unit is not None and unit.connected:
+                unit.disconnect()
+            if len(self.units) == 0:
+                self.close()
+                modbus_tcp_gateway_remove(self.ipaddr, self.ipport)
+
+    def connect_unit(self, timeout=None):
+        with self.lock:
+            if self.socket is None:
+                self.connect(timeout)
+            self.connections += 1
+
+    def disconnect_unit(self):
+        with self.lock:
+            self.connections -= 1
+            if self.connections <= 0:
+                self.connections = 0
+                self.disconnect()
+
+    def unit_request(self, unit, func, *args, **kwargs):
+        # perform a request with the unit id and response timeout estimator of the unit
+        with self.lock:
+            self.slave_id = unit.slave_id
+            self.rto = unit.rto
+            if self.rto is None and self.socket is not None:
+                # the previous request may have left the timeout of an adaptive unit on the socket
+                self.socket.settimeout(self.timeout)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.slave_id = None
+                self.rto = None
+
+
+class ModbusClientTCPUnit(object):
+    """Client for a unit id behind a Modbus TCP gateway. It provides the same request interface as ModbusClientTCP
+    and performs its requests over the shared gateway connection.
+
+    Parameters:
+        gateway :
+            ModbusClientTCPGateway of the unit.
+        slave_id :
+            Modbus unit id.
+        adaptive_timeout :
+            If True, the response timeout of the unit is estimated from its observed response times, limited to the
+            gateway timeout.
+    """
+
+    def __init__(self, gateway, slave_id, adaptive_timeout=False):
+        self.gateway = gateway
+        self.slave_id = slave_id
+        self.connected = False
+        self.rto = None
+        if adaptive_timeout:
+            self.rto = AdaptiveTimeout(gateway.timeout)
+
+    @property
+    def ipaddr(self):
+        return self.gateway.ipaddr
+
+    @property
+    def ipport(self):
+        return self.gateway.ipport
+
+    @property
+    def timeout(self):
+        return self.gateway.timeout
+
+    def connect(self, timeout=None):
+        if not self.connected:
+            self.gateway.connect_unit(timeout)
+            self.connected = True
+
+    def disconnect(self):
+        if self.connected:
+            self.connected = False
+            self.gateway.disconnect_unit()
+
+    def close(self):
+        self.gateway.remove_unit(self.slave_id)
+
+    def is_connected(self):
+        return self.connected or self.gateway.session
+
+    def timeout_state(self):
+        if self.rto is not None:
+            return self.rto.state()
+
+    def read(self, addr, count, op=FUNC_READ_HOLDING):
+        return self.gateway.unit_request(self, self.gateway.read, addr, count, op=op)
+
+    def read_regions(self, regions, op=FUNC_READ_HOLDING):
+        return self.gateway.unit_request(self, self.gateway.read_regions, regions, op=op)
+
+    def write(self, addr, data):
+        return self.gateway.unit_request(self, self.gateway.write, addr, data)
+
+    def read_write(self, read_addr, read_count, write_addr, data):
+        return self.gateway.unit_request(self, self.gateway.read_write, read_addr, read_count, write_addr, data)
@@ -0,0 +1,61 @@
+import sunspec2.modbus.client as client
+import sunspec2.modbus.modbus as modbus_client
+
+
+class MockDevice(client.SunSpecModbusClientDevice):
+    """Modbus client device backed by a register map in memory starting at address 40000.
+
+    Each request is recorded in requests as a (function, address, register count) tuple and the data of each write
+    in writes as an (address, data) tuple. Reads starting at an address in fail, or with an (address, register
+    count) tuple in fail, raise a Modbus exception response.
+    If fc23 is False, read/write requests raise an illegal function exception response. The register map is copied
+    on the first write, pass a bytearray to modify the registers in place.
+    """
+
+    def __init__(self, regs=b'', model_class=client.SunSpecModbusClientModel):
+        client.SunSpecModbusClientDevice.__init__(self, model_class=model_class)
+        self.regs = regs
+        self.requests = []
+        self.writes = []
+        self.fail = set()
+        self.fc23 = True
+
+    def read(self, addr, count):
+        self.requests.append(('read', addr, count))
+        if addr in self.fail or (addr, count) in self.fail:
+            raise modbus_client.ModbusClientException('Modbus exception 2',
+                                                      except_code=modbus_client.EXCEPT_ILLEGAL_ADDRESS)
+        offset = int(addr - 40000) * 2
+        if offset < 0:
+            return b'\x00' * (count * 2)
+        return bytes(self.regs[offset:offset + int(count) * 2])
+
+    def write(self, addr, data):
+        self.requests.append(('write', addr, len(data) // 2))
+        self.writes.append((addr, bytes(data)))
+        self._set_regs(addr, data)
+
+    def _read_write(self, read_addr, read_count, write_addr, data):
+        if not self.fc23:
+            raise modbus_client.ModbusClientException('Modbus exception 1',
+                                                      except_code=modbus_client.EXCEPT_ILLEGAL_FUNCTION)
+        self.requests.append(('read_write', write_addr, len(data) // 2))
+        self.writes.append((write_addr, bytes(data)))
+        self._set_regs(write_addr, data)
+        offset = (read_addr - 40000) * 2
+        return bytes(self.regs[offset:offset + read_count * 2])
+
+    def _set_regs(self, addr, data):
+        if not isinstance(self.regs, bytearray):
+            self.regs = bytearray(self.regs)
+        offset = (addr - 40000) * 2
+        self.regs[offset:offset + len(data)] = data
+
+    def reads(self):
+        """Address and register count of each read request."""
+
+        return [(addr, count) for func, addr, count in self.requests if func == 'read']
+
+    def clear(self):
+        del self.requests[:]
+        del self.writes[:]
@@ -1,3 +1,6 @@
+import asyncio
+
+
 class MockSocket(object):
     def __init__(self):
         self.connected = False
@@ -5,12 +8,19 @@ class MockSocket(object):
         self.ipaddr = None
         self.ipport = None
         self.buffer = []
+        self.options = {}
 
         self.request = []
+        # transaction ids of the requests without a response
+        self.trans_ids = []
+        self.frame_remaining = 0
 
     def settimeout(self, timeout):
         self.timeout = timeout
 
+    def setsockopt(self, level, optname, value):
+        self.options[(level, optname)] = value
+
     def connect(self, ipaddrAndipportTup):
         self.connected = True
         self.ipaddr = ipaddrAndipportTup[0]
@@ -23,10 +33,22 @@ class MockSocket(object):
         if len(self.buffer) == 0:
             return b''
         print(f"MockSocket.recv: size={size}. Message: {self.buffer[0]}")
-        return self.buffer.pop(0)
+        data = self.buffer.pop(0)
+        if self.frame_remaining <= 0 and len(data) >= 6:
+            # responses with transaction id 0 answer the oldest request without a response
+            trans_id = bytes(data[:2])
+            if trans_id == b'\x00\x00' and self.trans_ids:
+                data = self.trans_ids.pop(0) + data[2:]
+            elif trans_id in self.trans_ids:
+                self.trans_ids.remove(trans_id)
+            self.frame_remaining = 6 + int.from_bytes(data[4:6], 'big') - len(data)
+        else:
+            self.frame_remaining -= len(data)
+        return data
 
     def sendall(self, data):
         self.request.append(data)
+        self.trans_ids.append(bytes(data[:2]))
 
     def _set_buffer(self, resp_list):
         for bs in resp_list:
@@ -34,6 +56,8 @@ class MockSocket(object):
 
     def clear_buffer(self):
         self.buffer = []
+        self.trans_ids = []
+        self.frame_remaining = 0
 
 
 def mock_socket(AF_INET, SOCK_STREAM):
@@ -49,4 +73,41 @@ def mock_tcp_connect(self):
 
 
 def mock_tcp_disconnect(self):
-    pass
\ No newline at end of file
+    pass
+
+
+class MockStreamReader(object):
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    async def readexactly(self, n):
+        if len(self.buffer) == 0:
+            raise asyncio.IncompleteReadError(b'', n)
+        return self.buffer.pop(0)
+
+
+class MockStreamWriter(object):
+    def __init__(self):
+        self.closed = False
+        self.request = []
+
+    def write(self, data):
+        self.request.append(data)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    async def wait_closed(self):
+        pass
+
+
+def mock_open_connection(buffer, writers=None):
+    async def open_connection(host=None, port=None, ssl=None):
+        writer = MockStreamWriter()
+        if writers is not None:
+            writers.append(writer)
+        return MockStreamReader(buffer), writer
+    return open_connection
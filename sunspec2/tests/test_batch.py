@@ -0,0 +1,79 @@
+import sunspec2.device as device
+import sunspec2.batch as batch
+import pytest
+
+np = pytest.importorskip('numpy')
+
+
+def model_705(v_sf=-2, ncrv=2):
+    data = {
+        "ID": 705,
+        "Ena": 1,
+        "NPt": 2,
+        "NCrv": ncrv,
+        "V_SF": v_sf,
+        "DeptRef_SF": -2,
+        "Crv": []
+    }
+    for i in range(ncrv):
+        data['Crv'].append({
+            "ActPt": 2,
+            "DeptRef": 1,
+            "Pt": [
+                {"V": 9200 + i, "Var": 3000},
+                {"V": 9670 + i, "Var": None}
+            ]
+        })
+    return device.Model(705, data=data)
+
+
+def test_decode():
+    m1 = model_705()
+    m2 = model_705(v_sf=-1)
+    m2.Ena.value = 0
+    buffers = [m1.get_mb(), m2.get_mb()]
+
+    columns = batch.decode(705, buffers, computed=False)
+    assert list(columns['Ena']) == [1, 0]
+    assert columns['Crv.ActPt'].shape == (2, 2)
+    assert columns['Crv.Pt.V'].shape == (2, 2, 2)
+    assert columns['Crv.Pt.V'][0].tolist() == [[9200, 9670], [9201, 9671]]
+    assert columns['Crv.Pt.Var'].mask.tolist() == [[[False, True], [False, True]]] * 2
+    assert columns['RvrtTms'].mask.tolist() == [True, True]
+
+    # scale factors applied
+    columns = batch.decode(705, buffers)
+    for i, m in enumerate([m1, m2]):
+        d = m.get_dict(computed=True)
+        for c in range(2):
+            for p in range(2):
+                assert columns['Crv.Pt.V'][i, c, p] == d['Crv'][c]['Pt'][p]['V']
+                if d['Crv'][c]['Pt'][p]['Var'] is None:
+                    assert columns['Crv.Pt.Var'][i, c, p] is np.ma.masked
+                else:
+                    assert columns['Crv.Pt.Var'][i, c, p] == d['Crv'][c]['Pt'][p]['Var']
+
+    # register images in a numpy array
+    array = np.frombuffer(b''.join(buffers), dtype=np.uint8).reshape(2, -1)
+    columns = batch.decode(705, array)
+    assert columns['Crv.Pt.V'][0, 1, 0] == 92.01
+    assert columns['Crv.Pt.V'][1, 1, 0] == 920.1
+
+
+def test_decode_string():
+    m = device.Model(1, data={"ID": 1, "L": 66, "Mn": "Test manuf", "SN": "sn-123", "DA": 12})
+    columns = batch.decode(1, [m.get_mb()] * 3)
+    assert columns['Mn'].tolist() == ['Test manuf'] * 3
+    assert columns['SN'][2] == 'sn-123'
+    assert columns['Md'].mask.tolist() == [True] * 3
+    assert list(columns['DA']) == [12] * 3
+
+
+def test_decode_errors():
+    bs = model_705().get_mb()
+    with pytest.raises(ValueError):
+        batch.decode(705, [])
+    with pytest.raises(ValueError):
+        batch.decode(705, [bs, bs[:-2]])
+    with pytest.raises(device.ModelError):
+        batch.decode(705, [bs, model_705(ncrv=3).get_mb()[:len(bs)]])
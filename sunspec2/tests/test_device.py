@@ -775,6 +775,16 @@ class TestPoint:
         p8.set_mb(b'\x9c\x40', computed=True, dirty=True)
         assert p8.value == 4
 
+        # test memoryview data
+        m = device.Model()
+        p_str = device.Point({"name": "TestString", "type": "string", "size": 4}, model=m)
+        data = memoryview(b'\x00\x01abc\x00\x00\x00\x00\x00\x00\x00')
+        assert p_str.set_mb(data[2:]) == 4
+        assert p_str.value == 'abc'
+        p_u32 = device.Point({"name": "TestUint32", "type": "uint32"}, model=m)
+        assert p_u32.set_mb(memoryview(b'\x00\x01\x00\x02')) == 2
+        assert p_u32.value == 65538
+
     def test_get_text(self, model_705_data):
         m = device.Model(705, data=model_705_data)
         p = m.NPt
@@ -782,6 +792,43 @@ class TestPoint:
         assert p.get_text() == expected_output
 
 
+class TestCompactPoint:
+    def test___init__(self, model_705_data):
+        m = device.Model(705, data=model_705_data, point_class=device.CompactPoint)
+        p = m.groups['Crv'][0].groups['Pt'][1].V
+        assert isinstance(p, device.CompactPoint)
+        assert not hasattr(p, '__dict__')
+        assert p.pdef['name'] == 'V'
+        assert p.len == 1
+        assert p.sf == 'V_SF'
+        assert p.sf_required
+        assert p.static is None
+        assert p.offset == m.groups['Crv'][0].groups['Pt'][1].offset
+
+        # definition derived attributes shared by points created from the same definition
+        assert p.meta is m.groups['Crv'][1].groups['Pt'][0].V.meta
+        m2 = device.Model(705, data=model_705_data, point_class=device.CompactPoint)
+        assert m2.Ena.meta is m.Ena.meta
+        with pytest.raises(AttributeError):
+            p.len = 2
+
+    def test_get_set(self, model_705_data):
+        m = device.Model(705, data=model_705_data)
+        m2 = device.Model(705, data=model_705_data, point_class=device.CompactPoint)
+        assert m2.get_dict() == m.get_dict()
+        assert m2.get_dict(computed=True) == m.get_dict(computed=True)
+        assert m2.get_mb() == m.get_mb()
+
+        m2.groups['Crv'][0].groups['Pt'][0].V.cvalue = 95
+        assert m2.groups['Crv'][0].groups['Pt'][0].V.value == 9500
+        assert m2.groups['Crv'][0].groups['Pt'][0].V.dirty
+
+        bs = m.get_mb()
+        m2.set_mb(bs)
+        assert m2.get_mb() == bs
+        assert m2.error_info == ''
+
+
 class TestGroup:
     def test___init__(self):
         g_704 = {
@@ -2589,6 +2636,51 @@ class TestModel:
         assert m2.mid is None
         assert m2.device is None
 
+    def test_set_mb_decoder(self, model_705_data):
+        m = device.Model(705, data=model_705_data)
+        bs = m.get_mb()
+
+        # model data decoded with precompiled model decoder
+        m2 = device.Model(705, data=model_705_data)
+        m2.Ena.value = 0
+        m2.groups['Crv'][0].DeptRef.value = 2
+        m2.groups['Crv'][1].groups['Pt'][3].V.value = 500
+        m2.set_mb(bs)
+        decoder, points = m2._decoder
+        assert decoder.size == len(bs)
+        assert len(points) == len(decoder.convert)
+        assert m2.get_dict() == m.get_dict()
+        assert m2.get_mb() == bs
+
+        # decoder shared by models with the same layout
+        assert device.get_model_decoder(m)[0] is decoder
+
+        # unimplemented values
+        m2.set_mb(b'\xff\xff' * (len(bs) // 2))
+        assert m2.Ena.value is None
+        assert m2.groups['Crv'][0].DeptRef.value is None
+
+    def test_sf_binding(self, model_705_data):
+        m = device.Model(705, data=model_705_data)
+        pt = m.groups['Crv'][0].groups['Pt'][0]
+        assert pt.V.sf_point is m.V_SF
+        assert pt.Var.sf_point is m.DeptRef_SF
+        assert m.Ena.sf_point is None
+        assert device.pow10(-2) == 0.01
+        assert device.pow10(12) == 10 ** 12
+
+        # bulk computed dict matches the computed point values
+        d = m.get_dict(computed=True)
+        for c, crv in enumerate(m.groups['Crv']):
+            for i, p in enumerate(crv.groups['Pt']):
+                assert d['Crv'][c]['Pt'][i]['V'] == p.V.cvalue
+                assert d['Crv'][c]['Pt'][i]['Var'] == p.Var.cvalue
+
+        # scale factor changes are used by the next access
+        m.V_SF.value = -1
+        assert pt.V.cvalue == pt.V.value / 10
+        assert m.get_dict(computed=True)['Crv'][0]['Pt'][0]['V'] == pt.V.value / 10
+
 
 def test_model_1():
     mdata = {
@@ -2680,6 +2772,56 @@ def test_get_text(model_705_data):
     assert expected_output == m.get_text()
 
 
+class TestImageModel:
+    def test___init__(self, model_705_data):
+        m = device.Model(705, data=model_705_data)
+        bs = m.get_mb()
+        im = device.ImageModel(705, model_len=len(bs) // 2 - 2, data=bs)
+        assert im.error_info == ''
+        assert im.image == bs
+        assert im.len == m.len
+        assert im.gname == 'DERVoltVar'
+        assert len(im.groups['Crv']) == 3
+        assert len(im.groups['Crv'][0].groups['Pt']) == 4
+        assert im.Ena.value == 1
+        assert im.Crv[1].Pt[3].V.value == m.Crv[1].Pt[3].V.value
+        assert im.Crv[0].Pt[1].V.cvalue == m.Crv[0].Pt[1].V.cvalue
+        assert list(im.points) == list(m.points)
+        with pytest.raises(AttributeError):
+            im.Foo
+
+        # layout shared by models with the same definition and group counts
+        im2 = device.ImageModel(705, model_len=len(bs) // 2 - 2, data=bs)
+        assert im2.layout is im.layout
+
+    def test_get_set(self, model_705_data):
+        m = device.Model(705, data=model_705_data)
+        bs = m.get_mb()
+        im = device.ImageModel(705, model_len=len(bs) // 2 - 2, data=bs)
+        d = m.get_dict()
+        d['mid'] = None
+        assert im.get_dict() == d
+        assert im.get_dict(computed=True)['Crv'] == m.get_dict(computed=True)['Crv']
+        assert im.get_mb() == bs
+        assert im.Crv[2].get_mb() == m.Crv[2].get_mb()
+
+        # values encoded into the register image
+        im.Crv[0].Pt[0].V.cvalue = 95
+        assert im.Crv[0].Pt[0].V.value == 9500
+        im.Ena.value = None
+        assert im.Ena.value is None
+        assert im.image[4:6] == b'\xff\xff'
+
+        im.set_mb(bs)
+        assert im.image == bs
+        assert im.Ena.value == 1
+
+        # unimplemented values
+        im.Crv[1].set_mb(b'\xff\xff' * im.Crv[1].len)
+        assert im.Crv[1].DeptRef.value is None
+        assert im.Crv[0].DeptRef.value == 1
+
+
 class TestDevice:
     def test__init__(self):
         d = device.Device()
@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+import sunspec2.modbus.aioclient as aioclient
+import sunspec2.modbus.modbus as modbus_client
+import sunspec2.tests.mock_socket as MockSocket
+
+model_1_data = b'\x00\x01\x00BSunSpecTest\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00' \
+               b'\x00\x00\x00\x00\x00TestDevice-1\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00' \
+               b'\x00\x00\x00\x00\x00\x00opt_a_b_c\x00\x00\x00\x00\x00\x00\x001.2.3\x00\x00\x00\x00\x00' \
+               b'\x00\x00\x00\x00\x00\x00sn-123456789\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00' \
+               b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00'
+
+
+def read_resp(trans_id, data):
+    return [(trans_id).to_bytes(2, 'big') + b'\x00\x00' + (len(data) + 3).to_bytes(2, 'big') + b'\x01\x03' +
+            bytes([len(data)]), data]
+
+
+class TestAsyncModbusClientTCP:
+    def test_read(self, monkeypatch):
+        buffer = read_resp(7, b'\x00\x00') + read_resp(1, b'\x00\x2a')
+        writers = []
+        monkeypatch.setattr(asyncio, 'open_connection', MockSocket.mock_open_connection(buffer, writers))
+
+        c = aioclient.AsyncModbusClientTCP()
+        # stale response for an unknown transaction id is discarded
+        assert asyncio.run(c.read(40000, 1)) == b'\x00\x2a'
+        assert writers[0].request[0] == b'\x00\x01\x00\x00\x00\x06\x01\x03\x9c@\x00\x01'
+        assert writers[0].closed
+
+    def test_read_exception(self, monkeypatch):
+        buffer = [b'\x00\x01\x00\x00\x00\x03\x01\x83\x02']
+        monkeypatch.setattr(asyncio, 'open_connection', MockSocket.mock_open_connection(buffer))
+
+        c = aioclient.AsyncModbusClientTCP()
+        with pytest.raises(modbus_client.ModbusClientException) as exc:
+            asyncio.run(c.read(40000, 1))
+        assert 'Modbus exception 2' in str(exc.value)
+        assert exc.value.except_code == modbus_client.EXCEPT_ILLEGAL_ADDRESS
+
+    def test_read_timeout(self, monkeypatch):
+        monkeypatch.setattr(asyncio, 'open_connection', MockSocket.mock_open_connection([]))
+
+        c = aioclient.AsyncModbusClientTCP()
+        with pytest.raises(modbus_client.ModbusClientTimeout):
+            asyncio.run(c.read(40000, 1))
+
+    def test_receive_error(self, monkeypatch):
+        writers = []
+        monkeypatch.setattr(asyncio, 'open_connection', MockSocket.mock_open_connection([], writers))
+
+        async def recv_late():
+            await asyncio.sleep(1)
+
+        async def run():
+            c = aioclient.AsyncModbusClientTCP(timeout=0.01)
+            # the connection is closed at the end of the stream
+            await c.connect()
+            with pytest.raises(modbus_client.ModbusClientConnectionClosed):
+                await c.read(40000, 1)
+            assert not c.is_connected()
+            assert writers[0].closed
+
+            # a late response must not be read as the response to the next request
+            await c.connect()
+            c._recv = recv_late
+            with pytest.raises(modbus_client.ModbusClientTimeout):
+                await c.read(40000, 1)
+            assert not c.is_connected()
+            assert writers[1].closed
+
+        asyncio.run(run())
+
+    def test_concurrent_connect(self, monkeypatch):
+        buffer = read_resp(1, b'\x00\x01') + read_resp(2, b'\x00\x02')
+        writers = []
+        monkeypatch.setattr(asyncio, 'open_connection', MockSocket.mock_open_connection(buffer, writers))
+
+        async def run():
+            c = aioclient.AsyncModbusClientTCP()
+            return await asyncio.gather(c.read(40000, 1), c.read(40001, 1))
+
+        # each task connects in turn while holding the request lock
+        assert asyncio.run(run()) == [b'\x00\x01', b'\x00\x02']
+        assert [len(w.request) for w in writers] == [1, 1]
+        assert all(w.closed for w in writers)
+
+    def test_write(self, monkeypatch):
+        buffer = [b'\x00\x01\x00\x00\x00\x06\x01\x10\x9c\x40\x00\x02']
+        writers = []
+        monkeypatch.setattr(asyncio, 'open_connection', MockSocket.mock_open_connection(buffer, writers))
+
+        c = aioclient.AsyncModbusClientTCP()
+        asyncio.run(c.write(40000, b'\x00\x01\x00\x02'))
+        assert writers[0].request[0] == b'\x00\x01\x00\x00\x00\x0b\x01\x10\x9c@\x00\x02\x04\x00\x01\x00\x02'
+
+
+class TestAsyncSunSpecModbusClientDeviceTCP:
+    def test_scan(self, monkeypatch):
+        buffer = (read_resp(1, b'SunS\x00\x01') + read_resp(2, b'\x00B') + read_resp(3, model_1_data) +
+                  read_resp(4, b'\xff\xff'))
+        monkeypatch.setattr(asyncio, 'open_connection', MockSocket.mock_open_connection(buffer))
+
+        d = aioclient.AsyncSunSpecModbusClientDeviceTCP()
+        asyncio.run(d.scan())
+        assert d.base_addr == 40000
+        assert d.common[0].model_addr == 40002
+        assert d.common[0].SN.value == 'sn-123456789'
+        assert d.common[0].Mn.value == 'SunSpecTest'
+        assert not d.is_connected()
+
+    def test_write(self, monkeypatch):
+        buffer = (read_resp(1, b'SunS\x00\x01') + read_resp(2, b'\x00B') + read_resp(3, model_1_data) +
+                  read_resp(4, b'\xff\xff') + [b'\x00\x05\x00\x00\x00\x06\x01\x06\x9c\x84\x00\x07'])
+        writers = []
+        monkeypatch.setattr(asyncio, 'open_connection', MockSocket.mock_open_connection(buffer, writers))
+
+        async def run():
+            d = aioclient.AsyncSunSpecModbusClientDeviceTCP()
+            await d.scan()
+            d.common[0].DA.value = 7
+            assert d.common[0].DA.dirty
+            await d.common[0].write()
+            assert not d.common[0].DA.dirty
+
+        asyncio.run(run())
+        assert writers[1].request[0] == b'\x00\x05\x00\x00\x00\x06\x01\x06\x9c\x84\x00\x07'
@@ -6,8 +6,18 @@ import serial
 import sunspec2.tests.mock_port as MockPort
 import sunspec2.file.client as file_client
 import sunspec2.modbus.modbus as suns_modbus
+import sunspec2.device as device
+import sunspec2.tests.mock_device as MockDevice
 import struct
 
+# common model of the scan tests: SunSpecTest, TestDevice-1, sn-123456789
+MODEL_1 = b'\x00\x01\x00BSunSpecTest\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00' \
+          b'\x00\x00\x00\x00\x00TestDevice-1\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00' \
+          b'\x00\x00\x00\x00\x00\x00opt_a_b_c\x00\x00\x00\x00\x00\x00\x001.2.3\x00\x00\x00\x00\x00' \
+          b'\x00\x00\x00\x00\x00\x00sn-123456789\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00' \
+          b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00'
+
+
 class TestSunSpecModbusClientPoint:
     def test_read(self, monkeypatch):
         monkeypatch.setattr(socket, 'socket', MockSocket.mock_socket)
@@ -870,6 +880,134 @@ class TestSunSpecModbusClientModel:
         assert c_tcp.common[0].DA.value == 1
         assert c_tcp.common[0].Pad.value == 0
 
+    def test_write_dirty(self):
+        data = {'Ena': 1, 'NPt': 2, 'NCrv': 3, 'V_SF': -2, 'DeptRef_SF': -2, 'Crv': []}
+        for i in range(3):
+            data['Crv'].append({'ActPt': 2, 'DeptRef': 1, 'Pt': [{'V': 9200, 'Var': 3000}, {'V': 9670, 'Var': 0}]})
+        mb_data = device.Model(705, data=data).get_mb()
+        d = MockDevice.MockDevice(b'SunS' + mb_data)
+        m = client.SunSpecModbusClientModel(705, model_addr=40002, model_len=len(mb_data) // 2 - 2, data=mb_data,
+                                            mb_device=d)
+        assert not m.dirty_points
+        pt = m.Crv[2].Pt[1]
+        pt.V.value = 9700
+        assert list(m.dirty_points) == [pt.V]
+        m.write()
+        assert d.writes == [(40002 + pt.V.offset, b'\x25\xe4')]
+        assert not pt.V.dirty
+        assert not m.dirty_points
+
+        # contiguous points are written in address order in a single request
+        d.clear()
+        pt.Var.value = 100
+        pt.V.value = 9710
+        m.Crv[0].ActPt.value = 1
+        m.Crv[2].write()
+        assert d.writes == [(40002 + pt.V.offset, b'\x25\xee\x00\x64')]
+        assert list(m.dirty_points) == [m.Crv[0].ActPt]
+        m.write()
+        assert d.writes[-1] == (40002 + m.Crv[0].ActPt.offset, b'\x00\x01')
+
+        # runs are split at the maximum write count
+        d.clear()
+        d.max_write_count = 1
+        pt.Var.value = 200
+        pt.V.value = 9720
+        m.write()
+        assert d.writes == [(40002 + pt.V.offset, b'\x25\xf8'), (40002 + pt.Var.offset, b'\x00\xc8')]
+
+        pt.V.value = 'x'
+        with pytest.raises(client.SunSpecModbusValueError):
+            m.write()
+
+    def test_write_verify(self):
+        inverter = device.Model(103, data={'W': 1234, 'W_SF': -1, 'WH': 100, 'WH_SF': 0})
+
+        class LimitDevice(MockDevice.MockDevice):
+            # the device limits power to 100 W
+            def _read_write(self, read_addr, read_count, write_addr, data):
+                if self.fc23 and int.from_bytes(data[:2], 'big') > 1000:
+                    data = b'\x03\xe8' + data[2:]
+                return MockDevice.MockDevice._read_write(self, read_addr, read_count, write_addr, data)
+
+        d = LimitDevice(b'\x00' * 4 + inverter.get_mb())
+        assert d.read_write_supported is None
+        m = client.SunSpecModbusClientModel(103, model_addr=40002, model_len=50, data=inverter.get_mb(),
+                                            mb_device=d)
+        m.W.value = 500
+        m.write(verify=True)
+        assert d.requests == [('read_write', 40002 + m.W.offset, 1)]
+        assert d.read_write_supported
+        assert m.W.value == 500
+        assert not m.dirty_points
+
+        m.W.value = 2000
+        with pytest.raises(client.SunSpecModbusClientError):
+            m.W.write(verify=True)
+        assert m.W.value == 1000
+        assert not m.W.dirty
+
+        # devices without function code 23 support fall back to a write and a read
+        d.clear()
+        d.fc23 = False
+        d.read_write_supported = None
+        m.WH.value = 200
+        m.write(verify=True)
+        assert d.requests == [('write', 40002 + m.WH.offset, 2), ('read', 40002 + m.WH.offset, 2)]
+        assert d.read_write_supported is False
+        assert m.WH.value == 200
+
+    def test_write_gap(self):
+        data = {'Ena': 1, 'NPt': 2, 'NCrv': 1, 'RvrtTms': 0, 'V_SF': -2, 'DeptRef_SF': -2,
+                'Crv': [{'ActPt': 2, 'DeptRef': 1, 'Pt': [{'V': 9200, 'Var': 3000}, {'V': 9670}]}]}
+        mb_data = device.Model(705, data=data).get_mb()
+        d = MockDevice.MockDevice(b'SunS' + mb_data)
+        m = client.SunSpecModbusClientModel(705, model_addr=40002, model_len=len(mb_data) // 2 - 2, data=mb_data,
+                                            mb_device=d)
+        pt = m.Crv[0].Pt
+        pt[0].V.value = 9300
+        pt[1].V.value = 9700
+        m.write()
+        assert len(d.writes) == 2
+
+        # the gap is filled with the current value of the writable point between the dirty points
+        d.clear()
+        d.write_gap = 1
+        pt[0].V.value = 9310
+        pt[1].V.value = 9710
+        m.write()
+        assert d.writes == [(40002 + pt[0].V.offset, b'\x24\x5e\x0b\xb8\x25\xee')]
+        assert not m.dirty_points
+
+        # gaps larger than write_gap, with read-only points or with points without a value are not filled
+        d.clear()
+        d.write_gap = 10
+        m.Ena.value = 0
+        m.RvrtTms.value = 60
+        pt[0].V.value = 9320
+        pt[1].Var.value = 100
+        m.write()
+        assert [addr for addr, data in d.writes] == [40002 + m.Ena.offset, 40002 + m.RvrtTms.offset,
+                                                     40002 + pt[0].V.offset]
+        assert d.writes[2][1] == b'\x24\x68\x0b\xb8\x25\xee\x00\x64'
+
+        d.clear()
+        pt[0].Var.set_value(None)
+        pt[0].V.value = 9330
+        pt[1].V.value = 9730
+        m.write()
+        assert len(d.writes) == 2
+
+        # filled runs are limited to max_write_count
+        pt[0].Var.value = 3000
+        m.write()
+        d.clear()
+        d.max_write_count = 2
+        pt[0].V.value = 9340
+        pt[1].V.value = 9740
+        m.write()
+        assert len(d.writes) == 2
+
 
 class TestSunSpecModbusClientDevice:
     def test___init__(self):
@@ -894,6 +1032,191 @@ class TestSunSpecModbusClientDevice:
     def test_write(self):
         pass
 
+    def test_retry_policy(self, monkeypatch):
+        delays = []
+        monkeypatch.setattr(client.time, 'sleep', lambda t: delays.append(t))
+        d = client.SunSpecModbusClientDevice(retry_policy=client.RetryPolicy(jitter=False))
+        errors = []
+
+        def request():
+            if errors:
+                raise errors.pop(0)
+            return b'\x00\x01'
+
+        # timeouts are retried retry_count times with exponential backoff
+        errors[:] = [suns_modbus.ModbusClientTimeout('Response timeout')] * 2
+        assert d.request(request) == b'\x00\x01'
+        assert delays == [.1, .2]
+        errors[:] = [suns_modbus.ModbusClientTimeout('Response timeout')] * 3
+        with pytest.raises(suns_modbus.ModbusClientTimeout):
+            d.request(request)
+
+        # crc errors
+        d.retry_policy.crc_errors = 1
+        errors[:] = [suns_modbus.ModbusClientCRCError('CRC error')]
+        assert d.request(request) == b'\x00\x01'
+        errors[:] = [suns_modbus.ModbusClientCRCError('CRC error')] * 2
+        with pytest.raises(suns_modbus.ModbusClientCRCError):
+            d.request(request)
+
+        # only transient exception codes are retried
+        errors[:] = [suns_modbus.ModbusClientException('Modbus exception 6', except_code=6)]
+        assert d.request(request) == b'\x00\x01'
+        errors[:] = [suns_modbus.ModbusClientException('Modbus exception 2', except_code=2)]
+        del delays[:]
+        with pytest.raises(suns_modbus.ModbusClientException):
+            d.request(request)
+        assert delays == []
+
+        policy = client.RetryPolicy(base_delay=1, max_delay=3)
+        for attempt in range(4):
+            assert min(2 ** attempt, 3) / 2 <= policy.delay(attempt) <= min(2 ** attempt, 3)
+
+    def test_circuit_breaker(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(client.time, 'monotonic', lambda: now[0])
+        breaker = client.CircuitBreaker(failure_threshold=2, reset_timeout=10)
+        d = client.SunSpecModbusClientDevice(circuit_breaker=breaker)
+        calls = []
+
+        def timeout():
+            calls.append(1)
+            raise suns_modbus.ModbusClientTimeout('Response timeout')
+
+        def illegal_address():
+            raise suns_modbus.ModbusClientException('Modbus exception 2', except_code=2)
+
+        with pytest.raises(suns_modbus.ModbusClientTimeout):
+            d.request(timeout)
+        # exception response shows the device is reachable
+        with pytest.raises(suns_modbus.ModbusClientException):
+            d.request(illegal_address)
+        assert breaker.failures == 0
+
+        for i in range(2):
+            with pytest.raises(suns_modbus.ModbusClientTimeout):
+                d.request(timeout)
+        assert breaker.state == client.CircuitBreaker.OPEN
+        with pytest.raises(client.SunSpecModbusClientCircuitOpen):
+            d.request(timeout)
+        assert len(calls) == 3
+
+        # half open, failed trial request reopens with a longer reset timeout
+        now[0] += 10
+        assert breaker.state == client.CircuitBreaker.HALF_OPEN
+        with pytest.raises(suns_modbus.ModbusClientTimeout):
+            d.request(timeout)
+        assert len(calls) == 4
+        now[0] += 10
+        assert breaker.state == client.CircuitBreaker.OPEN
+        now[0] += 10
+        assert d.request(lambda: b'\x00\x01') == b'\x00\x01'
+        assert breaker.state == client.CircuitBreaker.CLOSED
+        assert breaker.open_timeout == 10
+
+    def test_read_plan(self):
+        common = device.Model(1, data={'Mn': 'SunSpecTest', 'SN': 'sn-123'})
+        inverter = device.Model(103, data={'W': 1234, 'W_SF': -1, 'Hz': 6001, 'Hz_SF': -2, 'PhVphA': 2401,
+                                           'V_SF': -1, 'St': 4})
+        d = MockDevice.MockDevice(b'SunS' + common.get_mb() + inverter.get_mb())
+        m1 = client.SunSpecModbusClientModel(1, model_addr=40002, model_len=66, data=common.get_mb(), mb_device=d)
+        m103 = client.SunSpecModbusClientModel(103, model_addr=40070, model_len=50, data=b'\x00' * 104,
+                                               mb_device=d)
+        points = [m1.SN, m103.W, m103.Hz, m103.PhVphA, m103.St]
+
+        plan = d.read_plan(points, gap=0)
+        assert d.read_plan(points, gap=0) is plan
+        # scale factors are added to the plan
+        assert len(plan.points) == 8
+        plan.read()
+        assert d.reads() == plan.regions
+        assert m1.SN.value == 'sn-123'
+        assert m103.W.cvalue == 123.4
+        assert m103.Hz.cvalue == 60.01
+        assert m103.PhVphA.cvalue == 240.1
+        assert m103.St.value == 4
+
+        # nearby ranges are merged
+        assert len(d.read_plan(points, gap=10).regions) < len(plan.regions)
+        assert len(d.read_plan(points, gap=125).regions) == 1
+        for addr, count in d.read_plan(points, gap=125, max_count=20).regions:
+            assert count <= 20
+
+        with pytest.raises(client.SunSpecModbusClientError):
+            client.SunSpecModbusClientReadPlan([m1.SN, client.SunSpecModbusClientModel(
+                1, model_addr=40002, model_len=66, data=common.get_mb(), mb_device=MockDevice.MockDevice()).SN])
+
+        # plans are cached by register location, image model points are new views on each access
+        d = MockDevice.MockDevice(b'SunS' + common.get_mb() + inverter.get_mb() + b'\xff\xff\x00\x00',
+                                  model_class=client.SunSpecModbusClientImageModel)
+        d.scan()
+        plan = d.read_plan([d.inverter[0].W, d.inverter[0].St])
+        assert d.read_plan([d.inverter[0].W, d.inverter[0].St]) is plan
+        assert len(d.read_plans) == 1
+
+        # a new scan clears the cached plans
+        d.scan()
+        assert d.read_plans == {}
+
+    def test_read_all(self):
+        common = device.Model(1, data={'Mn': 'SunSpecTest', 'SN': 'sn-123', 'DA': 1})
+        inverter = device.Model(103, data={'W': 1234, 'W_SF': -1, 'St': 4})
+        d = MockDevice.MockDevice(bytearray(b'SunS' + common.get_mb() + inverter.get_mb() + b'\xff\xff\x00\x00'))
+        d.max_count = 50
+        d.scan()
+        offset = (d.inverter[0].model_addr + d.inverter[0].W.offset - 40000) * 2
+        d.regs[offset:offset + 2] = b'\x00\x64'
+
+        # the 120 registers of the two models are read in three requests
+        d.clear()
+        d.read_all()
+        assert d.reads() == [(40002, 50), (40052, 50), (40102, 20)]
+        assert d.common[0].SN.value == 'sn-123'
+        assert d.inverter[0].W.value == 100
+        assert d.inverter[0].St.value == 4
+
+        # models are read one at a time if a sweep request fails
+        d.clear()
+        d.fail.add(40052)
+        d.regs[offset:offset + 2] = b'\x00\xc8'
+        d.read_all()
+        assert d.reads() == [(40002, 50), (40052, 50), (40002, 68), (40070, 52)]
+        assert d.inverter[0].W.value == 200
+
+    def test_static_cache(self):
+        common = device.Model(1, data={'Mn': 'SunSpecTest', 'SN': 'sn-123', 'DA': 1})
+        inverter = device.Model(103, data={'W': 1234, 'W_SF': -1, 'St': 4})
+        d = MockDevice.MockDevice(bytearray(b'SunS' + common.get_mb() + inverter.get_mb()))
+        d.static_cache = True
+        m1 = client.SunSpecModbusClientModel(1, model_addr=40002, model_len=66, data=common.get_mb(), mb_device=d)
+        m103 = client.SunSpecModbusClientModel(103, model_addr=40070, model_len=50, data=b'\x00' * 104,
+                                               mb_device=d)
+        d.add_model(m1)
+        d.add_model(m103)
+
+        # first read reads the whole model
+        m103.read()
+        assert d.reads() == [(40070, 52)]
+        assert m103.W.cvalue == 123.4
+
+        # later reads skip the static ID and L points
+        d.clear()
+        offset = (m103.model_addr + m103.W.offset - 40000) * 2
+        d.regs[offset:offset + 2] = b'\x00\x64'
+        m103.read()
+        assert d.reads() == [(40072, 50)]
+        assert m103.W.value == 100
+
+        # all points of the common model are static
+        m1.read()
+        d.clear()
+        m1.read()
+        assert d.reads() == []
+
+        d.invalidate_static()
+        m1.read()
+        assert d.reads() == [(40002, 68)]
+
     def test_scan(self, monkeypatch):
         # tcp scan
         monkeypatch.setattr(socket, 'socket', MockSocket.mock_socket)
@@ -1020,6 +1343,185 @@ class TestSunSpecModbusClientDevice:
         for req in range(len(rtu_req_check2)):
             assert rtu_req_check2[req] == c_rtu.client.serial.request[req]
 
+    def test_scan_compact(self, monkeypatch):
+        monkeypatch.setattr(socket, 'socket', MockSocket.mock_socket)
+        monkeypatch.setattr(client.SunSpecModbusClientDeviceTCP, 'connect', MockSocket.mock_tcp_connect)
+        monkeypatch.setattr(client.SunSpecModbusClientDeviceTCP, 'disconnect', MockSocket.mock_tcp_connect)
+
+        window = MODEL_1 + b'\xff\xff\x00\x00' + b'\x00' * 110
+
+        c_tcp = client.SunSpecModbusClientDeviceTCP(model_class=client.SunSpecModbusClientCompactModel)
+        c_tcp.client.connect()
+        c_tcp.client.socket._set_buffer([b'\x00\x00\x00\x00\x00\t\x01\x03\x06', b'SunS\x00\x01',
+                                         b'\x00\x00\x00\x00\x00\xfd\x01\x03\xfa', window])
+        c_tcp.scan(batch=True)
+        assert isinstance(c_tcp.common[0], client.SunSpecModbusClientCompactModel)
+        assert isinstance(c_tcp.common[0].SN, client.SunSpecModbusClientCompactPoint)
+        assert c_tcp.common[0].SN.value == 'sn-123456789'
+
+        c_tcp.client.socket._set_buffer([b'\x00\x00\x00\x00\x00\x05\x01\x03\x02', b'\x00\x02'])
+        c_tcp.common[0].DA.read()
+        assert c_tcp.common[0].DA.value == 2
+
+    def test_scan_image(self, monkeypatch):
+        monkeypatch.setattr(socket, 'socket', MockSocket.mock_socket)
+        monkeypatch.setattr(client.SunSpecModbusClientDeviceTCP, 'connect', MockSocket.mock_tcp_connect)
+        monkeypatch.setattr(client.SunSpecModbusClientDeviceTCP, 'disconnect', MockSocket.mock_tcp_connect)
+
+        window = MODEL_1 + b'\xff\xff\x00\x00' + b'\x00' * 110
+
+        c_tcp = client.SunSpecModbusClientDeviceTCP(model_class=client.SunSpecModbusClientImageModel)
+        c_tcp.client.connect()
+        c_tcp.client.socket._set_buffer([b'\x00\x00\x00\x00\x00\t\x01\x03\x06', b'SunS\x00\x01',
+                                         b'\x00\x00\x00\x00\x00\xfd\x01\x03\xfa', window])
+        c_tcp.scan(batch=True)
+        assert isinstance(c_tcp.common[0], client.SunSpecModbusClientImageModel)
+        assert c_tcp.common[0].image == MODEL_1
+        assert c_tcp.common[0].SN.value == 'sn-123456789'
+        assert c_tcp.common[0].DA.value == 1
+
+        c_tcp.client.socket._set_buffer([b'\x00\x00\x00\x00\x00\x05\x01\x03\x02', b'\x00\x02'])
+        c_tcp.common[0].DA.read()
+        assert c_tcp.common[0].DA.value == 2
+
+        c_tcp.client.socket._set_buffer([b'\x00\x00\x00\x00\x00\x87\x01\x03\x84', MODEL_1])
+        c_tcp.common[0].read()
+        assert c_tcp.common[0].DA.value == 1
+
+    def test_scan_lazy(self, monkeypatch):
+        monkeypatch.setattr(socket, 'socket', MockSocket.mock_socket)
+        monkeypatch.setattr(client.SunSpecModbusClientDeviceTCP, 'connect', MockSocket.mock_tcp_connect)
+        monkeypatch.setattr(client.SunSpecModbusClientDeviceTCP, 'disconnect', MockSocket.mock_tcp_connect)
+
+        # only the model headers are read during the scan
+        c_tcp = client.SunSpecModbusClientDeviceTCP()
+        c_tcp.client.connect()
+        c_tcp.client.socket._set_buffer([b'\x00\x00\x00\x00\x00\t\x01\x03\x06', b'SunS\x00\x01',
+                                         b'\x00\x00\x00\x00\x00\x05\x01\x03\x02', b'\x00B',
+                                         b'\x00\x00\x00\x00\x00\x05\x01\x03\x02', b'\xff\xff'])
+        c_tcp.scan(lazy=True)
+        assert c_tcp.client.socket.request == [b'\x00\x01\x00\x00\x00\x06\x01\x03\x9c@\x00\x03',
+                                               b'\x00\x02\x00\x00\x00\x06\x01\x03\x9cC\x00\x01',
+                                               b'\x00\x03\x00\x00\x00\x06\x01\x03\x9c\x86\x00\x01']
+        lazy_model = c_tcp.common[0]
+        assert isinstance(lazy_model, client.SunSpecModbusClientLazyModel)
+        assert not lazy_model.is_materialized()
+        assert lazy_model.model_addr == 40002
+        assert lazy_model.model_len == 66
+        assert lazy_model.gname == 'common'
+
+        # model created and read on first attribute access
+        c_tcp.client.socket.request = []
+        c_tcp.client.socket._set_buffer([b'\x00\x00\x00\x00\x00\x87\x01\x03\x84', MODEL_1])
+        assert lazy_model.SN.value == 'sn-123456789'
+        assert lazy_model.is_materialized()
+        assert c_tcp.client.socket.request == [b'\x00\x04\x00\x00\x00\x06\x01\x03\x9cB\x00D']
+        assert isinstance(c_tcp.common[0], client.SunSpecModbusClientModel)
+        assert c_tcp.model_list[0] is c_tcp.common[0]
+        assert c_tcp.common[0].mid == lazy_model.mid
+
+        # read() on a materialized model reads the model again
+        c_tcp.client.socket._set_buffer([b'\x00\x00\x00\x00\x00\x87\x01\x03\x84', MODEL_1])
+        lazy_model.read()
+        assert len(c_tcp.client.socket.request) == 2
+
+    def test_scan_batch(self, monkeypatch):
+        monkeypatch.setattr(socket, 'socket', MockSocket.mock_socket)
+        monkeypatch.setattr(client.SunSpecModbusClientDeviceTCP, 'connect', MockSocket.mock_tcp_connect)
+        monkeypatch.setattr(client.SunSpecModbusClientDeviceTCP, 'disconnect', MockSocket.mock_tcp_connect)
+
+        window = MODEL_1 + b'\xff\xff\x00\x00' + b'\x00' * 110
+
+        # whole map read in a single window after the base address
+        c_tcp = client.SunSpecModbusClientDeviceTCP()
+        c_tcp.client.connect()
+        c_tcp.client.socket._set_buffer([b'\x00\x00\x00\x00\x00\t\x01\x03\x06', b'SunS\x00\x01',
+                                         b'\x00\x00\x00\x00\x00\xfd\x01\x03\xfa', window])
+        c_tcp.scan(batch=True)
+        assert c_tcp.common[0].SN.value == 'sn-123456789'
+        assert c_tcp.common[0].DA.value == 1
+        assert c_tcp.client.socket.request == [b'\x00\x01\x00\x00\x00\x06\x01\x03\x9c@\x00\x03',
+                                               b'\x00\x02\x00\x00\x00\x06\x01\x03\x9cB\x00}']
+
+        # window rejected with an exception response, fall back to reading the requested registers
+        c_tcp.client.socket.clear_buffer()
+        c_tcp.client.socket.request = []
+        c_tcp.client.socket._set_buffer([b'\x00\x00\x00\x00\x00\t\x01\x03\x06', b'SunS\x00\x01',
+                                         b'\x00\x00\x00\x00\x00\x03\x01\x83\x02',
+                                         b'\x00\x00\x00\x00\x00\x07\x01\x03\x04', b'\x00\x01\x00B',
+                                         b'\x00\x00\x00\x00\x00\x8b\x01\x03\x88', MODEL_1,
+                                         b'\x00\x00\x00\x00\x00\x05\x01\x03\x02', b'\xff\xff'])
+        c_tcp.scan(batch=True)
+        assert c_tcp.common[0].SN.value == 'sn-123456789'
+        assert c_tcp.client.socket.request == [b'\x00\x03\x00\x00\x00\x06\x01\x03\x9c@\x00\x03',
+                                               b'\x00\x04\x00\x00\x00\x06\x01\x03\x9cB\x00}',
+                                               b'\x00\x05\x00\x00\x00\x06\x01\x03\x9cB\x00\x02',
+                                               b'\x00\x06\x00\x00\x00\x06\x01\x03\x9cB\x00D',
+                                               b'\x00\x07\x00\x00\x00\x06\x01\x03\x9c\x86\x00\x01']
+
+        # only the reads within the rejected window are unbatched, later models are read in windows again
+        inverter = device.Model(103, data={'W': 1234, 'W_SF': -1}).get_mb()
+        d = MockDevice.MockDevice(b'SunS' + MODEL_1 + inverter + inverter + b'\xff\xff\x00\x00')
+        d.max_count = 70
+        d.fail.add((40002, 70))
+        d.scan(batch=True)
+        assert d.inverter[1].W.cvalue == 123.4
+        assert d.reads()[1:] == [(40002, 70), (40002, 2), (40002, 68), (40070, 1), (40070, 2), (40070, 52),
+                                 (40122, 70)]
+
+    def test_scan_cache(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(socket, 'socket', MockSocket.mock_socket)
+        monkeypatch.setattr(client.SunSpecModbusClientDeviceTCP, 'connect', MockSocket.mock_tcp_connect)
+        monkeypatch.setattr(client.SunSpecModbusClientDeviceTCP, 'disconnect', MockSocket.mock_tcp_connect)
+
+        scan_buffer = [b'\x00\x00\x00\x00\x00\t\x01\x03\x06', b'SunS\x00\x01',
+                       b'\x00\x00\x00\x00\x00\x05\x01\x03\x02', b'\x00B',
+                       b'\x00\x00\x00\x00\x00\x8b\x01\x03\x88', MODEL_1,
+                       b'\x00\x00\x00\x00\x00\x05\x01\x03\x02', b'\xff\xff']
+        cached_buffer = [b'\x00\x00\x00\x00\x00\x07\x01\x03\x04', b'SunS',
+                         b'\x00\x00\x00\x00\x00\x07\x01\x03\x04', b'\x00\x01\x00B',
+                         b'\x00\x00\x00\x00\x00\x05\x01\x03\x02', b'\xff\xff',
+                         b'\x00\x00\x00\x00\x00\x8b\x01\x03\x88']
+        cache_file = tmp_path / 'scan_cache.json'
+
+        # initial scan performs discovery and stores the layout
+        c_tcp = client.SunSpecModbusClientDeviceTCP(ipport=8502)
+        c_tcp.client.connect()
+        c_tcp.client.socket._set_buffer(scan_buffer)
+        with client.SunSpecModbusClientScanCache(cache_file) as cache:
+            c_tcp.scan(cache=cache)
+            # entries are only written when the cache is saved
+            assert not cache_file.exists()
+        assert not (tmp_path / 'scan_cache.json.tmp').exists()
+        cache = client.SunSpecModbusClientScanCache(cache_file)
+        assert cache.get('tcp:127.0.0.1:8502:1') == {'base_addr': 40000, 'sn': 'sn-123456789',
+                                                     'models': [[1, 40002, 66]]}
+
+        # layout and serial number match, models created from the cache
+        c_tcp.client.socket.clear_buffer()
+        c_tcp.client.socket.request = []
+        c_tcp.client.socket._set_buffer(cached_buffer + [MODEL_1])
+        c_tcp.scan(cache=cache)
+        assert not cache.modified
+        assert c_tcp.common[0].SN.value == 'sn-123456789'
+        assert c_tcp.client.socket.request == [b'\x00\x05\x00\x00\x00\x06\x01\x03\x9c@\x00\x02',
+                                               b'\x00\x06\x00\x00\x00\x06\x01\x03\x9cB\x00\x02',
+                                               b'\x00\x07\x00\x00\x00\x06\x01\x03\x9c\x86\x00\x01',
+                                               b'\x00\x08\x00\x00\x00\x06\x01\x03\x9cB\x00D']
+
+        # serial number changed, full discovery performed and cache updated
+        c_tcp.client.socket.clear_buffer()
+        c_tcp.client.socket.request = []
+        model_1_new = MODEL_1.replace(b'sn-123456789', b'sn-987654321')
+        c_tcp.client.socket._set_buffer(cached_buffer + [model_1_new] + scan_buffer[:5] + [model_1_new] +
+                                        scan_buffer[6:])
+        c_tcp.scan(cache=cache)
+        assert c_tcp.common[0].SN.value == 'sn-987654321'
+        assert len(c_tcp.client.socket.request) == 8
+        assert client.SunSpecModbusClientScanCache(cache_file).get('tcp:127.0.0.1:8502:1')['sn'] == 'sn-123456789'
+        cache.save()
+        assert client.SunSpecModbusClientScanCache(cache_file).get('tcp:127.0.0.1:8502:1')['sn'] == 'sn-987654321'
+
     def test_get_text(self, monkeypatch):
         # tcp scan
         monkeypatch.setattr(socket, 'socket', MockSocket.mock_socket)
@@ -1195,7 +1697,7 @@ class TestSunSpecModbusClientDeviceTCP:
                                                            b'\x00\x00\x00\x00\x00\x00sn-123456789\x00\x00\x00\x00'
                                                            b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
                                                            b'\x00\x00\x00\x00\x01\x00\x00']
-        check_req = b'\x00\x00\x00\x00\x00\x06\x01\x03\x9c@\x00F'
+        check_req = b'\x00\x01\x00\x00\x00\x06\x01\x03\x9c@\x00F'
         d.client.connect()
         d.client.socket._set_buffer(buffer)
         assert d.read(40000, 70) == buffer[1]
@@ -1213,7 +1715,7 @@ class TestSunSpecModbusClientDeviceTCP:
         d.client.socket._set_buffer(buffer)
         d.client.write(40052, data_to_write)
 
-        check_req = b"\x00\x00\x00\x00\x00'\x01\x10\x9ct\x00\x10 sn-000\x00\x00\x00\x00\x00\x00\x00" \
+        check_req = b"\x00\x01\x00\x00\x00'\x01\x10\x9ct\x00\x10 sn-000\x00\x00\x00\x00\x00\x00\x00" \
                     b"\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00"
         assert d.client.socket.request[0] == check_req
 
@@ -1308,6 +1810,26 @@ class TestSunSpecModbusClientDeviceTCP:
         get_text_output = c_tcp.get_text()
         assert get_text_output[get_text_output.index('Model'):] == expected_output
 
+    def test_gateway(self, monkeypatch):
+        monkeypatch.setattr(socket, 'socket', MockSocket.mock_socket)
+        d1 = client.SunSpecModbusClientDeviceTCP(slave_id=1, ipaddr='10.0.0.2', gateway=True)
+        d2 = client.SunSpecModbusClientDeviceTCP(slave_id=2, ipaddr='10.0.0.2', gateway=True)
+        assert d1.client.gateway is d2.client.gateway
+        gw = d1.client.gateway
+
+        d1.connect()
+        d2.connect()
+        gw.socket._set_buffer([b'\x00\x00\x00\x00\x00\x05\x02\x03\x02', b'\x00\x07'])
+        assert d2.read(40000, 1) == b'\x00\x07'
+        assert gw.socket.request[0][6] == 2
+        d1.disconnect()
+        d2.disconnect()
+        assert not gw.is_connected()
+
+        d1.close()
+        d2.close()
+        assert suns_modbus.modbus_tcp_gateways.get(('10.0.0.2', 502)) is None
+
 
 class TestSunSpecModbusClientDeviceRTU:
     def test___init__(self, monkeypatch):
@@ -1450,6 +1972,43 @@ class TestSunSpecModbusClientDeviceRTU:
         get_text_output = c_rtu.get_text()
         assert get_text_output[get_text_output.index('Model'):] == expected_output
 
+    def test_broadcast(self, monkeypatch):
+        monkeypatch.setattr(serial, 'Serial', MockPort.mock_port)
+        monkeypatch.setattr(suns_modbus.time, 'sleep', lambda t: None)
+        d = client.SunSpecModbusClientDeviceRTU(1, "COMM2")
+        d.open()
+        mb_data = device.Model(103, data={'W': 1234, 'W_SF': -1}).get_mb()
+        m = client.SunSpecModbusClientModel(103, model_addr=40002, model_len=50, data=mb_data, mb_device=d)
+        m.W.value = 500
+        m.broadcast()
+        req = b'\x00\x06' + (40002 + m.W.offset).to_bytes(2, 'big') + b'\x01\xf4'
+        assert d.client.serial.request == [req + suns_modbus.computeCRC(req).to_bytes(2, 'big')]
+        assert not m.dirty_points
+
+        m.W.value = 600
+        m.W.broadcast()
+        assert d.client.serial.request[1][:2] == b'\x00\x06'
+        assert not m.W.dirty
+
+        # registers between the modified points are not sent, even with write_gap set
+        d.write_gap = 8
+        mb_data = device.Model(705, data={'NPt': 2, 'NCrv': 1, 'V_SF': -2, 'DeptRef_SF': -2,
+                                          'Crv': [{'Pt': [{'V': 9200, 'Var': 3000}, {'V': 9670}]}]}).get_mb()
+        m = client.SunSpecModbusClientModel(705, model_addr=40002, model_len=len(mb_data) // 2 - 2, data=mb_data,
+                                            mb_device=d)
+        pt = m.Crv[0].Pt
+        pt[0].V.value = 9300
+        pt[1].V.value = 9700
+        m.broadcast()
+        requests = d.client.serial.request[2:]
+        assert [req[:4] for req in requests] == [b'\x00\x06' + (40002 + pt[0].V.offset).to_bytes(2, 'big'),
+                                                 b'\x00\x06' + (40002 + pt[1].V.offset).to_bytes(2, 'big')]
+        d.close()
+
+        # broadcast requests are only supported on RTU devices
+        with pytest.raises(client.SunSpecModbusClientError):
+            client.SunSpecModbusClientDeviceTCP().broadcast(40000, b'\x00\x01')
+
 
 class TestSunSpecFileClientDevice(object):
     def test___init__(self):
@@ -1497,7 +2056,5 @@ class TestSunSpecFileClientDevice(object):
         assert d.models['common'][0].SN.cvalue == 'sn-000'
 
 
-
 if __name__ == "__main__":
     pass
-
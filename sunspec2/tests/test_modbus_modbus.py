@@ -1,7 +1,9 @@
 import sunspec2.modbus.modbus as modbus_client
 import pytest
 import socket
+import struct
 import serial
+import threading
 import sunspec2.tests.mock_socket as MockSocket
 import sunspec2.tests.mock_port as MockPort
 
@@ -42,6 +44,44 @@ def test_checkCRC():
     pass
 
 
+def test_adaptive_timeout():
+    rto = modbus_client.AdaptiveTimeout(2, min_timeout=.01)
+    assert rto.timeout == 2
+    assert rto.state()['srtt'] is None
+
+    rto.sample(.1)
+    assert rto.srtt == .1
+    assert rto.rttvar == .05
+    assert rto.timeout == pytest.approx(.3)
+
+    # steady response times converge towards the response time
+    for i in range(50):
+        rto.sample(.1)
+    assert rto.srtt == pytest.approx(.1)
+    assert rto.timeout < .11
+    assert rto.timeout >= rto.min_timeout
+
+    # timeouts back off to the maximum timeout
+    timeout = rto.timeout
+    rto.backoff()
+    assert rto.timeout == 2 * timeout
+    for i in range(10):
+        rto.backoff()
+    assert rto.timeout == 2
+    state = rto.state()
+    assert state['samples'] == 51
+    assert state['timeouts'] == 11
+
+    rto.reset()
+    assert rto.timeout == 2
+    assert rto.samples == 0
+
+    # slow link stays within the maximum timeout
+    rto = modbus_client.AdaptiveTimeout(2)
+    rto.sample(1.5)
+    assert rto.timeout == 2
+
+
 class TestModbusClientRTU:
     def test___init__(self, monkeypatch):
         monkeypatch.setattr(serial, 'Serial', MockPort.mock_port)
@@ -122,6 +162,286 @@ class TestModbusClientRTU:
                     b'\x00\x00\x00\x00\x00\xad\xff'
         assert c.serial.request[0] == check_req
 
+    def test_read_write(self, monkeypatch):
+        monkeypatch.setattr(serial, 'Serial', MockPort.mock_port)
+        c = modbus_client.ModbusClientRTU(name="COM2")
+        c.open()
+        resp = b'\x01\x17\x04\x00\x01\x00\x02'
+        c.serial._set_buffer([resp[:5], resp[5:] + struct.pack('>H', modbus_client.computeCRC(resp))])
+        assert c.read_write(1, 40000, 2, 40000, b'\x00\x01\x00\x02') == b'\x00\x01\x00\x02'
+        req = b'\x01\x17\x9c\x40\x00\x02\x9c\x40\x00\x02\x04\x00\x01\x00\x02'
+        assert c.serial.request[0] == req + struct.pack('>H', modbus_client.computeCRC(req))
+
+        resp = b'\x01\x97\x01'
+        c.serial._set_buffer([resp + struct.pack('>H', modbus_client.computeCRC(resp))])
+        with pytest.raises(modbus_client.ModbusClientException) as exc:
+            c.read_write(1, 40000, 2, 40000, b'\x00\x01\x00\x02')
+        assert exc.value.except_code == modbus_client.EXCEPT_ILLEGAL_FUNCTION
+
+        with pytest.raises(modbus_client.ModbusClientError):
+            c.read_write(1, 40000, 2, 40000, bytes((modbus_client.REQ_READ_WRITE_COUNT_MAX + 1) * 2))
+
+    def test_read_errors(self, monkeypatch):
+        monkeypatch.setattr(serial, 'Serial', MockPort.mock_port)
+        c = modbus_client.ModbusClientRTU(name="COM2")
+        c.serial._set_buffer([b'\x01\x03\x04\x00', b'\x01\x00\x02\x2a\x33'])
+        with pytest.raises(modbus_client.ModbusClientCRCError):
+            c.read(1, 40000, 2)
+
+        c.serial._set_buffer([b'\x01\x83\x02\xc0\xf1'])
+        with pytest.raises(modbus_client.ModbusClientException) as exc:
+            c.read(1, 40000, 2)
+        assert exc.value.except_code == modbus_client.EXCEPT_ILLEGAL_ADDRESS
+
+    def test_worker(self, monkeypatch):
+        monkeypatch.setattr(serial, 'Serial', MockPort.mock_port)
+        c = modbus_client.ModbusClientRTU(name="COM2")
+        resp = [b'\x01\x03\x04\x00', b'\x01\x00\x02\x2a\x32']
+        c.start_worker()
+        assert c.worker.is_alive()
+
+        # reads from several threads are performed in turn by the worker
+        for i in range(4):
+            c.serial._set_buffer(resp)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(c.read(1, 40000, 2))) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == [b'\x00\x01\x00\x02'] * 4
+        assert c.serial.request == [b'\x01\x03\x9c@\x00\x02\xeb\x8f'] * 4
+
+        # futures
+        c.serial._set_buffer(resp)
+        future = c.submit_read(1, 40000, 2)
+        assert future.result(timeout=5) == b'\x00\x01\x00\x02'
+        future = c.submit_read(1, 40000, 2)
+        with pytest.raises(modbus_client.ModbusClientTimeout):
+            future.result(timeout=5)
+
+        worker = c.worker
+        c.stop_worker()
+        assert c.worker is None
+        assert not worker.is_alive()
+
+        # requests are performed immediately when the worker is not running
+        c.serial._set_buffer(resp)
+        future = c.submit_read(1, 40000, 2)
+        assert future.done()
+        assert future.result() == b'\x00\x01\x00\x02'
+
+    def test_worker_priority(self, monkeypatch):
+        monkeypatch.setattr(serial, 'Serial', MockPort.mock_port)
+        c = modbus_client.ModbusClientRTU(name="COM2")
+        c.start_worker()
+
+        # hold the worker while requests are queued
+        hold = threading.Event()
+        held = threading.Event()
+        c.submit(lambda: held.set() or hold.wait())
+        held.wait(timeout=5)
+        order = []
+        futures = [c.submit(order.append, 'nameplate', priority=modbus_client.PRIORITY_NAMEPLATE),
+                   c.submit(order.append, 'telemetry', priority=modbus_client.PRIORITY_TELEMETRY),
+                   c.submit(order.append, 'telemetry deadline', priority=modbus_client.PRIORITY_TELEMETRY,
+                            deadline=60),
+                   c.submit(order.append, 'alarm', priority=modbus_client.PRIORITY_ALARM),
+                   c.submit(order.append, 'control', priority=modbus_client.PRIORITY_CONTROL)]
+        expired = c.submit(order.append, 'expired', deadline=0)
+        assert c.bus_report()['queued'] == 6
+        hold.set()
+        for future in futures:
+            future.result(timeout=5)
+        with pytest.raises(modbus_client.ModbusClientTimeout):
+            expired.result(timeout=5)
+        assert order == ['control', 'alarm', 'telemetry deadline', 'telemetry', 'nameplate']
+        assert c.bus_report()['expired'] == 1
+        c.stop_worker()
+
+    def test_worker_stop(self, monkeypatch):
+        monkeypatch.setattr(serial, 'Serial', MockPort.mock_port)
+        c = modbus_client.ModbusClientRTU(name="COM2")
+        c.start_worker()
+        hold = threading.Event()
+        held = threading.Event()
+        c.submit(lambda: held.set() or hold.wait())
+        held.wait(timeout=5)
+        queued = c.submit(lambda: 'queued')
+
+        # only the defined priorities are accepted
+        with pytest.raises(modbus_client.ModbusClientError):
+            c.submit(lambda: None, priority=modbus_client.PRIORITY_NAMEPLATE + 1)
+
+        # requests queued before the stop are performed, requests submitted while stopping fail
+        worker = c.worker
+        c.stop_worker(timeout=0.01)
+        assert c.worker is worker and c.worker_stopping
+        future = c.submit(lambda: 'stopping')
+        with pytest.raises(modbus_client.ModbusClientError):
+            future.result(timeout=5)
+
+        # requests left in the queue when the worker exits fail
+        left = modbus_client.futures.Future()
+        c.jobs.put((modbus_client.PRIORITY_NAMEPLATE + 2, float('inf'), 0, (left, lambda: 'left', (), {})))
+        hold.set()
+        c.stop_worker(timeout=5)
+        assert queued.result(timeout=5) == 'queued'
+        with pytest.raises(modbus_client.ModbusClientError):
+            left.result(timeout=5)
+        assert c.worker is None
+        assert not c.worker_stopping
+        assert not worker.is_alive()
+
+        # the same exception policy applies with and without the worker
+        def interrupt():
+            raise KeyboardInterrupt()
+
+        with pytest.raises(KeyboardInterrupt):
+            c.submit(interrupt).result()
+        c.start_worker()
+        with pytest.raises(KeyboardInterrupt):
+            c.submit(interrupt).result(timeout=5)
+        assert c.worker.is_alive()
+        c.stop_worker()
+
+    def test_bus_report(self, monkeypatch):
+        monkeypatch.setattr(serial, 'Serial', MockPort.mock_port)
+        c = modbus_client.ModbusClientRTU(name="COM2")
+        assert c.char_time() == 11 / 9600
+        assert c.frame_time(8) == 8 * 11 / 9600 + c.inter_frame_gap
+
+        c.serial._set_buffer([b'\x01\x03\x04\x00', b'\x01\x00\x02\x2a\x32'])
+        c.read(1, 40000, 2)
+        report = c.bus_report()
+        assert report['requests'] == 1
+        assert report['tx_bytes'] == 8
+        assert report['rx_bytes'] == 9
+        assert report['busy_time'] == pytest.approx(17 * 11 / 9600 + 2 * c.inter_frame_gap)
+        assert 0 < report['utilization'] <= 1
+        assert report['queued'] == 0
+
+        c.reset_stats()
+        assert c.bus_report()['requests'] == 0
+
+    def test_inter_frame_gap(self, monkeypatch):
+        monkeypatch.setattr(serial, 'Serial', MockPort.mock_port)
+        sleeps = []
+        monkeypatch.setattr(modbus_client.time, 'sleep', lambda t: sleeps.append(t))
+        c = modbus_client.ModbusClientRTU(name="COM2")
+        resp = [b'\x01\x03\x04\x00', b'\x01\x00\x02\x2a\x32']
+
+        # the full gap is waited for before the first request on the bus
+        assert c.last_frame_time is None
+        c.serial._set_buffer(list(resp))
+        c.read(1, 40000, 2)
+        assert sleeps == [c.inter_frame_gap]
+        assert c.last_frame_time is not None
+
+        # only the remaining part of the gap is waited for
+        c.serial._set_buffer(list(resp))
+        c.read(1, 40000, 2)
+        assert len(sleeps) == 2
+        assert 0 < sleeps[1] <= c.inter_frame_gap
+
+        # no wait once the gap has elapsed
+        c.last_frame_time -= c.inter_frame_gap
+        c.serial._set_buffer(list(resp))
+        c.read(1, 40000, 2)
+        assert len(sleeps) == 2
+
+        # the bus state is unknown after the port is reopened
+        c.close()
+        c.open()
+        c.serial._set_buffer(list(resp))
+        c.read(1, 40000, 2)
+        assert sleeps[2:] == [c.inter_frame_gap]
+
+    def test_broadcast(self, monkeypatch):
+        monkeypatch.setattr(serial, 'Serial', MockPort.mock_port)
+        sleeps = []
+        monkeypatch.setattr(modbus_client.time, 'sleep', lambda t: sleeps.append(t))
+        c = modbus_client.ModbusClientRTU(name="COM2")
+
+        # no response is read
+        c.broadcast(40000, b'\x00\x64')
+        req = b'\x00\x06\x9c\x40\x00\x64'
+        assert c.serial.request == [req + struct.pack('>H', modbus_client.computeCRC(req))]
+        assert c.last_broadcast
+        del sleeps[:]
+
+        # requests are split at max_write_count, the turnaround delay is waited for after each broadcast
+        c.broadcast(40000, b'\x00\x01\x00\x02\x00\x03', max_write_count=2)
+        req = b'\x00\x10\x9c\x40\x00\x02\x04\x00\x01\x00\x02'
+        assert c.serial.request[1] == req + struct.pack('>H', modbus_client.computeCRC(req))
+        assert c.serial.request[2][:6] == b'\x00\x10\x9c\x42\x00\x01'
+        assert len(sleeps) == 2
+        # the delay starts at the end of the transmission of the broadcast frame
+        assert c.broadcast_delay - 0.01 < sleeps[0] <= c.broadcast_delay + 8 * c.char_time()
+
+        c.serial._set_buffer([b'\x01\x03\x04\x00', b'\x01\x00\x02\x2a\x32'])
+        c.read(1, 40000, 2)
+        assert len(sleeps) == 3
+        assert sleeps[2] > c.inter_frame_gap
+        assert not c.last_broadcast
+
+    def test_response_timeout(self, monkeypatch):
+        monkeypatch.setattr(serial, 'Serial', MockPort.mock_port)
+        c = modbus_client.ModbusClientRTU(name="COM2")
+        assert c.expected_response_time(8, 9) == 17 * 11 / 9600 + c.inter_frame_gap
+
+        c.serial._set_buffer([b'\x01\x03\x04\x00', b'\x01\x00\x02\x2a\x32'])
+        c.read(1, 40000, 2)
+        assert c.response_timeout == c.timeout
+
+        c.turnaround = .05
+        c.serial._set_buffer([b'\x01\x03\x04\x00', b'\x01\x00\x02\x2a\x32'])
+        c.read(1, 40000, 2)
+        assert c.response_timeout == pytest.approx(c.expected_response_time(8, 9) + .05)
+        assert c.serial.timeout == c.response_timeout
+
+        # limited to the client timeout
+        c.turnaround = 100
+        c.serial._set_buffer([b'\x01\x03\x04\x00', b'\x01\x00\x02\x2a\x32'])
+        c.read(1, 40000, 2)
+        assert c.response_timeout == c.timeout
+
+    def test_adaptive_timeout(self, monkeypatch):
+        monkeypatch.setattr(serial, 'Serial', MockPort.mock_port)
+        c = modbus_client.ModbusClientRTU(name="COM2")
+        assert c.timeout_state(1) is None
+        rto = c.set_adaptive_timeout(1)
+        assert c.set_adaptive_timeout(1) is rto
+
+        c.serial._set_buffer([b'\x01\x03\x04\x00', b'\x01\x00\x02\x2a\x32'])
+        c.read(1, 40000, 2)
+        assert c.timeout_state(1)['samples'] == 1
+        assert rto.timeout < c.timeout
+        assert c.serial.timeout == c.response_timeout == c.timeout
+
+        # the estimate is of the turnaround time, the transmission time of each request is added to it
+        assert rto.srtt < c.expected_response_time(8, 9)
+        c.serial._set_buffer([b'\x01\x10\x9c\x40\x00', b'\x7b\xaf\xae'])
+        c.write(1, 40000, b'\x00\x01' * 123)
+        assert c.serial.timeout == min(c.timeout, c.expected_response_time(255, 8) + rto.timeout)
+        assert c.serial.timeout > c.expected_response_time(255, 8)
+
+        # silent slave fails with the estimated timeout and backs off
+        timeout = rto.timeout
+        with pytest.raises(modbus_client.ModbusClientTimeout):
+            c.read(1, 40000, 2)
+        assert c.serial.timeout == min(c.timeout, c.expected_response_time(8, 9) + timeout)
+        assert rto.timeouts == 1
+        assert rto.timeout == min(2 * timeout, c.timeout)
+
+        # other slaves use the static timeout
+        with pytest.raises(modbus_client.ModbusClientTimeout):
+            c.read(2, 40000, 2)
+        assert c.serial.timeout == c.timeout
+
+        c.set_adaptive_timeout(1, False)
+        assert c.timeout_state(1) is None
+
 
 class TestModbusClientTCP:
     def test___init__(self):
@@ -181,7 +501,7 @@ class TestModbusClientTCP:
                                                             b'\x00\x00\x00\x00\x00\x00sn-123456789\x00\x00\x00\x00'
                                                             b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
                                                             b'\x00\x00\x00\x00\x01\x00\x00']
-        check_req = b'\x00\x00\x00\x00\x00\x06\x01\x03\x9c@\x00F'
+        check_req = b'\x00\x01\x00\x00\x00\x06\x01\x03\x9c@\x00F'
         c.connect()
         c.socket._set_buffer(in_buff)
         assert c.read(40000, 70) == in_buff[1]
@@ -201,7 +521,7 @@ class TestModbusClientTCP:
         c.socket._set_buffer(buffer)
         c.write(40052, data_to_write)
 
-        check_req = b"\x00\x00\x00\x00\x00'\x01\x10\x9ct\x00\x10 sn-000\x00\x00\x00\x00\x00\x00\x00" \
+        check_req = b"\x00\x01\x00\x00\x00'\x01\x10\x9ct\x00\x10 sn-000\x00\x00\x00\x00\x00\x00\x00" \
                     b"\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00"
         assert c.socket.request[0] == check_req
 
@@ -213,11 +533,205 @@ class TestModbusClientTCP:
         data_to_write[:6] = b'sn-000'
 
         buffer = [b'\x00\x00\x00\x00\x00\x06\x01\x10\x9ct\x00\x7b',
-                b'\x00\x00\x00\x00\x00\x06\x01\x10\x9c\xef\x00\x01']
+                  b'\x00\x00\x00\x00\x00\x06\x01\x10\x9c\xef\x00\x01']
         c.socket._set_buffer(buffer)
         c.write(40052, data_to_write)
 
-        check_req0 = b"\x00\x00\x00\x00\x00\xfd\x01" + b"\x10\x9ct\x00{\xf6" + data_to_write[:(c.max_write_count*2)]
-        check_req1 = b"\x00\x00\x00\x00\x00\x09\x01" + b"\x10\x9c\xef\x00\x01\x02\x00\x00"
+        check_req0 = b"\x00\x01\x00\x00\x00\xfd\x01" + b"\x10\x9ct\x00{\xf6" + data_to_write[:(c.max_write_count*2)]
+        check_req1 = b"\x00\x02\x00\x00\x00\x09\x01" + b"\x10\x9c\xef\x00\x01\x02\x00\x00"
         assert c.socket.request[0] == check_req0
         assert c.socket.request[1] == check_req1
+
+    def test_read_write(self, monkeypatch):
+        c = modbus_client.ModbusClientTCP()
+        monkeypatch.setattr(socket, 'socket', MockSocket.mock_socket)
+        c.connect()
+        c.socket._set_buffer([b'\x00\x00\x00\x00\x00\x07\x01\x17\x04', b'\x00\x01\x00\x02'])
+        assert c.read_write(40000, 2, 40000, b'\x00\x01\x00\x02') == b'\x00\x01\x00\x02'
+        assert c.socket.request[0] == b'\x00\x01\x00\x00\x00\x0f\x01\x17\x9c\x40\x00\x02\x9c\x40\x00\x02\x04' \
+                                      b'\x00\x01\x00\x02'
+
+        c.socket._set_buffer([b'\x00\x00\x00\x00\x00\x03\x01\x97\x01'])
+        with pytest.raises(modbus_client.ModbusClientException) as exc:
+            c.read_write(40000, 2, 40000, b'\x00\x01\x00\x02')
+        assert exc.value.except_code == modbus_client.EXCEPT_ILLEGAL_FUNCTION
+
+        # a response with fewer registers than requested is not returned as truncated data
+        c.socket._set_buffer([b'\x00\x00\x00\x00\x00\x05\x01\x17\x02', b'\x00\x01'])
+        with pytest.raises(modbus_client.ModbusClientError):
+            c.read_write(40000, 2, 40000, b'\x00\x01\x00\x02')
+
+    def test_adaptive_timeout(self, monkeypatch):
+        c = modbus_client.ModbusClientTCP()
+        assert c.timeout_state() is None
+        c = modbus_client.ModbusClientTCP(adaptive_timeout=True)
+        monkeypatch.setattr(socket, 'socket', MockSocket.mock_socket)
+        c.connect()
+        c.socket._set_buffer([b'\x00\x00\x00\x00\x00\x07\x01\x03\x04', b'\x00\x01\x00\x02'])
+        assert c.read(40000, 2) == b'\x00\x01\x00\x02'
+        assert c.timeout_state()['samples'] == 1
+        assert c.rto.timeout < c.timeout
+
+        # the next request uses the estimated timeout
+        c.socket._set_buffer([b'\x00\x00\x00\x00\x00\x07\x01\x03\x04', b'\x00\x01\x00\x02'])
+        c.read(40000, 2)
+        assert c.socket.timeout < c.timeout
+
+        def recv_timeout(size):
+            raise socket.timeout('timed out')
+
+        c.socket.recv = recv_timeout
+        timeout = c.rto.timeout
+        with pytest.raises(modbus_client.ModbusClientTimeout):
+            c.read(40000, 2)
+        assert c.timeout_state()['timeouts'] == 1
+        assert c.rto.timeout == min(2 * timeout, c.timeout)
+
+    def test_gateway(self, monkeypatch):
+        monkeypatch.setattr(socket, 'socket', MockSocket.mock_socket)
+        gw = modbus_client.modbus_tcp_gateway('10.0.0.1')
+        assert modbus_client.modbus_tcp_gateway('10.0.0.1') is gw
+        with pytest.raises(modbus_client.ModbusClientError):
+            modbus_client.modbus_tcp_gateway('10.0.0.1', tls=True)
+        with pytest.raises(modbus_client.ModbusClientError):
+            modbus_client.modbus_tcp_gateway('10.0.0.1', timeout=5)
+        with pytest.raises(modbus_client.ModbusClientError):
+            modbus_client.modbus_tcp_gateway('10.0.0.1', pipeline=4)
+        with pytest.raises(modbus_client.ModbusClientError):
+            modbus_client.modbus_tcp_gateway('10.0.0.1', session=True)
+        gw.timeout = 2
+        assert modbus_client.modbus_tcp_gateway('10.0.0.1', timeout=2, pipeline=1, session=False) is gw
+        u1 = gw.unit(1)
+        u2 = gw.unit(2, adaptive_timeout=True)
+        assert gw.unit(1) is u1
+        assert u2.ipaddr == '10.0.0.1'
+
+        # one connection shared by the units
+        u1.connect()
+        u2.connect()
+        sock = gw.socket
+        assert gw.connections == 2
+        sock._set_buffer([b'\x00\x00\x00\x00\x00\x07\x01\x03\x04', b'\x00\x01\x00\x02',
+                          b'\x00\x00\x00\x00\x00\x07\x02\x03\x04', b'\x00\x03\x00\x04'])
+        assert u1.read(40000, 2) == b'\x00\x01\x00\x02'
+        assert u2.read(40000, 2) == b'\x00\x03\x00\x04'
+        assert [req[6] for req in sock.request] == [1, 2]
+        assert u1.timeout_state() is None
+        assert u2.timeout_state()['samples'] == 1
+
+        # a unit without the adaptive timeout does not inherit the timeout of an adaptive unit
+        sock._set_buffer([b'\x00\x00\x00\x00\x00\x07\x01\x03\x04', b'\x00\x01\x00\x02'])
+        sock.timeout = 0.05
+        assert u1.read(40000, 2) == b'\x00\x01\x00\x02'
+        assert sock.timeout == 2
+
+        u1.disconnect()
+        assert gw.socket is sock
+        u2.disconnect()
+        assert gw.socket is None
+
+        u1.close()
+        assert modbus_client.modbus_tcp_gateways.get(('10.0.0.1', 502)) is gw
+        u2.close()
+        assert modbus_client.modbus_tcp_gateways.get(('10.0.0.1', 502)) is None
+
+    def test_session(self, monkeypatch):
+        resp = [b'\x00\x00\x00\x00\x00\x07\x01\x03\x04', b'\x00\x01\x00\x02']
+        sockets = []
+
+        def mock_socket(family, type):
+            sock = MockSocket.mock_socket(family, type)
+            sock._set_buffer(resp * 2)
+            sockets.append(sock)
+            return sock
+
+        monkeypatch.setattr(socket, 'socket', mock_socket)
+        c = modbus_client.ModbusClientTCP(session=True)
+        assert c.is_connected()
+        assert c.read(40000, 2) == b'\x00\x01\x00\x02'
+        assert c.socket is sockets[0]
+        assert c.socket.options[(socket.IPPROTO_TCP, socket.TCP_NODELAY)] == 1
+        assert c.socket.options[(socket.SOL_SOCKET, socket.SO_KEEPALIVE)] == 1
+        assert c.read(40000, 2) == b'\x00\x01\x00\x02'
+        assert len(sockets) == 1
+
+        # connection closed by the device, the request is retried on a new connection
+        assert c.read(40000, 2) == b'\x00\x01\x00\x02'
+        assert len(sockets) == 2
+        assert c.socket is sockets[1]
+
+        report = c.session_report()
+        assert report['requests'] == 3
+        assert report['connects'] == 2
+        assert report['reused'] == 2
+        assert report['reconnects'] == 1
+        assert report['reuse_ratio'] == pytest.approx(2 / 3)
+        assert report['connected']
+
+        # a connection lost on a new connection is not retried
+        c.disconnect()
+        resp = []
+        with pytest.raises(modbus_client.ModbusClientConnectionClosed):
+            c.read(40000, 2)
+        assert c.socket is None
+
+    def test_session_connection_lost(self):
+        c = modbus_client.ModbusClientTCP(session=True)
+        c.socket, peer = socket.socketpair()
+        try:
+            assert not c._connection_lost()
+            # stale data is discarded
+            peer.sendall(b'\x00\x00')
+            assert not c._connection_lost()
+            assert not c._connection_lost()
+            peer.close()
+            assert c._connection_lost()
+        finally:
+            c.disconnect()
+
+    def test_read_pipelined(self, monkeypatch):
+        c = modbus_client.ModbusClientTCP(pipeline=3)
+        monkeypatch.setattr(socket, 'socket', MockSocket.mock_socket)
+        c.connect()
+        data = bytes(range(256)) * 2 + bytes(88)
+        chunks = [data[:250], data[250:500], data[500:600]]
+        # responses arrive out of order and include a stale response for an unknown transaction id
+        in_buff = [b'\x00\x63\x00\x00\x00\x05\x01\x03\x02', b'\x00\x00',
+                   b'\x00\x02\x00\x00\x00\xfd\x01\x03\xfa', chunks[1],
+                   b'\x00\x01\x00\x00\x00\xfd\x01\x03\xfa', chunks[0],
+                   b'\x00\x03\x00\x00\x00\x67\x01\x03\x64', chunks[2]]
+        c.socket._set_buffer(in_buff)
+        assert c.read(40000, 300) == data
+        assert c.socket.request == [b'\x00\x01\x00\x00\x00\x06\x01\x03\x9c@\x00}',
+                                    b'\x00\x02\x00\x00\x00\x06\x01\x03\x9c\xbd\x00}',
+                                    b'\x00\x03\x00\x00\x00\x06\x01\x03\x9d:\x002']
+
+    def test_read_regions(self, monkeypatch):
+        c = modbus_client.ModbusClientTCP(pipeline=2)
+        monkeypatch.setattr(socket, 'socket', MockSocket.mock_socket)
+        c.connect()
+        in_buff = [b'\x00\x01\x00\x00\x00\x05\x01\x03\x02', b'\x00\x01',
+                   b'\x00\x02\x00\x00\x00\x03\x01\x83\x02']
+        c.socket._set_buffer(in_buff)
+        with pytest.raises(modbus_client.ModbusClientException) as exc:
+            c.read_regions([(40000, 1), (40010, 1)])
+        assert 'Modbus exception 2' in str(exc.value)
+
+    def test_read_regions_exception_drain(self, monkeypatch):
+        c = modbus_client.ModbusClientTCP(pipeline=3)
+        monkeypatch.setattr(socket, 'socket', MockSocket.mock_socket)
+        c.connect()
+        # the responses to the requests in flight after the exception response are received and discarded
+        c.socket._set_buffer([b'\x00\x01\x00\x00\x00\x03\x01\x83\x02',
+                              b'\x00\x02\x00\x00\x00\x05\x01\x03\x02', b'\xaa\xaa',
+                              b'\x00\x03\x00\x00\x00\x05\x01\x03\x02', b'\xbb\xbb'])
+        with pytest.raises(modbus_client.ModbusClientException):
+            c.read_regions([(40000, 1), (40010, 1), (40020, 1), (40030, 1)])
+        assert len(c.socket.request) == 3
+        assert c.socket.buffer == []
+
+        # responses with another transaction id are discarded
+        c.socket._set_buffer([b'\x00\x63\x00\x00\x00\x05\x01\x03\x02', b'\xaa\xaa',
+                              b'\x00\x00\x00\x00\x00\x05\x01\x03\x02', b'\x00\x05'])
+        assert c.read(40100, 1) == b'\x00\x05'
+        assert c.socket.request[-1][:2] == b'\x00\x04'